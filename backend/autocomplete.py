@@ -0,0 +1,169 @@
+import re
+from bisect import bisect_left, insort
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from indexes import StoreIndex
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Suggestion kinds, in the order ties between them are listed
+SUGGESTION_KINDS = ("title", "organization", "tag", "location")
+KIND_ORDER = {kind: i for i, kind in enumerate(SUGGESTION_KINDS)}
+
+# (kind, normalized text) identifying a suggestion
+Term = Tuple[str, str]
+
+# (normalized text, offset of a word in it, kind), ordered by the text from that word on
+Entry = Tuple[str, int, str]
+
+
+def normalize(text: str) -> str:
+    """Lowercased words separated by single spaces, as terms and queries are compared."""
+    return " ".join(WORD_PATTERN.findall(text.lower()))
+
+
+def job_terms(job) -> Iterable[Tuple[str, str]]:
+    yield "title", job.title
+    yield "organization", job.organization
+    for tag in job.tags:
+        yield "tag", tag
+    yield "location", job.location
+
+
+def organization_terms(organization) -> Iterable[Tuple[str, str]]:
+    yield "organization", organization.name
+
+
+def _suffix(entry: Entry) -> str:
+    return entry[0][entry[1]:]
+
+
+def _bucket(count: int) -> int:
+    # Counts 1, 2-3, 4-7, ... share a bucket
+    return count.bit_length()
+
+
+class PrefixIndex(StoreIndex):
+    """Typeahead suggestions: distinct field values with a word starting with a prefix.
+
+    ``terms(record)`` yields the (kind, value) pairs a record carries, and
+    each distinct pair counts the records carrying it. Values are matched
+    case-insensitively at the start of any of their words, so "eng" finds
+    "Software Engineer".
+
+    Every word start is an entry in a sorted array, and a prefix is the
+    range of entries from ``bisect``. Suggestions are the most frequent
+    terms, so entries are kept in separate arrays by count bucket (1,
+    2-3, 4-7, ...) and searched from the top bucket down until enough
+    terms turn up; a lower bucket can't hold anything better. Most values
+    (titles, above all) occur once, and every term in that bucket ties, so
+    it is only read as far as the suggestions still missing rather than
+    across the whole range.
+    """
+
+    def __init__(self, terms: Callable[[object], Iterable[Tuple[str, str]]]):
+        self._terms = terms
+        self._counts: Dict[Term, int] = {}
+        # Spelling of each term as first seen
+        self._labels: Dict[Term, str] = {}
+        self._buckets: Dict[int, List[Entry]] = {}
+
+    def _record_terms(self, record) -> Dict[Term, str]:
+        found: Dict[Term, str] = {}
+        for kind, value in self._terms(record):
+            key = normalize(value)
+            if key:
+                found.setdefault((kind, key), value)
+        return found
+
+    def clear(self):
+        self._counts.clear()
+        self._labels.clear()
+        self._buckets.clear()
+
+    def _entries(self, term: Term) -> List[Entry]:
+        kind, key = term
+        starts = [0] + [i + 1 for i, char in enumerate(key) if char == " "]
+        return [(key, start, kind) for start in starts]
+
+    def _recount(self, term: Term, old: int, new: int):
+        if _bucket(old) == _bucket(new):
+            return
+        if old:
+            entries = self._buckets[_bucket(old)]
+            for entry in self._entries(term):
+                i = bisect_left(entries, _suffix(entry), key=_suffix)
+                while entries[i] != entry:
+                    i += 1
+                del entries[i]
+        if new:
+            entries = self._buckets.setdefault(_bucket(new), [])
+            for entry in self._entries(term):
+                insort(entries, entry, key=_suffix)
+
+    def add(self, record):
+        for term, label in self._record_terms(record).items():
+            count = self._counts.get(term, 0)
+            if not count:
+                self._labels[term] = label
+            self._counts[term] = count + 1
+            self._recount(term, count, count + 1)
+
+    def discard(self, record):
+        for term in self._record_terms(record):
+            count = self._counts.get(term)
+            if count is None:
+                continue
+            if count == 1:
+                del self._counts[term]
+                del self._labels[term]
+            else:
+                self._counts[term] = count - 1
+            self._recount(term, count, count - 1)
+
+    def rebuild(self, records):
+        # Count first and sort each bucket once, rather than insort per record
+        self.clear()
+        for record in records:
+            for term, label in self._record_terms(record).items():
+                count = self._counts.get(term, 0)
+                if not count:
+                    self._labels[term] = label
+                self._counts[term] = count + 1
+        for term, count in self._counts.items():
+            self._buckets.setdefault(_bucket(count), []).extend(self._entries(term))
+        for entries in self._buckets.values():
+            entries.sort(key=_suffix)
+
+    def state(self):
+        return self._counts, self._labels, self._buckets
+
+    def restore(self, state):
+        self._counts, self._labels, self._buckets = state
+
+    def suggest(self, prefix: str, limit: int) -> List[Tuple[str, str, int]]:
+        """Up to ``limit`` (kind, value, count) terms matching ``prefix``, most frequent first.
+
+        Ties are ordered by the matched text, then by kind.
+        """
+        query = normalize(prefix)
+        if not query:
+            return []
+        # Term -> the first (smallest) matching text seen for it
+        found: Dict[Term, str] = {}
+        for bucket in sorted(self._buckets, reverse=True):
+            entries = self._buckets[bucket]
+            i = bisect_left(entries, query, key=_suffix)
+            while i < len(entries):
+                entry = entries[i]
+                suffix = _suffix(entry)
+                if not suffix.startswith(query):
+                    break
+                found.setdefault((entry[2], entry[0]), suffix)
+                if bucket == 1 and len(found) >= limit:
+                    break
+                i += 1
+            if len(found) >= limit:
+                break
+        ranked = sorted(found, key=lambda term: (-self._counts[term], found[term], KIND_ORDER[term[0]]))
+        return [(kind, self._labels[(kind, key)], self._counts[(kind, key)]) for kind, key in ranked[:limit]]
@@ -0,0 +1,92 @@
+"""Measure how much memory resident jobs take per worker.
+
+Run from the backend directory: python -m benchmarks.memory [--jobs 100000]
+
+Loads the same synthetic catalog into a jobs store (with the indexes
+server.py uses) once keeping Job models and once keeping compact records,
+and reports the memory each holds as traced by tracemalloc, for the
+records alone and for the whole store.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import shutil
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from autocomplete import PrefixIndex, job_terms
+from benchmarks.synthetic import make_jobs
+from bulk import external_id_index
+from compact import CompactForm, ModelForm
+from facets import FacetIndex
+from job_index import JobIndex
+from search import SearchIndex, stem
+from server import JOB_INTERNED_FIELDS, Job
+from store import RecordStore
+
+
+def traced(build):
+    """What ``build()`` returns and the memory it keeps allocated, in bytes."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+async def load_store(path: Path, form) -> RecordStore:
+    indexes = [JobIndex(), SearchIndex(), external_id_index(), FacetIndex(), PrefixIndex(job_terms)]
+    store = RecordStore(path, Job, "jobs", indexes=indexes, form=form)
+    await store.load()
+    return store
+
+
+def main(count: int):
+    directory = Path(tempfile.mkdtemp(prefix="memory-"))
+    try:
+        path = directory / "jobs.json"
+        jobs = make_jobs(count)
+        asyncio.run(RecordStore(path, Job, "jobs").reset(jobs))
+        # Measure the stores from JSON rather than the binary snapshot, so
+        # neither shares values with an unpickled interning table
+        path.with_suffix(".snapshot").unlink()
+        del jobs
+        # Parsed inside each measurement, so the records' strings are counted
+        content = path.read_bytes()
+
+        form = CompactForm(Job, JOB_INTERNED_FIELDS)
+        models, models_size = traced(lambda: [Job(**document) for document in json.loads(content)])
+        compact, compact_size = traced(lambda: [form.pack(Job(**document)) for document in json.loads(content)])
+        assert [form.to_model(record) for record in compact] == models
+        del models, compact
+
+        print(f"{count} jobs")
+        print(f"  Job models        {models_size / 1e6:8.1f} MB  {models_size / count:6.0f} B/job")
+        print(f"  compact records   {compact_size / 1e6:8.1f} MB  {compact_size / count:6.0f} B/job"
+              f"  ({models_size / compact_size:.1f}x smaller)")
+
+        sizes = {}
+        forms = {"Job models": ModelForm(Job), "compact records": CompactForm(Job, JOB_INTERNED_FIELDS)}
+        for name, store_form in forms.items():
+            stem.cache_clear()
+            store, sizes[name] = traced(lambda: asyncio.run(load_store(path, store_form)))
+            path.with_suffix(".snapshot").unlink()
+            del store
+        before, after = sizes["Job models"], sizes["compact records"]
+        print("  whole store, with indexes:")
+        print(f"    Job models      {before / 1e6:8.1f} MB")
+        print(f"    compact records {after / 1e6:8.1f} MB  ({(before - after) / before:.0%} less)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000)
+    main(parser.parse_args().jobs)
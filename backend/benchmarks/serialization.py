@@ -0,0 +1,54 @@
+"""Compare per-request serialization cost of a job list.
+
+Run from the backend directory: python -m benchmarks.serialization
+"""
+import asyncio
+import time
+
+from fastapi.routing import serialize_response
+from starlette.responses import JSONResponse
+
+from benchmarks.synthetic import make_jobs
+from response_cache import render_json
+from server import app
+
+
+def jobs_response_field():
+    for route in app.routes:
+        if getattr(route, "path", None) == "/api/jobs" and "GET" in route.methods:
+            return route.response_field
+    raise RuntimeError("GET /api/jobs route not found")
+
+
+async def response_model_pipeline(field, jobs) -> bytes:
+    # What FastAPI does when an endpoint returns models for a response_model
+    content = await serialize_response(field=field, response_content=jobs)
+    return JSONResponse(content).body
+
+
+def timed(label: str, repeat: int, run) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {label:<24} {elapsed:9.2f} ms/request")
+    return elapsed
+
+
+def main():
+    field = jobs_response_field()
+    loop = asyncio.new_event_loop()
+    for count in (1_000, 10_000, 50_000):
+        jobs = make_jobs(count)
+        repeat = max(3, 20_000 // count)
+        assert render_json(jobs, fast=True) == render_json(jobs)
+        print(f"{count} jobs")
+        baseline = timed("response_model", repeat, lambda: loop.run_until_complete(response_model_pipeline(field, jobs)))
+        timed("stdlib json", repeat, lambda: render_json(jobs))
+        fast = timed("fast path (orjson)", repeat, lambda: render_json(jobs, fast=True))
+        print(f"  speedup {baseline / fast:.1f}x")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure how long the jobs store takes to load on startup.
+
+Run from the backend directory: python -m benchmarks.startup [--jobs 1000000]
+
+Loads the same synthetic catalog once from the JSON snapshot (parse,
+validate and index every record) and once from the binary snapshot, in
+fresh stores with the indexes server.py uses, and checks both give the
+same records and search results.
+"""
+import argparse
+import asyncio
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from autocomplete import PrefixIndex, job_terms
+from benchmarks.synthetic import make_jobs
+from bulk import external_id_index
+from compact import CompactForm
+from facets import FacetIndex
+from job_index import JobIndex
+from search import SearchIndex
+from server import JOB_INTERNED_FIELDS, Job
+from store import RecordStore
+
+# What a restart with 1M jobs should take from the binary snapshot, on one
+# core (loading from JSON takes about 140 s)
+TARGET_SECONDS_1M = 20.0
+
+
+def jobs_store(path: Path) -> RecordStore:
+    return RecordStore(
+        path, Job, "jobs",
+        indexes=[JobIndex(), SearchIndex(), external_id_index(), FacetIndex(), PrefixIndex(job_terms)],
+        form=CompactForm(Job, JOB_INTERNED_FIELDS),
+    )
+
+
+async def timed_load(path: Path) -> (float, RecordStore):
+    store = jobs_store(path)
+    start = time.perf_counter()
+    await store.load()
+    return time.perf_counter() - start, store
+
+
+async def main(count: int):
+    directory = Path(tempfile.mkdtemp(prefix="startup-"))
+    try:
+        path = directory / "jobs.json"
+        print(f"Writing {count} synthetic jobs...", flush=True)
+        seeded = jobs_store(path)
+        await seeded.reset(make_jobs(count))
+        del seeded
+        print(f"  JSON snapshot   {path.stat().st_size / 1e6:8.1f} MB")
+        print(f"  binary snapshot {path.with_suffix('.snapshot').stat().st_size / 1e6:8.1f} MB")
+
+        binary_seconds, from_binary = await timed_load(path)
+        path.with_suffix(".snapshot").unlink()
+        json_seconds, from_json = await timed_load(path)
+
+        dump = from_json.form.dump
+        assert [dump(job) for job in from_binary.records] == [dump(job) for job in from_json.records]
+        query = "research engineer policy"
+        assert from_binary.indexes[1].search(query, 20) == from_json.indexes[1].search(query, 20)
+        assert from_binary.indexes[0].match(salary_band="over-100k", tags=["Remote"]) == \
+            from_json.indexes[0].match(salary_band="over-100k", tags=["Remote"])
+        assert from_binary.indexes[3].facets({"tags": ["Remote"]}) == from_json.indexes[3].facets({"tags": ["Remote"]})
+
+        print(f"  load from JSON    {json_seconds:8.2f} s")
+        print(f"  load from binary  {binary_seconds:8.2f} s  ({json_seconds / binary_seconds:.1f}x faster)")
+        projected = binary_seconds * 1_000_000 / count
+        verdict = "within" if projected <= TARGET_SECONDS_1M else "OVER"
+        print(f"  binary load scaled to 1M jobs: {projected:.1f} s, {verdict} the {TARGET_SECONDS_1M:.0f} s target")
+    finally:
+        shutil.rmtree(directory)
+    return projected <= TARGET_SECONDS_1M
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100_000)
+    sys.exit(0 if asyncio.run(main(parser.parse_args().jobs)) else 1)
@@ -0,0 +1,73 @@
+import random
+from typing import List, Optional, Sequence
+
+from server import Job, Organization
+
+TITLES = ["Research Engineer", "Policy Analyst", "Operations Manager", "Software Engineer",
+          "Program Officer", "Data Scientist", "Communications Lead", "Research Scientist"]
+ORGANIZATIONS = ["FAR AI", "Center for AI Safety", "Open Philanthropy", "GiveWell",
+                 "Redwood Research", "Epoch", "Rethink Priorities", "Founders Pledge"]
+LOCATIONS = ["San Francisco, CA", "London, UK", "Remote", "Oxford, UK", "Washington, DC",
+             "Berkeley, CA / Remote", "New York, NY"]
+SIZES = ["1-10 employees", "10-20 employees", "20-50 employees", "50-100 employees", "100+ employees"]
+TYPES = ["Full-time", "Part-time", "Contract", "Internship"]
+TAGS = ["AI Safety", "Technical", "Remote", "Policy", "Biosecurity", "Global Health",
+        "Research", "Operations", "Leadership", "Machine Learning", "Animal Welfare"]
+WORDS = ("help build trustworthy systems that are beneficial to society work on technical "
+         "infrastructure research reduce risks through field building lead initiatives "
+         "evaluate programs analyse data design policy support teams").split()
+
+
+def make_job(i: int, rng: random.Random, organizations: Sequence[str] = ORGANIZATIONS) -> Job:
+    low = rng.randrange(30, 200) * 1000
+    organization = rng.choice(organizations)
+    return Job(
+        id=f"job-{i}",
+        title=f"{rng.choice(TITLES)} {i}",
+        organization=organization,
+        location=rng.choice(LOCATIONS),
+        type=rng.choice(TYPES),
+        salary=f"${low:,} - ${low + rng.randrange(10, 60) * 1000:,}",
+        description=" ".join(rng.choices(WORDS, k=40)),
+        requirements=[" ".join(rng.choices(WORDS, k=6)) for _ in range(3)],
+        posted=f"{rng.randrange(1, 30)} days ago",
+        highlighted=rng.random() < 0.1,
+        tags=rng.sample(TAGS, 3),
+        organizationLogo="🏢",
+        organizationDescription=f"{organization} works on the world's most pressing problems.",
+    )
+
+
+def make_jobs(count: int, seed: int = 0, organizations: Optional[Sequence[Organization]] = None) -> List[Job]:
+    """Deterministic synthetic catalog of ``count`` jobs.
+
+    Jobs are spread over ``organizations`` when given, otherwise over a
+    fixed handful of organization names.
+    """
+    rng = random.Random(seed)
+    names = [org.name for org in organizations] if organizations else ORGANIZATIONS
+    return [make_job(i, rng, names) for i in range(count)]
+
+
+def organization_name(i: int) -> str:
+    return ORGANIZATIONS[i] if i < len(ORGANIZATIONS) else f"Organization {i}"
+
+
+def make_organization(i: int, rng: random.Random) -> Organization:
+    name = organization_name(i)
+    return Organization(
+        id=f"org-{i}",
+        name=name,
+        logo="🏢",
+        description=f"{name} " + " ".join(rng.choices(WORDS, k=25)),
+        location=rng.choice(LOCATIONS),
+        size=rng.choice(SIZES),
+        website=f"https://example.org/{i}",
+        tags=rng.sample(TAGS, 3),
+    )
+
+
+def make_organizations(count: int, seed: int = 0) -> List[Organization]:
+    """Deterministic synthetic set of ``count`` organizations."""
+    rng = random.Random(seed)
+    return [make_organization(i, rng) for i in range(count)]
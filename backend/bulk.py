@@ -0,0 +1,135 @@
+import csv
+import io
+import json
+import uuid
+from typing import Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from export import CSV_LIST_SEPARATOR
+from indexes import ValueIndex
+
+# (1-based row number, parsed row or the reason it couldn't be parsed)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+class BulkParseError(ValueError):
+    """The body as a whole is unreadable (as opposed to a single bad row)."""
+
+
+def external_id_index() -> ValueIndex:
+    return ValueIndex(lambda record: [record.externalId] if record.externalId else [])
+
+
+def parse_rows(body: bytes, content_type: str, list_fields: List[str]) -> List[ParsedRow]:
+    """Split a JSON array, NDJSON or CSV body into rows."""
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise BulkParseError("Body must be UTF-8")
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return _parse_csv(text, list_fields)
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return _parse_ndjson(text)
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise BulkParseError(f"Invalid JSON: {e}")
+    if not isinstance(data, list):
+        raise BulkParseError("Expected a JSON array of records")
+    return [_as_row(number, item) for number, item in enumerate(data, start=1)]
+
+
+def _as_row(number: int, item) -> ParsedRow:
+    if not isinstance(item, dict):
+        return number, None, "Expected an object"
+    return number, item, None
+
+
+def _parse_ndjson(text: str) -> List[ParsedRow]:
+    rows = []
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(_as_row(number, json.loads(line)))
+        except ValueError as e:
+            rows.append((number, None, f"Invalid JSON: {e}"))
+    return rows
+
+
+def _parse_csv(text: str, list_fields: List[str]) -> List[ParsedRow]:
+    rows = []
+    # Row 1 is the header, so data rows are numbered as they appear in the file
+    for number, raw in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = {}
+        for field, value in raw.items():
+            if field is None or value is None or value == "":
+                continue
+            if field in list_fields:
+                value = [part.strip() for part in value.split(CSV_LIST_SEPARATOR) if part.strip()]
+            row[field] = value
+        rows.append((number, row, None))
+    return rows
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def validate_rows(
+    rows: List[ParsedRow], create_model: Type[BaseModel], key: str
+) -> Tuple[List[Tuple[Optional[str], BaseModel]], List[Dict]]:
+    """Validate rows against ``create_model``.
+
+    Returns the (upsert key value, validated record) pairs and an error
+    entry for each row that failed to parse or validate.
+    """
+    valid = []
+    errors = []
+    for number, row, problem in rows:
+        if problem is not None:
+            errors.append({"row": number, "detail": problem})
+            continue
+        try:
+            record = create_model.model_validate(row)
+        except ValidationError as e:
+            errors.append({"row": number, "detail": _describe(e)})
+            continue
+        value = row.get(key)
+        valid.append((str(value) if value not in (None, "") else None, record))
+    return valid, errors
+
+
+def plan_upsert(store, external_ids: ValueIndex, model: Type[BaseModel], valid, key: str, summary: Dict):
+    """Build function for ``RecordStore.put_many`` that resolves upserts.
+
+    Records are matched on ``key`` ("externalId" or "id"); matches keep
+    their id and the rest get fresh ids. Counts go into ``summary``.
+    """
+    def build():
+        records = []
+        assigned: Dict[str, str] = {}
+        created = updated = 0
+        for key_value, record in valid:
+            record_id = assigned.get(key_value) if key_value is not None else None
+            if record_id is None and key_value is not None:
+                if key == "id":
+                    record_id = key_value if key_value in store else None
+                else:
+                    record_id = next(iter(external_ids.lookup(key_value)), None)
+            if record_id is None:
+                record_id = key_value if key == "id" and key_value else str(uuid.uuid4())
+                created += 1
+            else:
+                updated += 1
+            if key_value is not None:
+                assigned[key_value] = record_id
+            records.append(model(**record.model_dump(), id=record_id))
+        summary.update(created=created, updated=updated)
+        return records
+    return build
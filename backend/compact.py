@@ -0,0 +1,202 @@
+import dataclasses
+from operator import attrgetter
+from typing import Dict, Generic, Iterable, Type, TypeVar
+
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class Interner:
+    """Hands out one shared instance per distinct value (dictionary encoding)."""
+
+    def __init__(self):
+        self._values: Dict = {}
+
+    def __call__(self, value):
+        return self._values.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def state(self) -> Dict:
+        return self._values
+
+    def restore(self, state: Dict):
+        self._values = state
+
+    def clear(self):
+        self._values.clear()
+
+
+class ModelForm(Generic[ModelT]):
+    """How a RecordStore keeps its records in memory: as the models themselves.
+
+    ``pack`` turns a validated model into the resident record and
+    ``to_model`` turns it back. ``values``/``restore`` are the record's
+    picklable form in the binary snapshot and ``dump`` its JSON document.
+    """
+
+    def __init__(self, model: Type[ModelT]):
+        self.model = model
+        self.fields = tuple(model.model_fields)
+        self._fields_set = frozenset(self.fields)
+
+    def pack(self, record: ModelT):
+        return record
+
+    def to_model(self, record) -> ModelT:
+        return record
+
+    def dump(self, record) -> Dict:
+        return record.model_dump()
+
+    def values(self, record):
+        # Field values as validated; the dicts are never mutated in place
+        return record.__dict__
+
+    def restore(self, values):
+        return self._adopt(values)
+
+    def _adopt(self, values: Dict) -> ModelT:
+        # What unpickling a model does: adopt already-validated field values
+        # without running validators again
+        record = self.model.__new__(self.model)
+        record.__setstate__({
+            "__dict__": values,
+            "__pydantic_fields_set__": set(self._fields_set),
+            "__pydantic_extra__": None,
+            "__pydantic_private__": None,
+        })
+        return record
+
+    def clear(self):
+        """Forget shared values; called before a store reloads every record."""
+
+    def retain(self, records: Iterable):
+        """Forget shared values none of ``records`` holds any more."""
+
+    def state(self):
+        """Picklable state saved next to the records in the binary snapshot."""
+        return None
+
+    def restore_state(self, state):
+        pass
+
+
+class CompactRecord:
+    """Base of the slotted record classes built by CompactForm."""
+
+    __slots__ = ()
+
+
+class CompactForm(ModelForm[ModelT]):
+    """Records kept as slotted dataclasses with interned values.
+
+    A compact record has one slot per model field and no per-record
+    ``__dict__`` or fields-set. List fields become tuples. Values of the
+    ``interned`` fields are shared between records through an interning
+    table, and so are the items of interned list fields. For example, every
+    job at an organization holds the same name, logo and description string.
+
+    Compact records read like the model (``job.tags``, ``job.salaryMin``),
+    so indexes and projections accept either. orjson serializes them as
+    dataclasses. They are never mutated once packed.
+
+    The interning table grows as values come and go. Compaction keeps only
+    the values the records still hold (``retain``) and full loads start it
+    afresh (``clear``).
+    """
+
+    def __init__(self, model: Type[ModelT], interned: Iterable[str] = ()):
+        super().__init__(model)
+        self.interned = frozenset(interned)
+        unknown = self.interned.difference(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        self.record_type = dataclasses.make_dataclass(
+            f"Compact{model.__name__}",
+            self.fields,
+            bases=(CompactRecord,),
+            slots=True,
+            eq=False,
+            repr=False,
+        )
+        self._get_values = attrgetter(*self.fields)
+        self._intern = Interner()
+        # (field position, is a list field) for fields that need converting
+        list_fields = {name for name, field in model.model_fields.items() if _is_list(field.annotation)}
+        self._list_fields = tuple(name for name in self.fields if name in list_fields)
+        self._converted = [
+            (i, name in list_fields)
+            for i, name in enumerate(self.fields)
+            if name in self.interned or name in list_fields
+        ]
+        self._interned_positions = frozenset(i for i, name in enumerate(self.fields) if name in self.interned)
+        self._interned_fields = [(i, is_list) for i, is_list in self._converted if i in self._interned_positions]
+
+    def _compact(self, values) -> list:
+        values = list(values)
+        intern = self._intern
+        for i, is_list in self._converted:
+            value = values[i]
+            if value is None:
+                continue
+            if is_list:
+                if i in self._interned_positions:
+                    value = intern(tuple([intern(item) for item in value]))
+                else:
+                    value = tuple(value)
+            else:
+                value = intern(value)
+            values[i] = value
+        return values
+
+    def pack(self, record: ModelT) -> CompactRecord:
+        return self.record_type(*self._compact(self._get_values(record)))
+
+    def to_model(self, record: CompactRecord) -> ModelT:
+        return self._adopt(self.dump(record))
+
+    def dump(self, record: CompactRecord) -> Dict:
+        values = dict(zip(self.fields, self._get_values(record)))
+        for name in self._list_fields:
+            if values[name] is not None:
+                values[name] = list(values[name])
+        return values
+
+    def values(self, record: CompactRecord) -> tuple:
+        return self._get_values(record)
+
+    def restore(self, values) -> CompactRecord:
+        # Values come back shared from the pickle, which also carries the
+        # interning table (``state``)
+        return self.record_type(*values)
+
+    def clear(self):
+        self._intern.clear()
+
+    def retain(self, records: Iterable[CompactRecord]):
+        # Re-interning the values records hold keeps their shared instances
+        intern = Interner()
+        for record in records:
+            values = self._get_values(record)
+            for i, is_list in self._interned_fields:
+                value = values[i]
+                if value is None:
+                    continue
+                intern(value)
+                if is_list:
+                    for item in value:
+                        intern(item)
+        self._intern = intern
+
+    def state(self) -> Dict:
+        return self._intern.state()
+
+    def restore_state(self, state: Dict):
+        self._intern.restore(state)
+
+
+def _is_list(annotation) -> bool:
+    return getattr(annotation, "__origin__", None) is list
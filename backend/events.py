@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, List, NamedTuple, Optional, Set
+
+from metrics import EVENT_OVERFLOWS, EVENT_SUBSCRIBERS
+from response_cache import render_json
+
+logger = logging.getLogger(__name__)
+
+# How often the broadcaster checks repositories for changes it wasn't told
+# about (writes handled by other workers, or made straight to MongoDB)
+POLL_INTERVAL = 0.05
+
+# Changes read from a repository per round trip
+BATCH_SIZE = 500
+
+# Events a client may fall behind by before its backlog is dropped and it
+# is told to reload instead
+CLIENT_BUFFER = 256
+
+# Comment lines sent to idle streams, so proxies don't time them out
+KEEPALIVE_INTERVAL = 15.0
+
+# Streams are ended after this long. Browsers reconnect on their own and
+# resume from the last event id, which spreads clients over workers again
+# and lets a graceful shutdown finish.
+STREAM_LIFETIME = 300.0
+
+# Stands in a client's buffer for the events dropped when it overflowed
+RESET = object()
+
+
+async def wait_for_event(event: asyncio.Event, timeout: float) -> bool:
+    """Wait up to ``timeout`` for ``event``; whether it was set.
+
+    On Python 3.11, ``asyncio.wait_for`` returns normally when the task is
+    cancelled just as the event is set, and a loop around it would never
+    see the cancellation; this raises it instead.
+    """
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    if asyncio.current_task().cancelling():
+        raise asyncio.CancelledError
+    return True
+
+
+async def stop_task(task: asyncio.Task):
+    """Cancel ``task`` and wait for it to finish."""
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Only swallow the task's own cancellation, not one of the caller
+        if asyncio.current_task().cancelling():
+            raise
+
+
+class ChangeSource(NamedTuple):
+    # SSE event type for this repository's changes, e.g. "job"
+    event: str
+    repository: object
+    # Completes changed records (as a list) before they are sent
+    prepare: Optional[Callable[[list], Awaitable[list]]] = None
+
+
+class Subscriber:
+    """One client's bounded buffer of serialized events."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._events: Deque = deque()
+        self._ready = asyncio.Event()
+
+    def push(self, event):
+        if len(self._events) >= self.limit:
+            # Too slow to keep up: rather than buffer without bound, drop
+            # what it hasn't read and have it start over from the lists
+            self._events.clear()
+            event = RESET
+            EVENT_OVERFLOWS.inc()
+        self._events.append(event)
+        self._ready.set()
+
+    def backfill(self, events: list):
+        """Queue events ahead of any pushed since subscribing."""
+        if len(self._events) + len(events) > self.limit:
+            self._events.clear()
+            events = [RESET]
+            EVENT_OVERFLOWS.inc()
+        self._events.extendleft(reversed(events))
+        self._ready.set()
+
+    async def next(self, timeout: float):
+        """The next event, or None if none arrived within ``timeout``."""
+        if not self._events:
+            self._ready.clear()
+            if not await wait_for_event(self._ready, timeout):
+                return None
+        return self._events.popleft()
+
+
+class ChangeBroadcaster:
+    """Pushes repository changes to server-sent event streams.
+
+    A single task reads each repository's change feed (see
+    ``Repository.changes``) past the revisions it last sent, serializes
+    every change once and appends it to each subscriber's buffer. Write
+    handlers ``notify`` it so their changes go out at once; anything else
+    (other workers, other API replicas on MongoDB) is picked up within
+    ``poll_interval``.
+
+    Buffers hold at most ``client_buffer`` events. A client that falls
+    further behind loses its backlog and gets a ``reset`` event telling it
+    to reload, so a slow reader never holds memory or the broadcaster up.
+
+    Event ids are the revisions of every source, dot-separated in source
+    order; a reconnecting browser sends the last one back as
+    Last-Event-ID and is sent what it missed.
+    """
+
+    def __init__(self, sources: List[ChangeSource], poll_interval: float = POLL_INTERVAL,
+                 client_buffer: int = CLIENT_BUFFER, keepalive_interval: float = KEEPALIVE_INTERVAL,
+                 stream_lifetime: float = STREAM_LIFETIME, fast_json: bool = False):
+        self.sources = sources
+        self.fast_json = fast_json
+        self.poll_interval = poll_interval
+        self.client_buffer = client_buffer
+        self.keepalive_interval = keepalive_interval
+        self.stream_lifetime = stream_lifetime
+        # The revision of each source up to which events have been sent
+        self.revisions: List[int] = [0] * len(sources)
+        self._subscribers: Set[Subscriber] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        for i, source in enumerate(self.sources):
+            self.revisions[i] = await source.repository.revision()
+        # Created here so it belongs to the running event loop
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        await stop_task(self._task)
+        self._task = None
+
+    def notify(self):
+        """Send out new changes now rather than at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            await wait_for_event(self._wake, self.poll_interval)
+            self._wake.clear()
+            for i, source in enumerate(self.sources):
+                try:
+                    await self._publish(i, source)
+                except Exception:
+                    logger.exception(f"Error publishing {source.event} events")
+
+    async def _publish(self, i: int, source: ChangeSource):
+        repository = source.repository
+        await repository.refresh()
+        if await repository.revision() == self.revisions[i]:
+            return
+        if not self._subscribers:
+            # Nobody to tell; new subscribers start from here
+            self.revisions[i] = await repository.revision()
+            return
+        more = True
+        while more:
+            changes = await repository.changes(self.revisions[i], BATCH_SIZE)
+            if changes.reset:
+                self.revisions[i] = changes.revision
+                self._broadcast([RESET])
+                return
+            events = await self._render(i, source, changes.items)
+            self.revisions[i] = changes.revision
+            self._broadcast(events)
+            more = changes.more
+
+    async def _render(self, i: int, source: ChangeSource, items: list,
+                      revisions: Optional[List[int]] = None) -> List[bytes]:
+        """SSE messages for changes to source ``i``.
+
+        Their ids take the other sources' revisions from ``revisions``
+        (those already broadcast by default).
+        """
+        revisions = list(self.revisions if revisions is None else revisions)
+        records = [record for _, _, record in items if record is not None]
+        if source.prepare is not None:
+            records = await source.prepare(records)
+        records = iter(records)
+        events = []
+        for revision, record_id, record in items:
+            data = {
+                "id": record_id,
+                "revision": revision,
+                "deleted": record is None,
+                "record": None if record is None else next(records),
+            }
+            revisions[i] = revision
+            event_id = ".".join(str(revision) for revision in revisions)
+            events.append(b"id: %s\nevent: %s\ndata: %s\n\n" % (
+                event_id.encode(), source.event.encode(), render_json(data, self.fast_json),
+            ))
+        return events
+
+    def _broadcast(self, events: list):
+        for subscriber in self._subscribers:
+            for event in events:
+                subscriber.push(event)
+
+    def _reset_event(self) -> bytes:
+        revisions = {source.event: self.revisions[i] for i, source in enumerate(self.sources)}
+        event_id = ".".join(str(revision) for revision in self.revisions)
+        return b"id: %s\nevent: reset\ndata: %s\n\n" % (event_id.encode(), json.dumps(revisions).encode())
+
+    def _parse_event_id(self, last_event_id: Optional[str]) -> Optional[List[int]]:
+        try:
+            revisions = [int(part) for part in last_event_id.split(".")]
+        except (AttributeError, ValueError):
+            return None
+        return revisions if len(revisions) == len(self.sources) else None
+
+    async def _missed(self, last_event_id: Optional[str]) -> list:
+        """What a reconnecting client missed, or a reset if that's too much."""
+        revisions = self._parse_event_id(last_event_id)
+        if revisions is None:
+            return []
+        events = []
+        for i, source in enumerate(self.sources):
+            changes = await source.repository.changes(revisions[i], self.client_buffer)
+            if changes.reset or changes.more:
+                return [RESET]
+            events.extend(await self._render(i, source, changes.items, revisions))
+            revisions[i] = changes.revision
+        return events
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """A client's event stream, until it disconnects."""
+        subscriber = Subscriber(self.client_buffer)
+        # Subscribe before catching up, so nothing falls in between. An
+        # event may then arrive twice, or a stale one after a newer one,
+        # but the latest state of every record still comes last
+        self._subscribers.add(subscriber)
+        EVENT_SUBSCRIBERS.inc()
+        try:
+            # Tell EventSource to wait a few seconds before reconnecting
+            yield b"retry: 3000\n\n"
+            subscriber.backfill(await self._missed(last_event_id))
+            deadline = time.monotonic() + self.stream_lifetime
+            while (remaining := deadline - time.monotonic()) > 0:
+                event = await subscriber.next(min(self.keepalive_interval, remaining))
+                if event is None:
+                    if time.monotonic() < deadline:
+                        yield b": keepalive\n\n"
+                elif event is RESET:
+                    yield self._reset_event()
+                else:
+                    yield event
+        finally:
+            self._subscribers.discard(subscriber)
+            EVENT_SUBSCRIBERS.dec()
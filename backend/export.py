@@ -0,0 +1,58 @@
+import asyncio
+import csv
+import io
+from typing import AsyncIterator, List
+
+from response_cache import render_json
+
+# Records serialized per chunk; bounds the memory a single export holds
+EXPORT_CHUNK_SIZE = 500
+
+# Separator for list fields (tags, requirements) in CSV rows
+CSV_LIST_SEPARATOR = "|"
+
+
+async def _chunked(records: AsyncIterator, render_chunk) -> AsyncIterator[bytes]:
+    chunk: List = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield render_chunk(chunk)
+            chunk = []
+            # Let other requests run between chunks of a large export
+            await asyncio.sleep(0)
+    if chunk:
+        yield render_chunk(chunk)
+
+
+def stream_ndjson(records: AsyncIterator, fast: bool = False) -> AsyncIterator[bytes]:
+    """One JSON document per line."""
+    def render_chunk(chunk) -> bytes:
+        return b"".join(render_json(record, fast) + b"\n" for record in chunk)
+    return _chunked(records, render_chunk)
+
+
+async def stream_csv(records: AsyncIterator, fields: List[str]) -> AsyncIterator[bytes]:
+    """CSV with a header row; list fields are joined with CSV_LIST_SEPARATOR."""
+    def render_rows(rows) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+        return buffer.getvalue().encode("utf-8")
+
+    def render_chunk(chunk) -> bytes:
+        rows = []
+        for record in chunk:
+            row = []
+            for field in fields:
+                value = getattr(record, field)
+                if isinstance(value, (list, tuple)):
+                    value = CSV_LIST_SEPARATOR.join(value)
+                row.append("" if value is None else value)
+            rows.append(row)
+        return render_rows(rows)
+
+    yield render_rows([fields])
+    async for chunk in _chunked(records, render_chunk):
+        yield chunk
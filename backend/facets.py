@@ -0,0 +1,290 @@
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from indexes import StoreIndex
+from job_index import SALARY_BANDS
+
+# Facets reported by ``FacetIndex.facets``, in response order
+FACETS = ("tags", "type", "location", "salary_band")
+
+# Filters answered from bitmaps; the rest go through JobIndex.match first
+BITMAP_FILTERS = frozenset(("highlighted", "tags", "type", "location", "salary_band"))
+
+# Facets whose counts ignore their own filter, so picking a type still shows
+# how many jobs the other types have. Tags combine with AND, so their counts
+# say how many jobs would remain with that tag added.
+EXCLUSIVE_FACETS = frozenset(("type", "location", "salary_band"))
+
+WORD_BITS = 64
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+else:  # pragma: no cover - NumPy < 2
+    _BYTE_COUNTS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words: np.ndarray) -> np.ndarray:
+        as_bytes = words.view(np.uint8).reshape(*words.shape[:-1], -1)
+        return _BYTE_COUNTS[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+def salary_band(salary_min: Optional[int]) -> Optional[str]:
+    if salary_min is None:
+        return None
+    for name, (low, high) in SALARY_BANDS.items():
+        if (low is None or salary_min >= low) and (high is None or salary_min <= high):
+            return name
+    return None
+
+
+def ordered(facet: str, counts: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+    """Salary bands in band order, other facets by descending count."""
+    if facet == "salary_band":
+        found = dict(counts)
+        return [(band, found[band]) for band in SALARY_BANDS if band in found]
+    return sorted(counts, key=lambda item: (-item[1], item[0].lower()))
+
+
+def _bits(row: int) -> Tuple[int, np.uint64]:
+    return row // WORD_BITS, np.uint64(1 << (row % WORD_BITS))
+
+
+def _bits_of(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``_bits`` of an array of rows."""
+    return rows // WORD_BITS, np.left_shift(np.uint64(1), (rows % WORD_BITS).astype(np.uint64))
+
+
+def _pack(rows: np.ndarray, words: int) -> np.ndarray:
+    """Bitset of ``rows``, set word by word rather than through a bool per row."""
+    packed = np.zeros(words, dtype=np.uint64)
+    np.bitwise_or.at(packed, *_bits_of(rows))
+    return packed
+
+
+class Bitmaps:
+    """One bitset over record rows per distinct value of a field.
+
+    Bitsets are packed into the rows of a uint64 matrix (64 records per
+    word), so intersecting a filter with every value and counting the
+    survivors is a handful of vectorized operations. Keys are matched
+    case-insensitively; ``labels`` keep the first spelling seen.
+    """
+
+    def __init__(self, values: Callable[[object], Iterable[str]], words: int):
+        self._values = values
+        self._codes: Dict[Hashable, int] = {}
+        self.labels: List[str] = []
+        self._matrix = np.zeros((8, words), dtype=np.uint64)
+
+    def clear(self, words: int):
+        self._codes.clear()
+        self.labels.clear()
+        self._matrix = np.zeros((8, words), dtype=np.uint64)
+
+    def grow(self, words: int):
+        matrix = np.zeros((self._matrix.shape[0], words), dtype=np.uint64)
+        matrix[:, :self._matrix.shape[1]] = self._matrix
+        self._matrix = matrix
+
+    def _code(self, value: str) -> int:
+        key = value.lower()
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.labels)
+            self.labels.append(value)
+            if code == self._matrix.shape[0]:
+                matrix = np.zeros((2 * code, self._matrix.shape[1]), dtype=np.uint64)
+                matrix[:code] = self._matrix
+                self._matrix = matrix
+        return code
+
+    def set(self, row: int, record):
+        word, bit = _bits(row)
+        for value in self._values(record):
+            # Coded first: a new value may replace the matrix
+            code = self._code(value)
+            self._matrix[code, word] |= bit
+
+    def unset(self, row: int, record):
+        word, bit = _bits(row)
+        for value in self._values(record):
+            code = self._codes.get(value.lower())
+            if code is not None:
+                self._matrix[code, word] &= ~bit
+
+    def build(self, records: list, words: int):
+        """Replace every bitset from ``records``, the i-th being row i."""
+        self.clear(words)
+        codes: List[int] = []
+        rows: List[int] = []
+        for row, record in enumerate(records):
+            for value in self._values(record):
+                codes.append(self._code(value))
+                rows.append(row)
+        word, bit = _bits_of(np.array(rows, dtype=np.int64))
+        np.bitwise_or.at(self._matrix, (np.array(codes, dtype=np.int64), word), bit)
+
+    def lookup(self, value: str) -> Optional[np.ndarray]:
+        code = self._codes.get(value.lower())
+        return None if code is None else self._matrix[code]
+
+    def union(self, keys: Iterable[str], words: int) -> np.ndarray:
+        codes = [self._codes[key] for key in keys]
+        if not codes:
+            return np.zeros(words, dtype=np.uint64)
+        return np.bitwise_or.reduce(self._matrix[codes], axis=0)
+
+    def keys(self) -> Iterable[str]:
+        return self._codes.keys()
+
+    def counts(self, mask: np.ndarray) -> List[Tuple[str, int]]:
+        """(label, number of rows in ``mask``) per value, skipping zeros."""
+        counts = _popcount(self._matrix[:len(self.labels)] & mask)
+        return [(self.labels[code], int(count)) for code, count in enumerate(counts) if count]
+
+    def state(self):
+        return self._codes, self.labels, self._matrix
+
+    def restore(self, state):
+        self._codes, self.labels, self._matrix = state
+
+
+class FacetIndex(StoreIndex):
+    """Per-value bitmaps over jobs for the filter sidebar's counts.
+
+    Every job gets a row (rows of deleted jobs are reused) and each tag,
+    type, location, salary band and highlighted value a bitset of the rows
+    carrying it. A filter combination becomes a mask ANDed from those
+    bitsets, and each facet's counts are one popcount per value over its
+    bitsets intersected with the mask, independent of how many jobs match.
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._words = 1
+        self._alive = np.zeros(self._words, dtype=np.uint64)
+        self.columns = {
+            "highlighted": Bitmaps(lambda job: ["true" if job.highlighted else "false"], self._words),
+            "tags": Bitmaps(lambda job: job.tags, self._words),
+            "type": Bitmaps(lambda job: [job.type], self._words),
+            "location": Bitmaps(lambda job: [job.location], self._words),
+            "salary_band": Bitmaps(
+                lambda job: [band] if (band := salary_band(job.salaryMin)) else [], self._words
+            ),
+        }
+
+    def clear(self):
+        self._rows.clear()
+        self._free.clear()
+        self._words = 1
+        self._alive = np.zeros(self._words, dtype=np.uint64)
+        for column in self.columns.values():
+            column.clear(self._words)
+
+    def _allocate(self, job_id: str) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._rows)
+            if row >= self._words * WORD_BITS:
+                self._grow(2 * self._words)
+        self._rows[job_id] = row
+        return row
+
+    def _grow(self, words: int):
+        alive = np.zeros(words, dtype=np.uint64)
+        alive[:self._words] = self._alive
+        self._alive = alive
+        self._words = words
+        for column in self.columns.values():
+            column.grow(words)
+
+    def add(self, job):
+        row = self._allocate(job.id)
+        word, bit = _bits(row)
+        self._alive[word] |= bit
+        for column in self.columns.values():
+            column.set(row, job)
+
+    def discard(self, job):
+        row = self._rows.pop(job.id, None)
+        if row is None:
+            return
+        word, bit = _bits(row)
+        self._alive[word] &= ~bit
+        for column in self.columns.values():
+            column.unset(row, job)
+        self._free.append(row)
+
+    def rebuild(self, jobs):
+        self.clear()
+        self._words = max(1, -(-len(jobs) // WORD_BITS))
+        self._rows = {job.id: row for row, job in enumerate(jobs)}
+        self._alive = _pack(np.arange(len(jobs), dtype=np.int64), self._words)
+        for column in self.columns.values():
+            column.build(jobs, self._words)
+
+    def state(self):
+        columns = {name: column.state() for name, column in self.columns.items()}
+        return self._rows, self._free, self._words, self._alive, columns
+
+    def restore(self, state):
+        self._rows, self._free, self._words, self._alive, columns = state
+        for name, column in self.columns.items():
+            column.restore(columns[name])
+
+    def mask(self, ids: Set[str]) -> np.ndarray:
+        """Bitset of the rows of ``ids``."""
+        rows = np.fromiter((self._rows[job_id] for job_id in ids), dtype=np.int64, count=len(ids))
+        return _pack(rows, self._words)
+
+    def _filter_masks(self, highlighted=None, tags=None, type=None, location=None,
+                      salary_band=None) -> Dict[str, np.ndarray]:
+        empty = np.zeros(self._words, dtype=np.uint64)
+        masks: Dict[str, np.ndarray] = {}
+        if highlighted is not None:
+            found = self.columns["highlighted"].lookup("true" if highlighted else "false")
+            masks["highlighted"] = empty if found is None else found
+        if tags:
+            combined = self._alive
+            for tag in tags:
+                found = self.columns["tags"].lookup(tag)
+                combined = combined & (empty if found is None else found)
+            masks["tags"] = combined
+        for name, value in (("type", type), ("salary_band", salary_band)):
+            if value:
+                found = self.columns[name].lookup(value)
+                masks[name] = empty if found is None else found
+        if location:
+            # Substring match like JobIndex, over the distinct locations only
+            column = self.columns["location"]
+            needle = location.lower()
+            masks["location"] = column.union([key for key in column.keys() if needle in key], self._words)
+        return masks
+
+    def facets(self, filters: Dict, ids: Optional[Set[str]] = None) -> Tuple[int, Dict[str, List[Tuple[str, int]]]]:
+        """Number of matching jobs and (label, count) pairs per facet.
+
+        ``filters`` are the BITMAP_FILTERS keyword arguments of
+        ``JobIndex.match``; ``ids`` narrows to jobs that already passed the
+        other filters (None means every job).
+        """
+        base = self._alive if ids is None else self.mask(ids)
+        masks = self._filter_masks(**filters)
+
+        def combined(skip: Optional[str] = None) -> np.ndarray:
+            mask = base
+            for name, filter_mask in masks.items():
+                if name != skip:
+                    mask = mask & filter_mask
+            return mask
+
+        everything = combined()
+        total = int(_popcount(everything))
+        counts = {}
+        for name in FACETS:
+            mask = combined(name) if name in EXCLUSIVE_FACETS else everything
+            counts[name] = ordered(name, self.columns[name].counts(mask))
+        return total, counts
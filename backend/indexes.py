@@ -0,0 +1,82 @@
+from collections import defaultdict
+from typing import Callable, Dict, Hashable, Iterable, Optional, Set
+
+
+class StoreIndex:
+    """Secondary index kept in step with a RecordStore.
+
+    The store calls ``add`` for every record it writes, ``discard`` with the
+    previous version of a record before it is replaced or deleted, and
+    ``rebuild`` with all records on a full reload.
+
+    Indexes that return a picklable ``state`` are saved in the store's
+    binary snapshot and brought back with ``restore`` instead of being
+    rebuilt on startup. The state may share structures with the index; it
+    is pickled while no writes are applied.
+    """
+
+    def clear(self):
+        raise NotImplementedError
+
+    def add(self, record):
+        raise NotImplementedError
+
+    def discard(self, record):
+        raise NotImplementedError
+
+    def rebuild(self, records):
+        self.clear()
+        for record in records:
+            self.add(record)
+
+    def state(self):
+        return None
+
+    def restore(self, state):
+        raise NotImplementedError
+
+
+class ValueIndex(StoreIndex):
+    """Maps each key produced by ``keys(record)`` to the ids carrying it."""
+
+    def __init__(self, keys: Callable[[object], Iterable[Hashable]]):
+        self._keys = keys
+        self._ids: Dict[Hashable, Set[str]] = defaultdict(set)
+
+    def clear(self):
+        self._ids.clear()
+
+    def add(self, record):
+        for key in self._keys(record):
+            self._ids[key].add(record.id)
+
+    def discard(self, record):
+        for key in self._keys(record):
+            ids = self._ids.get(key)
+            if ids is None:
+                continue
+            ids.discard(record.id)
+            if not ids:
+                del self._ids[key]
+
+    def state(self):
+        return self._ids
+
+    def restore(self, state):
+        self._ids = state
+
+    def keys(self) -> Iterable[Hashable]:
+        return self._ids.keys()
+
+    def lookup(self, key: Hashable) -> Set[str]:
+        return self._ids.get(key, set())
+
+    def count(self, key: Hashable) -> int:
+        return len(self._ids.get(key, ()))
+
+
+def intersect(current: Optional[Set[str]], ids: Set[str]) -> Set[str]:
+    """Narrow a candidate set; ``None`` means "no constraint yet"."""
+    if current is None:
+        return set(ids)
+    return current & ids
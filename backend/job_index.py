@@ -0,0 +1,247 @@
+import re
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Set, Tuple
+
+from indexes import StoreIndex, ValueIndex, intersect
+
+# A whole number (not the tail of another number), and a thousands suffix
+# that isn't the start of a word
+SALARY_AMOUNT_PATTERN = re.compile(r"([$£€])?\s*(?<![\d.,])(\d[\d,]*(?:\.\d+)?)\s*([kK])?(?!\w)")
+# Benefits named like amounts: "Competitive + 401k" has no salary in it
+SALARY_NON_AMOUNT_PATTERN = re.compile(r"\b401\s*\(?k\)?(?!\w)", re.IGNORECASE)
+SALARY_RANGE_SEPARATOR = re.compile(r"\s*(?:-|–|—|to)\s*", re.IGNORECASE)
+SALARY_CURRENCY_PATTERN = re.compile(r"\b(USD|GBP|EUR|CAD|AUD|CHF)\b")
+CURRENCY_SYMBOLS = {"$": "USD", "£": "GBP", "€": "EUR"}
+
+# Larger amounts are typos or junk, and wouldn't fit the stores' integers
+MAX_SALARY_AMOUNT = 10 ** 9
+
+# Same bands as the job board's salary dropdown, as inclusive ranges over the
+# lower end of a job's salary
+SALARY_BANDS = {
+    "under-50k": (None, 49999),
+    "50k-100k": (50000, 100000),
+    "over-100k": (100001, None),
+}
+
+# Sort orders accepted by the jobs list, mapped to "descending"
+SORTS = {
+    "salary": False,
+    "-salary": True,
+}
+
+
+def parse_salary(salary: str) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    """Split a free-form salary into (min, max, currency).
+
+    "$120,000 - $150,000" -> (120000, 150000, "USD"), "£40k" -> (40000, 40000,
+    "GBP"); a suffix on the last amount of a range applies to all of it, so
+    "$100-120k" -> (100000, 120000, "USD"). Strings without an amount such
+    as "Competitive" give all None, and amounts over ``MAX_SALARY_AMOUNT``
+    raise ValueError.
+    """
+    amounts = []
+    currency = None
+    previous = None
+    text = SALARY_NON_AMOUNT_PATTERN.sub(" ", salary)
+    for match in SALARY_AMOUNT_PATTERN.finditer(text):
+        symbol, number, thousands = match.groups()
+        amount = float(number.replace(",", ""))
+        if thousands:
+            amount *= 1000
+            if (previous is not None and not previous.group(3)
+                    and SALARY_RANGE_SEPARATOR.fullmatch(text, previous.end(), match.start())):
+                amounts[-1] *= 1000
+        amounts.append(amount)
+        previous = match
+        if symbol and currency is None:
+            currency = CURRENCY_SYMBOLS[symbol]
+    # Also catches inf, from more digits than a float holds
+    if not all(amount <= MAX_SALARY_AMOUNT for amount in amounts):
+        raise ValueError(f"Salary amounts can't be over {MAX_SALARY_AMOUNT:,}")
+    amounts = [int(amount) for amount in amounts]
+    if not amounts:
+        return None, None, None
+    if currency is None:
+        code = SALARY_CURRENCY_PATTERN.search(salary)
+        currency = code.group(1) if code else None
+    return min(amounts), max(amounts), currency
+
+
+class SalaryIndex(StoreIndex):
+    """Jobs ordered by the lower end of their salary range.
+
+    Range filters and salary sorting are answered by bisecting the sorted
+    (salaryMin, id) entries; jobs without a parseable salary are kept aside
+    and never match a range.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[int, str]] = []
+        self._amounts: Dict[str, int] = {}
+        self._unpriced: Set[str] = set()
+        self._arranged: Dict[bool, Tuple[List[str], list]] = {}
+
+    def clear(self):
+        self._entries.clear()
+        self._amounts.clear()
+        self._unpriced.clear()
+        self._arranged.clear()
+
+    def add(self, job):
+        if job.salaryMin is None:
+            self._unpriced.add(job.id)
+        else:
+            insort(self._entries, (job.salaryMin, job.id))
+            self._amounts[job.id] = job.salaryMin
+        self._arranged.clear()
+
+    def rebuild(self, jobs):
+        # Sort once rather than insort each job, which is quadratic
+        self.clear()
+        for job in jobs:
+            if job.salaryMin is None:
+                self._unpriced.add(job.id)
+            else:
+                self._amounts[job.id] = job.salaryMin
+        self._entries = sorted((amount, job_id) for job_id, amount in self._amounts.items())
+
+    def state(self):
+        # The arranged orders are a cache, rebuilt on demand
+        return self._entries, self._amounts, self._unpriced
+
+    def restore(self, state):
+        self._entries, self._amounts, self._unpriced = state
+        self._arranged.clear()
+
+    def discard(self, job):
+        amount = self._amounts.pop(job.id, None)
+        if amount is None:
+            self._unpriced.discard(job.id)
+        else:
+            i = bisect_left(self._entries, (amount, job.id))
+            del self._entries[i]
+        self._arranged.clear()
+
+    def range(self, low: Optional[int] = None, high: Optional[int] = None) -> Set[str]:
+        """Ids of jobs whose salaryMin lies in [low, high]."""
+        start = 0 if low is None else bisect_left(self._entries, low, key=lambda e: e[0])
+        end = len(self._entries) if high is None else bisect_right(self._entries, high, key=lambda e: e[0])
+        return {job_id for _, job_id in self._entries[start:end]}
+
+    def sort_key(self, job_id: str, descending: bool = False) -> tuple:
+        # Unpriced jobs sort last in either direction
+        amount = self._amounts.get(job_id)
+        if amount is None:
+            return (1, 0, job_id)
+        return (0, -amount if descending else amount, job_id)
+
+    def arrange(self, ids: Optional[Set[str]], descending: bool = False) -> Tuple[List[str], list]:
+        """Candidate ids in salary order together with their ascending sort keys."""
+        if ids is not None:
+            keyed = sorted((self.sort_key(job_id, descending), job_id) for job_id in ids)
+            return [job_id for _, job_id in keyed], [key for key, _ in keyed]
+        if descending not in self._arranged:
+            entries = sorted(self._entries, key=lambda e: (-e[0], e[1])) if descending else self._entries
+            ordered = [job_id for _, job_id in entries] + sorted(self._unpriced)
+            keys = [self.sort_key(job_id, descending) for job_id in ordered]
+            self._arranged[descending] = (ordered, keys)
+        return self._arranged[descending]
+
+
+class JobIndex(StoreIndex):
+    """Secondary indexes over jobs used to answer list filters.
+
+    Exact-valued filters (highlighted, type, tags, organization) are answered
+    from value->ids sets and salary bands/ranges from the salary index.
+    Location is matched as a substring against the distinct locations rather
+    than every job, and search scans the lowercased title/organization of the
+    remaining candidates only.
+    """
+
+    def __init__(self):
+        self.highlighted = ValueIndex(lambda job: [job.highlighted])
+        self.types = ValueIndex(lambda job: [job.type.lower()])
+        self.tags = ValueIndex(lambda job: {tag.lower() for tag in job.tags})
+        self.locations = ValueIndex(lambda job: [job.location.lower()])
+        self.organizations = ValueIndex(lambda job: [job.organization.lower()])
+        self.salaries = SalaryIndex()
+        self._indexes = [
+            self.highlighted,
+            self.types,
+            self.tags,
+            self.locations,
+            self.organizations,
+            self.salaries,
+        ]
+        self._search_text: Dict[str, str] = {}
+
+    def clear(self):
+        for index in self._indexes:
+            index.clear()
+        self._search_text.clear()
+
+    def add(self, job):
+        for index in self._indexes:
+            index.add(job)
+        self._search_text[job.id] = f"{job.title}\n{job.organization}".lower()
+
+    def discard(self, job):
+        for index in self._indexes:
+            index.discard(job)
+        self._search_text.pop(job.id, None)
+
+    def rebuild(self, jobs):
+        for index in self._indexes:
+            index.rebuild(jobs)
+        self._search_text = {job.id: f"{job.title}\n{job.organization}".lower() for job in jobs}
+
+    def state(self):
+        return [index.state() for index in self._indexes], self._search_text
+
+    def restore(self, state):
+        states, self._search_text = state
+        for index, index_state in zip(self._indexes, states):
+            index.restore(index_state)
+
+    def match(
+        self,
+        search: Optional[str] = None,
+        highlighted: Optional[bool] = None,
+        salary_band: Optional[str] = None,
+        min_salary: Optional[int] = None,
+        max_salary: Optional[int] = None,
+        tags: Optional[List[str]] = None,
+        type: Optional[str] = None,
+        location: Optional[str] = None,
+        organization: Optional[str] = None,
+    ) -> Optional[Set[str]]:
+        """Ids of jobs matching every given filter, or None if none were given."""
+        ids: Optional[Set[str]] = None
+        if highlighted is not None:
+            ids = intersect(ids, self.highlighted.lookup(highlighted))
+        if salary_band:
+            ids = intersect(ids, self.salaries.range(*SALARY_BANDS[salary_band]))
+        if min_salary is not None or max_salary is not None:
+            ids = intersect(ids, self.salaries.range(min_salary, max_salary))
+        if type:
+            ids = intersect(ids, self.types.lookup(type.lower()))
+        if organization:
+            ids = intersect(ids, self.organizations.lookup(organization.lower()))
+        for tag in tags or []:
+            ids = intersect(ids, self.tags.lookup(tag.lower()))
+        if location:
+            needle = location.lower()
+            located: Set[str] = set()
+            for key in self.locations.keys():
+                if needle in key:
+                    located |= self.locations.lookup(key)
+            ids = intersect(ids, located)
+        if search:
+            needle = search.lower()
+            candidates = self._search_text.keys() if ids is None else ids
+            ids = {
+                job_id for job_id in candidates
+                if needle in self._search_text[job_id]
+            }
+        return ids
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds between saves of a worker's values for the other workers to report
+SHARE_INTERVAL = 2.0
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _summed(states: Iterable[list]) -> Dict[Labels, float]:
+    # Each state is a list of [labels, value] pairs from one worker
+    values: Dict[Labels, float] = {}
+    for state in states:
+        for labels, value in state:
+            labels = tuple(labels)
+            values[labels] = values.get(labels, 0) + value
+    return values
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metric:
+    """A metric family.
+
+    ``state`` is this worker's values as JSON, and ``samples`` renders the
+    values of every worker, given the other workers' states.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def state(self) -> list:
+        raise NotImplementedError
+
+    def samples(self, others: Iterable[list] = ()) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, others: Iterable[list] = ()) -> str:
+        samples = self.samples(others)
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *samples])
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def state(self) -> list:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def samples(self, others: Iterable[list] = ()) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(_summed([self.state(), *others]).items())
+        ]
+
+
+class Gauge(Metric):
+    """A value that goes up and down, summed over the workers.
+
+    With ``local`` only the reporting worker's value counts, for gauges it
+    sets from shared state when scraped.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), local: bool = False):
+        super().__init__(name, help, labels)
+        self.local = local
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def state(self) -> list:
+        return [[list(labels), value] for labels, value in self._values.items()]
+
+    def samples(self, others: Iterable[list] = ()) -> List[str]:
+        values = self._values if self.local else _summed([self.state(), *others])
+        return [
+            f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: observations per bucket (the last one is +Inf) and their sum
+        self._counts: Dict[Labels, List[int]] = {}
+        self._sums: Dict[Labels, float] = {}
+
+    def observe(self, value: float, *labels: str):
+        counts = self._counts.get(labels)
+        if counts is None:
+            counts = self._counts[labels] = [0] * (len(self.buckets) + 1)
+            self._sums[labels] = 0.0
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[labels] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def state(self) -> list:
+        return [[list(labels), counts, self._sums[labels]] for labels, counts in self._counts.items()]
+
+    def samples(self, others: Iterable[list] = ()) -> List[str]:
+        all_counts: Dict[Labels, List[int]] = {}
+        sums: Dict[Labels, float] = {}
+        for state in [self.state(), *others]:
+            for labels, counts, total in state:
+                labels = tuple(labels)
+                if len(counts) != len(self.buckets) + 1:
+                    # Saved with other buckets (a different version)
+                    continue
+                merged = all_counts.setdefault(labels, [0] * len(counts))
+                for i, count in enumerate(counts):
+                    merged[i] += count
+                sums[labels] = sums.get(labels, 0.0) + total
+        lines = []
+        for labels, counts in sorted(all_counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labels, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(sums[labels])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics a process reports, optionally across uvicorn workers.
+
+    Each worker keeps its own values, and a scrape reaches just one of
+    them. After ``start(directory)`` every worker saves its values there
+    (``<pid>.json``, every ``share_interval``) and ``render`` adds up the
+    saved values of the other live workers to its own. Those are at most
+    one interval old. A worker that died stops counting, which Prometheus
+    reads as a counter reset.
+    """
+
+    def __init__(self, share_interval: float = SHARE_INTERVAL):
+        self.metrics: List[Metric] = []
+        self.share_interval = share_interval
+        self.directory: Optional[Path] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        others = self._read_others()
+        return ("\n".join(
+            metric.render([worker.get(metric.name, []) for worker in others]) for metric in self.metrics
+        ) + "\n").encode()
+
+    def _path(self, pid: int) -> Path:
+        return self.directory / f"{pid}.json"
+
+    def _save(self, content: str):
+        path = self._path(os.getpid())
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(content)
+        os.replace(tmp_path, path)
+
+    def _read_others(self) -> List[Dict[str, list]]:
+        if self.directory is None:
+            return []
+        others = []
+        for path in self.directory.glob("*.json"):
+            try:
+                pid = int(path.stem)
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            try:
+                if not _alive(pid):
+                    # Left behind by a worker that exited or an earlier run
+                    path.unlink(missing_ok=True)
+                    continue
+                others.append(json.loads(path.read_text()))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable metrics {path.name}: {e}")
+        return others
+
+    async def start(self, directory: Path):
+        """Share this worker's values through ``directory`` and report the other workers'."""
+        directory.mkdir(parents=True, exist_ok=True)
+        self.directory = directory
+        self._task = asyncio.create_task(self._share())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._path(os.getpid()).unlink(missing_ok=True)
+        self.directory = None
+
+    async def _share(self):
+        while True:
+            # Read on the event loop, which is the only thing changing them
+            content = json.dumps({metric.name: metric.state() for metric in self.metrics})
+            try:
+                await asyncio.to_thread(self._save, content)
+            except OSError:
+                logger.exception("Error saving metrics")
+            await asyncio.sleep(self.share_interval)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "http_requests_total", "HTTP requests handled.", ["method", "route", "status"],
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route.", ["method", "route"],
+))
+HTTP_REQUESTS_IN_PROGRESS = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled.",
+))
+STORE_OPERATION_SECONDS = REGISTRY.register(Histogram(
+    "store_operation_duration_seconds",
+    "Time spent loading, flushing (log append + fsync) and compacting stores.",
+    ["store", "operation"],
+))
+STORE_BATCH_MUTATIONS = REGISTRY.register(Histogram(
+    "store_commit_batch_mutations", "Mutations flushed per group commit.", ["store"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+))
+RESPONSE_CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "response_cache_lookups_total", "Serialized response cache lookups.", ["cache", "result"],
+))
+# Set by the worker that is scraped, from the shared stores
+RECORDS = REGISTRY.register(Gauge(
+    "store_records", "Records held by each repository, as of the last scrape.", ["store"], local=True,
+))
+REVISION = REGISTRY.register(Gauge(
+    "store_revision", "Current revision of each repository, as of the last scrape.", ["store"], local=True,
+))
+EVENT_SUBSCRIBERS = REGISTRY.register(Gauge(
+    "event_stream_subscribers", "Clients connected to the server-sent event stream.",
+))
+EVENT_OVERFLOWS = REGISTRY.register(Counter(
+    "event_stream_overflows_total", "Event backlogs dropped because a client fell too far behind.",
+))
+SIMILAR_JOBS_REFRESH_SECONDS = REGISTRY.register(Histogram(
+    "similar_jobs_refresh_duration_seconds",
+    "Time to bring similar-job neighbours up to date: rebuilding them all, adopting the saved table, "
+    "updating changed jobs, or loading the table another worker saved.",
+    ["mode"],
+))
+
+
+class MetricsMiddleware:
+    """Counts and times every HTTP request by its route template.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so requests pay for a couple
+    of dict updates and no extra task or body buffering. The route is read
+    from the scope after the router has matched it, so ``/api/jobs/{job_id}``
+    is one series however many ids are requested.
+    """
+
+    def __init__(self, app, skip_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(method, path, status)
+            HTTP_REQUEST_SECONDS.observe(elapsed, method, path)
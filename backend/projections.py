@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+# Descriptions in summaries are cut to roughly what a list card shows
+SUMMARY_DESCRIPTION_LENGTH = 280
+
+# A projection is either "summary" or the tuple of selected field names
+Projection = Union[str, Tuple[str, ...]]
+
+
+def parse_projection(fields: Optional[str], view: Optional[str], field_names) -> Optional[Projection]:
+    """Projection requested by the ``fields``/``view`` query parameters.
+
+    Returns None for full records. ``id`` is always included in field
+    selections. Raises ValueError for unknown fields or views.
+    """
+    if fields and view:
+        raise ValueError("Use either fields or view, not both")
+    if view:
+        if view != "summary":
+            raise ValueError(f"Unknown view: {view}")
+        return "summary"
+    if not fields:
+        return None
+    selected = ["id"]
+    for name in fields.split(","):
+        name = name.strip()
+        if not name or name in selected:
+            continue
+        if name not in field_names:
+            raise ValueError(f"Unknown field: {name}")
+        selected.append(name)
+    return tuple(selected)
+
+
+def _snippet(text: str) -> str:
+    if len(text) <= SUMMARY_DESCRIPTION_LENGTH:
+        return text
+    return text[:SUMMARY_DESCRIPTION_LENGTH].rsplit(" ", 1)[0] + "…"
+
+
+def job_summary(job) -> Dict:
+    """What a job card renders: no requirements or organization blurb."""
+    return {
+        "id": job.id,
+        "title": job.title,
+        "organization": job.organization,
+        "organizationLogo": job.organizationLogo,
+        "location": job.location,
+        "type": job.type,
+        "salary": job.salary,
+        "posted": job.posted,
+        "highlighted": job.highlighted,
+        "tags": job.tags,
+        "description": _snippet(job.description),
+    }
+
+
+def organization_summary(org) -> Dict:
+    return {
+        "id": org.id,
+        "name": org.name,
+        "logo": org.logo,
+        "location": org.location,
+        "jobs": org.jobs,
+        "tags": org.tags,
+        "description": _snippet(org.description),
+    }
+
+
+class ProjectionCache:
+    """Projected records, reused until the store revision changes.
+
+    Each projection keeps a dict of record id -> projected record, so pages
+    with different filters share the work. Everything is dropped when the
+    revision moves on; at most ``max_projections`` field sets are kept.
+    """
+
+    def __init__(self, summary: Callable[[object], Dict], max_projections: int = 32):
+        self.summary = summary
+        self.max_projections = max_projections
+        self.revision = None
+        self._projected: "OrderedDict[Projection, Dict[str, Dict]]" = OrderedDict()
+
+    def _project_one(self, record, projection: Projection) -> Dict:
+        if projection == "summary":
+            return self.summary(record)
+        return {name: getattr(record, name) for name in projection}
+
+    def project(self, records: list, revision, projection: Optional[Projection]) -> list:
+        if projection is None:
+            return records
+        if revision != self.revision:
+            self._projected.clear()
+            self.revision = revision
+        projected = self._projected.get(projection)
+        if projected is None:
+            projected = self._projected[projection] = {}
+            while len(self._projected) > self.max_projections:
+                self._projected.popitem(last=False)
+        self._projected.move_to_end(projection)
+        result: List[Dict] = []
+        for record in records:
+            item = projected.get(record.id)
+            if item is None:
+                item = projected[record.id] = self._project_one(record, projection)
+            result.append(item)
+        return result
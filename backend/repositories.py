@@ -0,0 +1,639 @@
+import asyncio
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from operator import itemgetter
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+
+from autocomplete import KIND_ORDER, normalize
+from bulk import plan_upsert
+from facets import BITMAP_FILTERS, EXCLUSIVE_FACETS, FACETS, ordered
+from job_index import SALARY_BANDS, SORTS
+from search import FIELD_WEIGHTS
+
+# Documents fetched per round trip when streaming a collection
+MONGO_BATCH_SIZE = 500
+
+# Case-insensitive equality for list filters, matching the JSON backend
+CASE_INSENSITIVE = {"locale": "en", "strength": 2}
+
+# Bookkeeping fields stored next to the record fields in Mongo documents
+INTERNAL_FIELDS = ("_id", "position", "revision", "salaryMissing", "salarySort", "score")
+
+# Seconds after which a Mongo write that took revisions but never said it
+# finished (its process died) stops holding the change feed back
+PENDING_TIMEOUT = 60
+
+
+class Page(NamedTuple):
+    items: list
+    total: int
+    next_after: Optional[object]
+
+
+class Changes(NamedTuple):
+    # Pass as ``since`` to get the changes after these
+    revision: int
+    # The caller's revision is too old (or unknown): ``items`` holds every
+    # record, to replace whatever the caller has
+    reset: bool
+    more: bool
+    # (revision, id, record or None if deleted), oldest first
+    items: list
+    # Set while a reset is paged through: pass it as ``after``, with
+    # ``revision`` as ``since``, for the next page. Later pages aren't
+    # resets themselves, and may delete ids that were never listed
+    after: Optional[int] = None
+
+
+def changes_page(since: int, reset: bool, items: list, limit: int, revision: int) -> Changes:
+    """The Changes for ``items`` fetched ``limit + 1`` at a time, up to ``revision``."""
+    more = len(items) > limit
+    items = items[:limit]
+    if not more:
+        return Changes(revision, reset, False, items)
+    last = items[-1][0]
+    if last < since:
+        # Still listing records older than ``since``
+        return Changes(since, reset, True, items, last)
+    return Changes(last, reset, True, items)
+
+
+class Repository:
+    """Storage behind the job and organization endpoints.
+
+    ``list`` filters are the keyword arguments of ``JobIndex.match`` and
+    ``sort`` is one of ``job_index.SORTS`` (None keeps insertion order).
+    ``after`` is the ``next_after`` sort key of the previous page, so both
+    backends must produce the same key shapes: the position for insertion
+    order and (missing, amount, id) for salary sorts.
+
+    ``get`` and ``search`` return models. ``list`` pages and
+    ``changed_since`` may hold a backend's resident records instead, which
+    read and serialize like the models (see compact.py).
+    """
+
+    async def start(self):
+        raise NotImplementedError
+
+    async def stop(self):
+        raise NotImplementedError
+
+    async def refresh(self):
+        """Pick up changes made outside this process, if the backend needs to."""
+
+    async def revision(self) -> int:
+        raise NotImplementedError
+
+    async def is_empty(self) -> bool:
+        raise NotImplementedError
+
+    async def count(self) -> int:
+        raise NotImplementedError
+
+    async def reset(self, records: list):
+        raise NotImplementedError
+
+    async def get(self, record_id: str):
+        raise NotImplementedError
+
+    async def list(self, filters: Optional[Dict] = None, sort: Optional[str] = None,
+                   after=None, offset: int = 0, limit: Optional[int] = None) -> Page:
+        raise NotImplementedError
+
+    async def search(self, query: str, offset: int, limit: int) -> Tuple[list, int]:
+        raise NotImplementedError
+
+    def changed_since(self, since: Optional[int]) -> AsyncIterator:
+        raise NotImplementedError
+
+    async def changes(self, since: int, limit: int, after: Optional[int] = None) -> Changes:
+        """Up to ``limit`` creations, updates and deletions after revision ``since``.
+
+        A reset lists every record, oldest revision first, ``limit`` at a
+        time; ``after`` continues it (see ``Changes.after``).
+        """
+        raise NotImplementedError
+
+    async def count_by_organization(self, names: List[str]) -> Dict[str, int]:
+        """Number of jobs per organization name (matched case-insensitively)."""
+        raise NotImplementedError
+
+    async def facets(self, filters: Dict) -> Tuple[int, Dict[str, List[Tuple[str, int]]]]:
+        """Number of jobs matching ``filters`` and (value, count) pairs per facet.
+
+        See ``facets.FACETS``; type, location and salary band counts leave
+        out their own filter.
+        """
+        raise NotImplementedError
+
+    async def suggest(self, prefix: str, limit: int) -> List[Tuple[str, str, int]]:
+        """Up to ``limit`` (kind, value, count) typeahead terms with a word starting with ``prefix``.
+
+        Most frequent first; see ``autocomplete.PrefixIndex``.
+        """
+        raise NotImplementedError
+
+    async def create(self, record):
+        raise NotImplementedError
+
+    async def replace(self, record) -> bool:
+        raise NotImplementedError
+
+    async def delete(self, record_id: str) -> bool:
+        raise NotImplementedError
+
+    async def bulk_upsert(self, valid: list, key: str) -> Tuple[int, int]:
+        """Upsert validated (key value, create model) pairs; returns (created, updated)."""
+        raise NotImplementedError
+
+
+class FileRepository(Repository):
+    """The process-resident RecordStore persisted to JSON files.
+
+    Records leave the store as models only where a handler needs one;
+    list pages and exports are served from the resident records.
+    """
+
+    def __init__(self, store, external_ids, index=None, search_index=None, facet_index=None,
+                 prefix_index=None):
+        self.store = store
+        self.external_ids = external_ids
+        self.index = index
+        self.search_index = search_index
+        self.facet_index = facet_index
+        self.prefix_index = prefix_index
+
+    async def start(self):
+        self.store.start()
+        await self.store.load()
+
+    async def stop(self):
+        await self.store.stop()
+
+    async def refresh(self):
+        await self.store.refresh()
+
+    async def revision(self) -> int:
+        return self.store.revision
+
+    async def is_empty(self) -> bool:
+        return len(self.store) == 0
+
+    async def count(self) -> int:
+        return len(self.store)
+
+    async def reset(self, records: list):
+        await self.store.reset(records)
+
+    async def get(self, record_id: str):
+        record = self.store.get(record_id)
+        return self.store.form.to_model(record) if record is not None else None
+
+    async def list(self, filters=None, sort=None, after=None, offset=0, limit=None) -> Page:
+        ids = self.index.match(**filters) if filters and self.index else None
+        order = None
+        if sort is not None:
+            descending = SORTS[sort]
+            order = lambda candidates: self.index.salaries.arrange(candidates, descending)
+        return Page(*self.store.select(ids, after=after, offset=offset, limit=limit, order=order))
+
+    async def search(self, query: str, offset: int, limit: int) -> Tuple[list, int]:
+        ranked, total = self.search_index.search(query, offset + limit)
+        to_model = self.store.form.to_model
+        return [to_model(self.store.get(record_id)) for record_id, _ in ranked[offset:]], total
+
+    async def changed_since(self, since: Optional[int]):
+        # The listing is replaced rather than mutated on writes, so it is a
+        # consistent snapshot to iterate over
+        for record in self.store.records:
+            if since is None or (self.store.revision_of(record.id) or 0) > since:
+                yield record
+
+    async def changes(self, since: int, limit: int, after: Optional[int] = None) -> Changes:
+        store = self.store
+        reset = since < store.horizon or since > store.revision
+        if reset:
+            since, after = store.revision, -1
+        elif after is None:
+            after = since
+        # One extra change tells us whether there are more
+        items = store.changes(after, limit + 1, deletions_since=since)
+        return changes_page(since, reset, items, limit, store.revision)
+
+    async def count_by_organization(self, names: List[str]) -> Dict[str, int]:
+        # Read off the organization index, which every job write keeps current
+        return {name: self.index.organizations.count(name.lower()) for name in names}
+
+    async def facets(self, filters: Dict):
+        # Search, organization and salary ranges narrow the candidates first;
+        # everything else is intersected as bitmaps
+        others = {name: value for name, value in filters.items() if name not in BITMAP_FILTERS}
+        ids = self.index.match(**others) if others else None
+        bitmap_filters = {name: value for name, value in filters.items() if name in BITMAP_FILTERS}
+        return self.facet_index.facets(bitmap_filters, ids)
+
+    async def suggest(self, prefix: str, limit: int) -> List[Tuple[str, str, int]]:
+        return self.prefix_index.suggest(prefix, limit)
+
+    async def create(self, record):
+        await self.store.put(record)
+
+    async def replace(self, record) -> bool:
+        return await self.store.replace(record)
+
+    async def delete(self, record_id: str) -> bool:
+        return await self.store.delete(record_id)
+
+    async def bulk_upsert(self, valid: list, key: str) -> Tuple[int, int]:
+        summary = {"created": 0, "updated": 0}
+        await self.store.put_many(plan_upsert(self.store, self.external_ids, self.store.model, valid, key, summary))
+        return summary["created"], summary["updated"]
+
+
+def job_filter_query(search=None, highlighted=None, salary_band=None, min_salary=None, max_salary=None,
+                     tags=None, type=None, location=None, organization=None) -> Dict:
+    """Mongo query equivalent of ``JobIndex.match``."""
+    clauses: List[Dict] = []
+    if highlighted is not None:
+        clauses.append({"highlighted": highlighted})
+    ranges = []
+    if salary_band:
+        ranges.append(SALARY_BANDS[salary_band])
+    if min_salary is not None or max_salary is not None:
+        ranges.append((min_salary, max_salary))
+    for low, high in ranges:
+        bounds = {}
+        if low is not None:
+            bounds["$gte"] = low
+        if high is not None:
+            bounds["$lte"] = high
+        clauses.append({"salaryMin": bounds})
+    if type:
+        clauses.append({"type": type})
+    if organization:
+        clauses.append({"organization": organization})
+    if tags:
+        clauses.append({"tags": {"$all": list(tags)}})
+    if location:
+        clauses.append({"location": {"$regex": re.escape(location), "$options": "i"}})
+    if search:
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        clauses.append({"$or": [{"title": pattern}, {"organization": pattern}]})
+    return {"$and": clauses} if clauses else {}
+
+
+def _salary_band_expression() -> Dict:
+    branches = []
+    for band, (low, high) in SALARY_BANDS.items():
+        conditions: List[Dict] = [{"$isNumber": "$salaryMin"}]
+        if low is not None:
+            conditions.append({"$gte": ["$salaryMin", low]})
+        if high is not None:
+            conditions.append({"$lte": ["$salaryMin", high]})
+        branches.append({"case": {"$and": conditions}, "then": band})
+    return {"$switch": {"branches": branches, "default": None}}
+
+
+# Aggregation stages producing {_id: value, count} rows per facet
+FACET_STAGES = {
+    "tags": [{"$unwind": "$tags"}, {"$group": {"_id": "$tags", "count": {"$sum": 1}}}],
+    "type": [{"$group": {"_id": "$type", "count": {"$sum": 1}}}],
+    "location": [{"$group": {"_id": "$location", "count": {"$sum": 1}}}],
+    "salary_band": [{"$group": {"_id": _salary_band_expression(), "count": {"$sum": 1}}}],
+}
+
+
+JOB_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True),
+    IndexModel(
+        [("externalId", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"externalId": {"$type": "string"}},
+    ),
+    IndexModel([("revision", ASCENDING)]),
+    # List queries run with the case-insensitive collation, so the indexes
+    # they use must share it
+    IndexModel([("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("organization", ASCENDING), ("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("tags", ASCENDING), ("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("type", ASCENDING), ("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("highlighted", ASCENDING), ("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("salaryMin", ASCENDING), ("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel(
+        [("salaryMissing", ASCENDING), ("salarySort", ASCENDING), ("id", ASCENDING)],
+        collation=CASE_INSENSITIVE,
+    ),
+    IndexModel(
+        [("salaryMissing", ASCENDING), ("salarySort", -1), ("id", ASCENDING)],
+        collation=CASE_INSENSITIVE,
+    ),
+    IndexModel(
+        [(field, "text") for field in FIELD_WEIGHTS],
+        weights=FIELD_WEIGHTS,
+        name="job_text",
+    ),
+]
+
+ORGANIZATION_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True),
+    IndexModel(
+        [("externalId", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"externalId": {"$type": "string"}},
+    ),
+    IndexModel([("revision", ASCENDING)]),
+    IndexModel([("position", ASCENDING)], collation=CASE_INSENSITIVE),
+    IndexModel([("name", ASCENDING)], collation=CASE_INSENSITIVE),
+]
+
+TOMBSTONE_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True),
+    IndexModel([("revision", ASCENDING)]),
+]
+
+
+class MongoRepository(Repository):
+    """Records stored in a MongoDB collection through Motor.
+
+    Filtering, sorting and pagination are pushed into indexed queries, so
+    any number of API replicas can share the collection. A document per
+    collection in ``counters`` hands out revisions (for caching and change
+    tracking) and positions (for stable insertion order). It also keeps the
+    horizon: the revision of the last reset, before which changes can't be
+    reported. Deleted ids are kept in ``<name>_tombstones``.
+
+    Writes finish in any order, so a revision handed out isn't necessarily
+    visible yet. Each write lists itself as pending in the counter while it
+    runs, and ``revision`` and ``changes`` only go as far as the writes
+    before the oldest pending one, so readers never skip past one.
+    """
+
+    def __init__(self, db, name: str, model, indexes: List[IndexModel],
+                 filter_query: Optional[Callable[..., Dict]] = None,
+                 suggest_fields: Optional[Dict[str, str]] = None):
+        self.collection = db[name]
+        self.tombstones = db[f"{name}_tombstones"]
+        self.counters = db.counters
+        self.name = name
+        self.model = model
+        self.indexes = indexes
+        self.filter_query = filter_query
+        # Suggestion kind -> the document field its values come from
+        self.suggest_fields = suggest_fields or {}
+
+    async def start(self):
+        await self.collection.create_indexes(self.indexes)
+        await self.tombstones.create_indexes(TOMBSTONE_INDEXES)
+
+    async def stop(self):
+        pass
+
+    @asynccontextmanager
+    async def _allocate(self, revisions: int = 1, positions: int = 0):
+        """Reserve consecutive revisions/positions for the write in the block.
+
+        Yields the first of each. Readers stay below them until the block
+        exits (or ``PENDING_TIMEOUT`` passes).
+        """
+        token = uuid.uuid4().hex
+        now = time.time()
+        # Revisions issued so far bound ours from below; abandoned writes are
+        # cleared on the way
+        before = await self.counters.find_one_and_update(
+            {"_id": self.name}, {"$pull": {"pending": {"at": {"$lt": now - PENDING_TIMEOUT}}}}
+        )
+        counter = await self.counters.find_one_and_update(
+            {"_id": self.name},
+            {
+                "$inc": {"revision": revisions, "position": positions},
+                "$push": {"pending": {"token": token, "floor": before["revision"] if before else 0, "at": now}},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        try:
+            yield counter["revision"] - revisions + 1, counter["position"] - positions + 1
+        finally:
+            await self.counters.update_one({"_id": self.name}, {"$pull": {"pending": {"token": token}}})
+
+    async def _committed(self) -> Tuple[int, int]:
+        """The revision every write up to has finished, and the horizon."""
+        counter = await self.counters.find_one({"_id": self.name}) or {}
+        cutoff = time.time() - PENDING_TIMEOUT
+        floors = [write["floor"] for write in counter.get("pending", ()) if write["at"] >= cutoff]
+        return min([counter.get("revision", 0)] + floors), counter.get("horizon", 0)
+
+    async def revision(self) -> int:
+        revision, _ = await self._committed()
+        return revision
+
+    def _document(self, record, revision: int) -> Dict:
+        document = record.model_dump()
+        document["revision"] = revision
+        if "salaryMin" in document:
+            document["salaryMissing"] = int(document["salaryMin"] is None)
+            document["salarySort"] = document["salaryMin"] or 0
+        return document
+
+    def _record(self, document: Dict):
+        return self.model(**{k: v for k, v in document.items() if k not in INTERNAL_FIELDS})
+
+    async def is_empty(self) -> bool:
+        return await self.collection.find_one({}, {"_id": 1}) is None
+
+    async def count(self) -> int:
+        # From collection metadata, so scraping metrics never scans
+        return await self.collection.estimated_document_count()
+
+    async def reset(self, records: list):
+        await self.collection.delete_many({})
+        await self.tombstones.delete_many({})
+        # At least one revision, so the horizon moves past every earlier change
+        async with self._allocate(max(len(records), 1), len(records)) as (revision, position):
+            await self.counters.update_one({"_id": self.name}, {"$set": {"horizon": revision}})
+            if not records:
+                return
+            documents = []
+            for i, record in enumerate(records):
+                document = self._document(record, revision + i)
+                document["position"] = position + i
+                documents.append(document)
+            await self.collection.insert_many(documents)
+
+    async def get(self, record_id: str):
+        document = await self.collection.find_one({"id": record_id})
+        return self._record(document) if document else None
+
+    async def list(self, filters=None, sort=None, after=None, offset=0, limit=None) -> Page:
+        query = self.filter_query(**filters) if filters and self.filter_query else {}
+        if sort is None:
+            sort_spec = [("position", ASCENDING)]
+            key_of = lambda document: document["position"]
+            after_query = lambda: {"position": {"$gt": after}}
+        else:
+            descending = SORTS[sort]
+            sort_spec = [("salaryMissing", ASCENDING), ("salarySort", -1 if descending else 1), ("id", ASCENDING)]
+            key_of = lambda document: (
+                document["salaryMissing"],
+                -document["salarySort"] if descending else document["salarySort"],
+                document["id"],
+            )
+
+            def after_query():
+                missing, amount, record_id = after
+                amount = -amount if descending else amount
+                return {"$or": [
+                    {"salaryMissing": {"$gt": missing}},
+                    {"salaryMissing": missing, "salarySort": {"$lt" if descending else "$gt": amount}},
+                    {"salaryMissing": missing, "salarySort": amount, "id": {"$gt": record_id}},
+                ]}
+
+        total = await self.collection.count_documents(query, collation=CASE_INSENSITIVE)
+        page_query = {"$and": [query, after_query()]} if after is not None else query
+        cursor = self.collection.find(page_query, collation=CASE_INSENSITIVE).sort(sort_spec).skip(offset)
+        if limit is not None:
+            # One extra document tells us whether there is a next page
+            cursor = cursor.limit(limit + 1)
+        documents = await cursor.to_list(None)
+        next_after = None
+        if limit is not None and len(documents) > limit:
+            documents = documents[:limit]
+            next_after = key_of(documents[-1])
+        return Page([self._record(document) for document in documents], total, next_after)
+
+    async def search(self, query: str, offset: int, limit: int) -> Tuple[list, int]:
+        text_query = {"$text": {"$search": query}}
+        total = await self.collection.count_documents(text_query)
+        cursor = (
+            self.collection.find(text_query, {"score": {"$meta": "textScore"}})
+            .sort([("score", {"$meta": "textScore"}), ("id", ASCENDING)])
+            .skip(offset)
+            .limit(limit)
+        )
+        return [self._record(document) for document in await cursor.to_list(None)], total
+
+    async def changed_since(self, since: Optional[int]):
+        query = {} if since is None else {"revision": {"$gt": since}}
+        cursor = self.collection.find(query).sort("position", ASCENDING).batch_size(MONGO_BATCH_SIZE)
+        async for document in cursor:
+            yield self._record(document)
+
+    async def changes(self, since: int, limit: int, after: Optional[int] = None) -> Changes:
+        # Read first, so changes made meanwhile are sent again rather than missed
+        revision, horizon = await self._committed()
+        reset = since < horizon or since > revision
+        if reset:
+            since, after = revision, -1
+        elif after is None:
+            after = since
+        # Later writes may already be visible; they come once the ones
+        # before them have finished
+        query = {"revision": {"$gt": after, "$lte": revision}}
+        deletions = {"revision": {"$gt": since, "$lte": revision}}
+        documents = await self.collection.find(query).sort("revision", ASCENDING).limit(limit + 1).to_list(None)
+        tombstones = await self.tombstones.find(deletions).sort("revision", ASCENDING).limit(limit + 1).to_list(None)
+        items = sorted(
+            [(document["revision"], document["id"], self._record(document)) for document in documents]
+            + [(tombstone["revision"], tombstone["id"], None) for tombstone in tombstones],
+            key=itemgetter(0),
+        )
+        return changes_page(since, reset, items, limit, revision)
+
+    async def count_by_organization(self, names: List[str]) -> Dict[str, int]:
+        pipeline = [
+            {"$match": {"organization": {"$in": list(names)}}},
+            {"$group": {"_id": "$organization", "count": {"$sum": 1}}},
+        ]
+        # Grouping under the collation folds case like the $match does
+        rows = await self.collection.aggregate(pipeline, collation=CASE_INSENSITIVE).to_list(None)
+        counts = {row["_id"].lower(): row["count"] for row in rows}
+        return {name: counts.get(name.lower(), 0) for name in names}
+
+    async def facets(self, filters: Dict):
+        async def count(facet: Optional[str]):
+            facet_filters = dict(filters)
+            if facet in EXCLUSIVE_FACETS:
+                facet_filters.pop(facet, None)
+            query = self.filter_query(**facet_filters)
+            if facet is None:
+                return await self.collection.count_documents(query, collation=CASE_INSENSITIVE)
+            pipeline = [{"$match": query}, *FACET_STAGES[facet]]
+            # Grouping under the collation folds case like the bitmaps do
+            rows = await self.collection.aggregate(pipeline, collation=CASE_INSENSITIVE).to_list(None)
+            return ordered(facet, [(row["_id"], row["count"]) for row in rows if row["_id"] is not None])
+
+        total, *counts = await asyncio.gather(count(None), *(count(facet) for facet in FACETS))
+        return total, dict(zip(FACETS, counts))
+
+    async def suggest(self, prefix: str, limit: int) -> List[Tuple[str, str, int]]:
+        words = normalize(prefix).split()
+        if not words:
+            return []
+        # A word start anywhere in the value, like PrefixIndex. Unanchored,
+        # so this scans the collection; the JSON backend is the fast path
+        pattern = {"$regex": r"(?:^|\W)" + r"\W+".join(re.escape(word) for word in words), "$options": "i"}
+
+        async def terms(kind: str, field: str):
+            # $unwind passes single values through, and splits tag lists so
+            # only the matching tags are counted
+            pipeline = [
+                {"$match": {field: pattern}},
+                {"$unwind": f"${field}"},
+                {"$match": {field: pattern}},
+                {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": limit},
+            ]
+            rows = await self.collection.aggregate(pipeline, collation=CASE_INSENSITIVE).to_list(None)
+            return [(kind, row["_id"], row["count"]) for row in rows]
+
+        found = await asyncio.gather(*(terms(kind, field) for kind, field in self.suggest_fields.items()))
+        ranked = sorted(
+            (term for kind_terms in found for term in kind_terms),
+            key=lambda term: (-term[2], normalize(term[1]), KIND_ORDER[term[0]]),
+        )
+        return ranked[:limit]
+
+    async def create(self, record):
+        async with self._allocate(1, 1) as (revision, position):
+            document = self._document(record, revision)
+            document["position"] = position
+            await self.collection.insert_one(document)
+
+    async def replace(self, record) -> bool:
+        async with self._allocate() as (revision, _):
+            updated = await self.collection.find_one_and_update(
+                {"id": record.id}, {"$set": self._document(record, revision)}
+            )
+        return updated is not None
+
+    async def delete(self, record_id: str) -> bool:
+        result = await self.collection.delete_one({"id": record_id})
+        if result.deleted_count != 1:
+            return False
+        async with self._allocate() as (revision, _):
+            await self.tombstones.update_one({"id": record_id}, {"$set": {"revision": revision}}, upsert=True)
+        return True
+
+    async def bulk_upsert(self, valid: list, key: str) -> Tuple[int, int]:
+        if not valid:
+            return 0, 0
+        async with self._allocate(len(valid), len(valid)) as (revision, position):
+            operations = []
+            for i, (key_value, record) in enumerate(valid):
+                new_id = key_value if key == "id" and key_value else str(uuid.uuid4())
+                document = self._document(self.model(**record.model_dump(), id=new_id), revision + i)
+                del document["id"]
+                match = {key: key_value} if key_value is not None else {"id": new_id}
+                operations.append(UpdateOne(
+                    match,
+                    {"$set": document, "$setOnInsert": {"id": new_id, "position": position + i}},
+                    upsert=True,
+                ))
+            # Ordered, so a key repeated within the batch updates its first row
+            result = await self.collection.bulk_write(operations, ordered=True)
+        return result.upserted_count, result.matched_count
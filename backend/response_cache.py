@@ -0,0 +1,133 @@
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+from compact import CompactRecord
+from metrics import RESPONSE_CACHE_LOOKUPS
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_SIZE = 1024
+
+CACHE_CONTROL = "no-cache"
+
+
+def _model_fields(value):
+    if isinstance(value, BaseModel):
+        return value.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _dump_model(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, CompactRecord):
+        return {name: getattr(value, name) for name in value.__slots__}
+    return jsonable_encoder(value)
+
+
+def render_json(content, fast: bool = False) -> bytes:
+    """Serialize the way FastAPI's JSONResponse does.
+
+    With ``fast`` (and orjson installed) models are dumped straight from
+    their field values, skipping jsonable_encoder (compact records are
+    dataclasses, which orjson handles natively). Only use it for records
+    that were validated when they entered the store.
+    """
+    if fast and orjson is not None:
+        return orjson.dumps(content, default=_model_fields)
+    return json.dumps(
+        content,
+        default=_dump_model,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class CachedBody:
+    """A serialized response body plus its ETag and extra headers."""
+
+    def __init__(self, revision: int, body: bytes, headers: Dict[str, str]):
+        self.revision = revision
+        self.body = body
+        self.headers = headers
+        # Weak, because the gzipped variant shares the tag. The headers are
+        # part of it since they carry totals and cursors.
+        digest = hashlib.blake2b(body, digest_size=16)
+        digest.update(json.dumps(sorted(headers.items())).encode())
+        self.etag = 'W/"%s"' % digest.hexdigest()
+        self._gzipped: Optional[bytes] = None
+
+    @property
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.body, compresslevel=6)
+        return self._gzipped
+
+    def respond(self, request: Request) -> Response:
+        headers = {
+            **self.headers,
+            "ETag": self.etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": "Accept-Encoding",
+        }
+        if_none_match = request.headers.get("if-none-match", "")
+        if self.etag in (tag.strip() for tag in if_none_match.split(",")) or if_none_match.strip() == "*":
+            return Response(status_code=304, headers=headers)
+        body = self.body
+        if len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+            body = self.gzipped
+            headers["Content-Encoding"] = "gzip"
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Serialized list responses keyed by URL, valid for one store revision.
+
+    Repeat requests for an unchanged store skip querying and serialization,
+    and clients sending the ETag back get an empty 304.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, fast_json: bool = False):
+        self.name = name
+        self.max_entries = max_entries
+        self.fast_json = fast_json
+        self._entries: "OrderedDict[str, CachedBody]" = OrderedDict()
+
+    @staticmethod
+    def key(request: Request) -> str:
+        return request.url.path + "?" + "&".join(sorted(
+            f"{name}={value}" for name, value in request.query_params.multi_items()
+        ))
+
+    def get(self, request: Request, revision: int) -> Optional[CachedBody]:
+        key = self.key(request)
+        cached = self._entries.get(key)
+        if cached is None or cached.revision != revision:
+            RESPONSE_CACHE_LOOKUPS.inc(self.name, "miss")
+            return None
+        RESPONSE_CACHE_LOOKUPS.inc(self.name, "hit")
+        self._entries.move_to_end(key)
+        return cached
+
+    def put(self, request: Request, revision: int, content, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        key = self.key(request)
+        cached = CachedBody(revision, render_json(content, self.fast_json), headers or {})
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cached
@@ -0,0 +1,141 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from indexes import StoreIndex
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our "
+    "that the their this to we will with you your".split()
+)
+
+# Term frequency multipliers per field, so a title hit outranks a passing
+# mention in the description
+FIELD_WEIGHTS = {
+    "title": 3,
+    "tags": 2,
+    "organization": 2,
+    "description": 1,
+    "requirements": 1,
+}
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+# Vocabularies are small next to token counts, so caching stems makes
+# indexing much faster
+@lru_cache(maxsize=1 << 17)
+def stem(token: str) -> str:
+    """Light suffix stripping so "engineers"/"engineering" meet "engineer"."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for suffix, replacement in (
+        ("ies", "y"),
+        ("sses", "ss"),
+        ("ing", ""),
+        ("ed", ""),
+        ("ly", ""),
+        ("s", ""),
+    ):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            if suffix == "s" and token.endswith("ss"):
+                return token
+            return token[: -len(suffix)] + replacement
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        stem(token)
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def job_fields(job) -> Dict[str, str]:
+    return {
+        "title": job.title,
+        "tags": " ".join(job.tags),
+        "organization": job.organization,
+        "description": job.description,
+        "requirements": " ".join(job.requirements),
+    }
+
+
+class SearchIndex(StoreIndex):
+    """Inverted index over jobs with BM25 ranking.
+
+    Postings map each stemmed term to the weighted term frequency per job
+    id and are updated incrementally as jobs are written. A query only
+    touches the postings of its own terms, never the whole catalog.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def clear(self):
+        self._postings.clear()
+        self._lengths.clear()
+        self._total_length = 0
+
+    def _terms(self, job) -> Counter:
+        terms: Counter = Counter()
+        for field, text in job_fields(job).items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                terms[term] += weight
+        return terms
+
+    def add(self, job):
+        terms = self._terms(job)
+        for term, frequency in terms.items():
+            self._postings[term][job.id] = frequency
+        length = sum(terms.values())
+        self._lengths[job.id] = length
+        self._total_length += length
+
+    def discard(self, job):
+        for term in self._terms(job):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(job.id, None)
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(job.id, 0)
+
+    def state(self):
+        return self._postings, self._lengths, self._total_length
+
+    def restore(self, state):
+        self._postings, self._lengths, self._total_length = state
+
+    def search(self, query: str, k: Optional[int] = None) -> Tuple[List[Tuple[str, float]], int]:
+        """The ``k`` best (job id, BM25 score) pairs and the number of matches."""
+        documents = len(self._lengths)
+        if not documents:
+            return [], 0
+        average_length = self._total_length / documents
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+            for job_id, frequency in postings.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[job_id] / average_length)
+                scores[job_id] += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        # Break score ties by id so paging through results is stable
+        rank = lambda item: (-item[1], item[0])
+        if k is None:
+            return sorted(scores.items(), key=rank), len(scores)
+        return heapq.nsmallest(k, scores.items(), key=rank), len(scores)
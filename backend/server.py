@@ -1,19 +1,43 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from typing import List, Optional
 import uuid
 from datetime import datetime
 import json
-import aiofiles
+import base64
+import math
 from bson import ObjectId
 
+from autocomplete import PrefixIndex, job_terms, normalize, organization_terms
+from bulk import BulkParseError, external_id_index, parse_rows, validate_rows
+from compact import CompactForm
+from events import ChangeBroadcaster, ChangeSource
+from export import stream_csv, stream_ndjson
+from facets import FACETS, FacetIndex
+from job_index import JobIndex, SALARY_BANDS, SORTS, parse_salary
+from metrics import CONTENT_TYPE, RECORDS, REGISTRY, REVISION, MetricsMiddleware
+from projections import ProjectionCache, job_summary, organization_summary, parse_projection
+from repositories import (
+    FileRepository,
+    JOB_INDEXES,
+    MongoRepository,
+    ORGANIZATION_INDEXES,
+    job_filter_query,
+)
+from response_cache import ResponseCache, render_json
+from search import SearchIndex
+from similar import NEIGHBOURS, SimilarJobs
+from status_log import BUCKETS, StatusLog
+from store import RecordStore, StoreWriteError
+
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -35,9 +59,20 @@ security = HTTPBearer()
 # Simple admin token (in production, use proper JWT authentication)
 ADMIN_TOKEN = "admin-token-80000-hours"
 
+# Serialize store records with orjson instead of the response_model pipeline
+FAST_JSON = os.environ.get('FAST_JSON', 'false').lower() == 'true'
+
+# Where jobs and organizations live: "json" files or "mongo"
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').lower()
+
 # File paths for JSON storage (backup to MongoDB)
-JOBS_FILE = ROOT_DIR / "jobs.json"
-ORGANIZATIONS_FILE = ROOT_DIR / "organizations.json"
+DATA_DIR = Path(os.environ.get('DATA_DIR', ROOT_DIR))
+JOBS_FILE = DATA_DIR / "jobs.json"
+ORGANIZATIONS_FILE = DATA_DIR / "organizations.json"
+# Similar jobs table, kept by one worker and loaded by the others
+SIMILAR_JOBS_FILE = DATA_DIR / "jobs.similar.npz"
+# Each worker's metrics, so any of them can report them all
+METRICS_DIR = DATA_DIR / "worker_metrics"
 
 # Define Models
 class StatusCheck(BaseModel):
@@ -48,6 +83,11 @@ class StatusCheck(BaseModel):
 class StatusCheckCreate(BaseModel):
     client_name: str
 
+class StatusBucket(BaseModel):
+    client_name: str
+    bucket: datetime
+    count: int
+
 class Job(BaseModel):
     id: Optional[str] = None
     title: str
@@ -62,6 +102,28 @@ class Job(BaseModel):
     tags: List[str]
     organizationLogo: str = "🏢"
     organizationDescription: str = ""
+    externalId: Optional[str] = None
+    # Derived from salary whenever a Job is built, so never trust client values
+    salaryMin: Optional[int] = None
+    salaryMax: Optional[int] = None
+    salaryCurrency: Optional[str] = None
+
+    @model_validator(mode="after")
+    def parse_salary_range(self):
+        try:
+            self.salaryMin, self.salaryMax, self.salaryCurrency = parse_salary(self.salary)
+        except ValueError:
+            # Saved before amounts were bounded; JobCreate rejects these now
+            self.salaryMin = self.salaryMax = self.salaryCurrency = None
+        return self
+
+# Job fields with few distinct values, repeated across postings; resident
+# jobs share one copy of each. Titles, salaries and posting dates are
+# mostly distinct, and interning them would only grow the table
+JOB_INTERNED_FIELDS = (
+    "organization", "location", "type", "tags",
+    "organizationLogo", "organizationDescription", "salaryCurrency",
+)
 
 class JobCreate(BaseModel):
     title: str
@@ -75,6 +137,14 @@ class JobCreate(BaseModel):
     tags: List[str]
     organizationLogo: str = "🏢"
     organizationDescription: str = ""
+    externalId: Optional[str] = None
+
+    @field_validator("salary")
+    @classmethod
+    def check_salary(cls, salary: str) -> str:
+        # Amounts too large to store are a 422 here rather than a failed write
+        parse_salary(salary)
+        return salary
 
 class Organization(BaseModel):
     id: Optional[str] = None
@@ -86,6 +156,43 @@ class Organization(BaseModel):
     website: str
     jobs: int = 0
     tags: List[str]
+    externalId: Optional[str] = None
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class JobFacets(BaseModel):
+    total: int
+    tags: List[FacetCount]
+    type: List[FacetCount]
+    location: List[FacetCount]
+    salary_band: List[FacetCount]
+
+class Suggestion(BaseModel):
+    # One of autocomplete.SUGGESTION_KINDS
+    kind: str
+    value: str
+    # Jobs carrying the value
+    count: int
+
+class JobChange(BaseModel):
+    id: str
+    revision: int
+    deleted: bool
+    # None for deletions
+    record: Optional[Job] = None
+
+class JobChanges(BaseModel):
+    # Pass as ``since`` for the next request
+    revision: int
+    # ``since`` was too old: ``changes`` is every job, replacing the copy
+    reset: bool
+    more: bool
+    changes: List[JobChange]
+    # Set while a reset is paged through: pass it as ``after`` (along with
+    # ``revision`` as ``since``) for the next page
+    after: Optional[int] = None
 
 class OrganizationCreate(BaseModel):
     name: str
@@ -95,6 +202,29 @@ class OrganizationCreate(BaseModel):
     size: str
     website: str
     tags: List[str]
+    externalId: Optional[str] = None
+
+class OrganizationChange(BaseModel):
+    id: str
+    revision: int
+    deleted: bool
+    record: Optional[Organization] = None
+
+class OrganizationChanges(BaseModel):
+    revision: int
+    reset: bool
+    more: bool
+    changes: List[OrganizationChange]
+    after: Optional[int] = None
+
+class BulkRowError(BaseModel):
+    row: int
+    detail: str
+
+class BulkImportResult(BaseModel):
+    created: int
+    updated: int
+    errors: List[BulkRowError]
 
 class AdminLogin(BaseModel):
     username: str
@@ -114,53 +244,180 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
         )
     return "admin"
 
-# Helper functions for JSON file operations
-async def load_jobs():
+# Storage backends behind the jobs and organizations endpoints
+if STORAGE_BACKEND == 'mongo':
+    jobs_repository = MongoRepository(
+        db, "jobs", Job, JOB_INDEXES, filter_query=job_filter_query,
+        suggest_fields={"title": "title", "organization": "organization", "tag": "tags", "location": "location"},
+    )
+    organizations_repository = MongoRepository(
+        db, "organizations", Organization, ORGANIZATION_INDEXES, suggest_fields={"organization": "name"}
+    )
+elif STORAGE_BACKEND == 'json':
+    # Resident stores, loaded once at startup and kept in sync with the JSON files
+    job_index = JobIndex()
+    search_index = SearchIndex()
+    job_external_ids = external_id_index()
+    facet_index = FacetIndex()
+    job_prefixes = PrefixIndex(job_terms)
+    jobs_store = RecordStore(
+        JOBS_FILE, Job, "jobs",
+        indexes=[job_index, search_index, job_external_ids, facet_index, job_prefixes],
+        form=CompactForm(Job, JOB_INTERNED_FIELDS),
+    )
+    organization_external_ids = external_id_index()
+    organization_prefixes = PrefixIndex(organization_terms)
+    organizations_store = RecordStore(
+        ORGANIZATIONS_FILE, Organization, "organizations",
+        indexes=[organization_external_ids, organization_prefixes],
+    )
+    jobs_repository = FileRepository(
+        jobs_store, job_external_ids, index=job_index, search_index=search_index, facet_index=facet_index,
+        prefix_index=job_prefixes,
+    )
+    organizations_repository = FileRepository(
+        organizations_store, organization_external_ids, prefix_index=organization_prefixes
+    )
+else:
+    raise RuntimeError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+
+# Health-check history, expired by a TTL index and inserted in batches
+status_log = StatusLog(db.status_checks)
+
+# Serialized list responses, reused until the store revision changes
+jobs_response_cache = ResponseCache("jobs", fast_json=FAST_JSON)
+organizations_response_cache = ResponseCache("organizations", fast_json=FAST_JSON)
+
+# Sparse fieldsets and summaries of list records, reused until the revision changes
+jobs_projections = ProjectionCache(job_summary)
+organizations_projections = ProjectionCache(organization_summary)
+
+# Opaque pagination cursors: the sort order and the sort key of the last
+# record on the page
+def encode_cursor(sort: Optional[str], key) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort, key]).encode()).decode()
+
+def is_cursor_key(sort: Optional[str], key) -> bool:
+    """Whether ``key`` has the shape of a sort key for ``sort``.
+
+    Cursors come from clients, and a key of the wrong type would only
+    fail when it is compared with the ones in the index.
+    """
+    if sort is None:
+        # A position
+        return type(key) is int
+    if sort in SORTS:
+        # (missing, amount, id)
+        return (
+            isinstance(key, list) and len(key) == 3
+            and type(key[0]) is int and key[0] in (0, 1)
+            and type(key[1]) in (int, float) and math.isfinite(key[1])
+            and isinstance(key[2], str)
+        )
+    if sort == "timestamp":
+        # (ISO timestamp, id) of a status check
+        return isinstance(key, list) and len(key) == 2 and all(isinstance(part, str) for part in key)
+    return False
+
+def decode_cursor(cursor: str, sort: Optional[str]):
     try:
-        if JOBS_FILE.exists():
-            async with aiofiles.open(JOBS_FILE, 'r') as f:
-                content = await f.read()
-                jobs_data = json.loads(content)
-                return [Job(**job) for job in jobs_data]
-        return []
-    except Exception as e:
-        logger.error(f"Error loading jobs: {e}")
-        return []
-
-async def save_jobs(jobs: List[Job]):
+        cursor_sort, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor belongs to a different sort order")
+    if not is_cursor_key(sort, key):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key) if isinstance(key, list) else key
+
+def projection_for(fields: Optional[str], view: Optional[str], model):
     try:
-        jobs_data = [job.dict() for job in jobs]
-        async with aiofiles.open(JOBS_FILE, 'w') as f:
-            await f.write(json.dumps(jobs_data, indent=2))
-    except Exception as e:
-        logger.error(f"Error saving jobs: {e}")
+        return parse_projection(fields, view, model.model_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def list_jobs(request: Request, revision, filters: dict, sort: Optional[str],
+                    cursor: Optional[str], offset: int, limit: Optional[int],
+                    projection=None, jobs_revision: Optional[int] = None) -> Response:
+    """Page through matching jobs and cache the response under revision.
+
+    ``jobs_revision`` is the jobs store revision when ``revision`` is a
+    composite that also covers other stores.
+    """
+    after = decode_cursor(cursor, sort) if cursor else None
+    jobs, total, next_after = await jobs_repository.list(
+        filters, sort=sort, after=after, offset=offset, limit=limit
+    )
+    headers = {"X-Total-Count": str(total)}
+    if next_after is not None:
+        headers["X-Next-Cursor"] = encode_cursor(sort, next_after)
+    content = jobs_projections.project(jobs, revision if jobs_revision is None else jobs_revision, projection)
+    cached = jobs_response_cache.put(request, revision, content, headers)
+    return cached.respond(request)
+
+async def change_feed(request: Request, repository, cache: ResponseCache, revision,
+                      since: int, limit: int, after: Optional[int], prepare=None) -> Response:
+    """The repository's changes after ``since``, cached under revision.
+
+    ``prepare`` completes the changed records (as a list) before they are sent.
+    """
+    changes = await repository.changes(since, limit, after)
+    records = [record for _, _, record in changes.items if record is not None]
+    if prepare is not None:
+        records = await prepare(records)
+    records = iter(records)
+    content = {
+        "revision": changes.revision,
+        "reset": changes.reset,
+        "more": changes.more,
+        "after": changes.after,
+        "changes": [
+            {
+                "id": record_id,
+                "revision": record_revision,
+                "deleted": record is None,
+                "record": None if record is None else next(records),
+            }
+            for record_revision, record_id, record in changes.items
+        ],
+    }
+    cached = cache.put(request, revision, content, {"X-Revision": str(changes.revision)})
+    return cached.respond(request)
+
+async def with_job_counts(organizations: List[Organization]) -> List[Organization]:
+    """Organizations with ``jobs`` set to their current number of postings."""
+    counts = await jobs_repository.count_by_organization([org.name for org in organizations])
+    return [org.model_copy(update={"jobs": counts[org.name]}) for org in organizations]
+
+# Live job and organization changes for /api/events; write handlers notify
+# it, and it polls for writes made elsewhere
+change_broadcaster = ChangeBroadcaster(
+    [ChangeSource("job", jobs_repository), ChangeSource("organization", organizations_repository, with_job_counts)],
+    fast_json=FAST_JSON,
+)
 
-async def load_organizations():
-    try:
-        if ORGANIZATIONS_FILE.exists():
-            async with aiofiles.open(ORGANIZATIONS_FILE, 'r') as f:
-                content = await f.read()
-                orgs_data = json.loads(content)
-                return [Organization(**org) for org in orgs_data]
-        return []
-    except Exception as e:
-        logger.error(f"Error loading organizations: {e}")
-        return []
-
-async def save_organizations(organizations: List[Organization]):
+# Precomputed neighbours for /api/jobs/{job_id}/similar, refreshed in the
+# background as jobs change
+similar_jobs = SimilarJobs(jobs_repository, path=SIMILAR_JOBS_FILE)
+
+async def bulk_upsert(request: Request, repository, create_model, key: str) -> BulkImportResult:
+    """Validate a bulk body against create_model and upsert it in one commit."""
+    list_fields = [name for name, field in create_model.model_fields.items() if field.annotation == List[str]]
     try:
-        orgs_data = [org.dict() for org in organizations]
-        async with aiofiles.open(ORGANIZATIONS_FILE, 'w') as f:
-            await f.write(json.dumps(orgs_data, indent=2))
-    except Exception as e:
-        logger.error(f"Error saving organizations: {e}")
+        rows = parse_rows(await request.body(), request.headers.get("content-type", ""), list_fields)
+    except BulkParseError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    valid, errors = validate_rows(rows, create_model, key)
+    created = updated = 0
+    if valid:
+        await repository.refresh()
+        created, updated = await repository.bulk_upsert(valid, key)
+        change_broadcaster.notify()
+    return BulkImportResult(created=created, updated=updated, errors=errors)
 
 # Initialize with sample data if files don't exist
 async def initialize_data():
-    jobs = await load_jobs()
-    organizations = await load_organizations()
-    
-    if not jobs:
+    if await jobs_repository.is_empty():
         sample_jobs = [
             Job(
                 id="1",
@@ -193,9 +450,9 @@ async def initialize_data():
                 organizationDescription="Center for AI Safety focuses on reducing high-consequence risks from AI through technical research and field-building."
             )
         ]
-        await save_jobs(sample_jobs)
+        await jobs_repository.reset(sample_jobs)
     
-    if not organizations:
+    if await organizations_repository.is_empty():
         sample_orgs = [
             Organization(
                 id="1",
@@ -220,7 +477,7 @@ async def initialize_data():
                 tags=["AI Safety", "Research", "Risk Reduction"]
             )
         ]
-        await save_organizations(sample_orgs)
+        await organizations_repository.reset(sample_orgs)
 
 # Original routes
 @api_router.get("/")
@@ -231,14 +488,41 @@ async def root():
 async def create_status_check(input: StatusCheckCreate):
     status_dict = input.dict()
     status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    await status_log.record(status_obj.dict())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
+async def get_status_checks(
+    response: Response,
+    client_name: Optional[str] = None,
+    since: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    after = None
+    if cursor:
+        timestamp, check_id = decode_cursor(cursor, "timestamp")
+        try:
+            after = (datetime.fromisoformat(timestamp), check_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    status_checks, next_after = await status_log.page(
+        after=after, limit=limit, client_name=client_name, since=since
+    )
+    if next_after is not None:
+        timestamp, check_id = next_after
+        response.headers["X-Next-Cursor"] = encode_cursor("timestamp", [timestamp.isoformat(), check_id])
     return [StatusCheck(**status_check) for status_check in status_checks]
 
+@api_router.get("/status/summary", response_model=List[StatusBucket])
+async def get_status_summary(
+    bucket: str = Query("hour", pattern="^(" + "|".join(BUCKETS) + ")$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    client_name: Optional[str] = None,
+):
+    return await status_log.summarize(bucket, since=since, until=until, client_name=client_name)
+
 # Admin Authentication
 @api_router.post("/admin/login", response_model=AdminResponse)
 async def admin_login(credentials: AdminLogin):
@@ -251,101 +535,383 @@ async def admin_login(credentials: AdminLogin):
 
 # Jobs API
 @api_router.get("/jobs", response_model=List[Job])
-async def get_jobs():
-    jobs = await load_jobs()
-    return jobs
+async def get_jobs(
+    request: Request,
+    search: Optional[str] = None,
+    highlighted: Optional[bool] = None,
+    salary_band: Optional[str] = None,
+    min_salary: Optional[int] = Query(None, ge=0),
+    max_salary: Optional[int] = Query(None, ge=0),
+    tags: Optional[List[str]] = Query(None),
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    organization: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+):
+    await jobs_repository.refresh()
+    revision = await jobs_repository.revision()
+    cached = jobs_response_cache.get(request, revision)
+    if cached is not None:
+        return cached.respond(request)
+    if salary_band and salary_band not in SALARY_BANDS:
+        raise HTTPException(status_code=400, detail="Unknown salary band")
+    if sort and sort not in SORTS:
+        raise HTTPException(status_code=400, detail="Unknown sort order")
+    projection = projection_for(fields, view, Job)
+    filters = dict(
+        search=search,
+        highlighted=highlighted,
+        salary_band=salary_band,
+        min_salary=min_salary,
+        max_salary=max_salary,
+        tags=tags,
+        type=type,
+        location=location,
+        organization=organization,
+    )
+    filters = {name: value for name, value in filters.items() if value is not None}
+    return await list_jobs(request, revision, filters, sort, cursor, offset, limit, projection)
+
+@api_router.get("/jobs/search", response_model=List[Job])
+async def search_jobs(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    await jobs_repository.refresh()
+    jobs, total = await jobs_repository.search(q, offset, limit)
+    return Response(
+        content=render_json(jobs, FAST_JSON),
+        media_type="application/json",
+        headers={"X-Total-Count": str(total)},
+    )
+
+@api_router.get("/jobs/facets", response_model=JobFacets)
+async def get_job_facets(
+    request: Request,
+    search: Optional[str] = None,
+    highlighted: Optional[bool] = None,
+    salary_band: Optional[str] = None,
+    min_salary: Optional[int] = Query(None, ge=0),
+    max_salary: Optional[int] = Query(None, ge=0),
+    tags: Optional[List[str]] = Query(None),
+    type: Optional[str] = None,
+    location: Optional[str] = None,
+    organization: Optional[str] = None,
+):
+    await jobs_repository.refresh()
+    revision = await jobs_repository.revision()
+    cached = jobs_response_cache.get(request, revision)
+    if cached is not None:
+        return cached.respond(request)
+    if salary_band and salary_band not in SALARY_BANDS:
+        raise HTTPException(status_code=400, detail="Unknown salary band")
+    filters = dict(
+        search=search,
+        highlighted=highlighted,
+        salary_band=salary_band,
+        min_salary=min_salary,
+        max_salary=max_salary,
+        tags=tags,
+        type=type,
+        location=location,
+        organization=organization,
+    )
+    filters = {name: value for name, value in filters.items() if value is not None}
+    total, counts = await jobs_repository.facets(filters)
+    content = {"total": total}
+    for facet in FACETS:
+        content[facet] = [{"value": value, "count": count} for value, count in counts[facet]]
+    cached = jobs_response_cache.put(request, revision, content)
+    return cached.respond(request)
+
+@api_router.get("/jobs/export")
+async def export_jobs(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[int] = Query(None, ge=0),
+):
+    await jobs_repository.refresh()
+    headers = {"X-Revision": str(await jobs_repository.revision())}
+    jobs = jobs_repository.changed_since(since)
+    if format == "csv":
+        headers["Content-Disposition"] = 'attachment; filename="jobs.csv"'
+        fields = list(Job.model_fields)
+        body = stream_csv(jobs, fields)
+        return StreamingResponse(body, media_type="text/csv", headers=headers)
+    body = stream_ndjson(jobs, FAST_JSON)
+    return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+
+@api_router.get("/jobs/changes", response_model=JobChanges)
+async def get_job_changes(
+    request: Request,
+    since: int = Query(..., ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    after: Optional[int] = Query(None, ge=0),
+):
+    await jobs_repository.refresh()
+    revision = await jobs_repository.revision()
+    cached = jobs_response_cache.get(request, revision)
+    if cached is not None:
+        return cached.respond(request)
+    return await change_feed(request, jobs_repository, jobs_response_cache, revision, since, limit, after)
 
 @api_router.get("/jobs/{job_id}", response_model=Job)
 async def get_job(job_id: str):
-    jobs = await load_jobs()
-    for job in jobs:
-        if job.id == job_id:
-            return job
+    await jobs_repository.refresh()
+    job = await jobs_repository.get(job_id)
+    if job is not None:
+        return job
     raise HTTPException(status_code=404, detail="Job not found")
 
+@api_router.get("/jobs/{job_id}/similar", response_model=List[Job])
+async def get_similar_jobs(
+    job_id: str,
+    limit: int = Query(5, ge=1, le=NEIGHBOURS),
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+):
+    """The jobs most like this one, most similar first.
+
+    Read from the neighbours precomputed by ``similar_jobs``, so a job
+    posted in the last moment has none yet.
+    """
+    await jobs_repository.refresh()
+    projection = projection_for(fields, view, Job)
+    if await jobs_repository.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    jobs = []
+    for neighbour_id in similar_jobs.neighbours(job_id):
+        # Skip neighbours deleted since the last refresh
+        job = await jobs_repository.get(neighbour_id)
+        if job is not None:
+            jobs.append(job)
+            if len(jobs) == limit:
+                break
+    content = jobs_projections.project(jobs, await jobs_repository.revision(), projection)
+    return Response(content=render_json(content, FAST_JSON), media_type="application/json")
+
 @api_router.post("/jobs", response_model=Job)
 async def create_job(job: JobCreate, admin: str = Depends(get_current_admin)):
-    jobs = await load_jobs()
+    await jobs_repository.refresh()
     new_job = Job(**job.dict(), id=str(uuid.uuid4()))
-    jobs.append(new_job)
-    await save_jobs(jobs)
+    await jobs_repository.create(new_job)
+    change_broadcaster.notify()
+    similar_jobs.notify()
     return new_job
 
+@api_router.post("/jobs/bulk", response_model=BulkImportResult)
+async def bulk_import_jobs(
+    request: Request,
+    key: str = Query("externalId", pattern="^(externalId|id)$"),
+    admin: str = Depends(get_current_admin),
+):
+    result = await bulk_upsert(request, jobs_repository, JobCreate, key)
+    similar_jobs.notify()
+    return result
+
 @api_router.put("/jobs/{job_id}", response_model=Job)
 async def update_job(job_id: str, job: JobCreate, admin: str = Depends(get_current_admin)):
-    jobs = await load_jobs()
-    for i, existing_job in enumerate(jobs):
-        if existing_job.id == job_id:
-            updated_job = Job(**job.dict(), id=job_id)
-            jobs[i] = updated_job
-            await save_jobs(jobs)
-            return updated_job
+    await jobs_repository.refresh()
+    updated_job = Job(**job.dict(), id=job_id)
+    if await jobs_repository.replace(updated_job):
+        change_broadcaster.notify()
+        similar_jobs.notify()
+        return updated_job
     raise HTTPException(status_code=404, detail="Job not found")
 
 @api_router.delete("/jobs/{job_id}")
 async def delete_job(job_id: str, admin: str = Depends(get_current_admin)):
-    jobs = await load_jobs()
-    for i, job in enumerate(jobs):
-        if job.id == job_id:
-            del jobs[i]
-            await save_jobs(jobs)
-            return {"message": "Job deleted successfully"}
+    await jobs_repository.refresh()
+    if await jobs_repository.delete(job_id):
+        change_broadcaster.notify()
+        similar_jobs.notify()
+        return {"message": "Job deleted successfully"}
     raise HTTPException(status_code=404, detail="Job not found")
 
 # Organizations API
 @api_router.get("/organizations", response_model=List[Organization])
-async def get_organizations():
-    organizations = await load_organizations()
-    return organizations
+async def get_organizations(
+    request: Request,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+):
+    await organizations_repository.refresh()
+    await jobs_repository.refresh()
+    # Job counts are part of the body, so job writes invalidate it too
+    revision = (await organizations_repository.revision(), await jobs_repository.revision())
+    cached = organizations_response_cache.get(request, revision)
+    if cached is None:
+        projection = projection_for(fields, view, Organization)
+        organizations, _, _ = await organizations_repository.list()
+        organizations = await with_job_counts(organizations)
+        content = organizations_projections.project(organizations, revision, projection)
+        cached = organizations_response_cache.put(request, revision, content)
+    return cached.respond(request)
+
+@api_router.get("/organizations/changes", response_model=OrganizationChanges)
+async def get_organization_changes(
+    request: Request,
+    since: int = Query(..., ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    after: Optional[int] = Query(None, ge=0),
+):
+    await organizations_repository.refresh()
+    await jobs_repository.refresh()
+    # Job counts are part of the body, as in the organization list
+    revision = (await organizations_repository.revision(), await jobs_repository.revision())
+    cached = organizations_response_cache.get(request, revision)
+    if cached is not None:
+        return cached.respond(request)
+    return await change_feed(
+        request, organizations_repository, organizations_response_cache, revision, since, limit, after,
+        with_job_counts
+    )
 
 @api_router.get("/organizations/{org_id}", response_model=Organization)
 async def get_organization(org_id: str):
-    organizations = await load_organizations()
-    for org in organizations:
-        if org.id == org_id:
-            return org
+    await organizations_repository.refresh()
+    await jobs_repository.refresh()
+    org = await organizations_repository.get(org_id)
+    if org is not None:
+        return (await with_job_counts([org]))[0]
     raise HTTPException(status_code=404, detail="Organization not found")
 
+@api_router.get("/organizations/{org_id}/jobs", response_model=List[Job])
+async def get_organization_jobs(
+    request: Request,
+    org_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    sort: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+):
+    await organizations_repository.refresh()
+    await jobs_repository.refresh()
+    # A rename changes which jobs belong to the organization
+    jobs_revision = await jobs_repository.revision()
+    revision = (await organizations_repository.revision(), jobs_revision)
+    cached = jobs_response_cache.get(request, revision)
+    if cached is not None:
+        return cached.respond(request)
+    if sort and sort not in SORTS:
+        raise HTTPException(status_code=400, detail="Unknown sort order")
+    projection = projection_for(fields, view, Job)
+    org = await organizations_repository.get(org_id)
+    if org is None:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    return await list_jobs(
+        request, revision, {"organization": org.name}, sort, cursor, offset, limit, projection, jobs_revision
+    )
+
 @api_router.post("/organizations", response_model=Organization)
 async def create_organization(org: OrganizationCreate, admin: str = Depends(get_current_admin)):
-    organizations = await load_organizations()
+    await organizations_repository.refresh()
     new_org = Organization(**org.dict(), id=str(uuid.uuid4()))
-    organizations.append(new_org)
-    await save_organizations(organizations)
-    return new_org
+    await organizations_repository.create(new_org)
+    change_broadcaster.notify()
+    return (await with_job_counts([new_org]))[0]
+
+@api_router.post("/organizations/bulk", response_model=BulkImportResult)
+async def bulk_import_organizations(
+    request: Request,
+    key: str = Query("externalId", pattern="^(externalId|id)$"),
+    admin: str = Depends(get_current_admin),
+):
+    return await bulk_upsert(request, organizations_repository, OrganizationCreate, key)
 
 @api_router.put("/organizations/{org_id}", response_model=Organization)
 async def update_organization(org_id: str, org: OrganizationCreate, admin: str = Depends(get_current_admin)):
-    organizations = await load_organizations()
-    for i, existing_org in enumerate(organizations):
-        if existing_org.id == org_id:
-            updated_org = Organization(**org.dict(), id=org_id)
-            organizations[i] = updated_org
-            await save_organizations(organizations)
-            return updated_org
+    await organizations_repository.refresh()
+    updated_org = Organization(**org.dict(), id=org_id)
+    if await organizations_repository.replace(updated_org):
+        change_broadcaster.notify()
+        return (await with_job_counts([updated_org]))[0]
     raise HTTPException(status_code=404, detail="Organization not found")
 
 @api_router.delete("/organizations/{org_id}")
 async def delete_organization(org_id: str, admin: str = Depends(get_current_admin)):
-    organizations = await load_organizations()
-    for i, org in enumerate(organizations):
-        if org.id == org_id:
-            del organizations[i]
-            await save_organizations(organizations)
-            return {"message": "Organization deleted successfully"}
+    await organizations_repository.refresh()
+    if await organizations_repository.delete(org_id):
+        change_broadcaster.notify()
+        return {"message": "Organization deleted successfully"}
     raise HTTPException(status_code=404, detail="Organization not found")
 
+# Typeahead for the search box. Not kept in the response cache: nearly
+# every keystroke is a new query, and would push out the list responses
+@api_router.get("/autocomplete", response_model=List[Suggestion])
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+):
+    await jobs_repository.refresh()
+    await organizations_repository.refresh()
+    suggestions = await jobs_repository.suggest(q, limit)
+    # Organizations without postings are only found in their own store
+    listed = {normalize(value) for kind, value, _ in suggestions if kind == "organization"}
+    names = [
+        value for _, value, _ in await organizations_repository.suggest(q, limit)
+        if normalize(value) not in listed
+    ]
+    if names:
+        counts = await jobs_repository.count_by_organization(names)
+        suggestions += [("organization", name, counts[name]) for name in names]
+    # Stable, so equally frequent terms keep the order the index gave them
+    suggestions.sort(key=lambda suggestion: -suggestion[2])
+    content = [{"kind": kind, "value": value, "count": count} for kind, value, count in suggestions[:limit]]
+    return Response(content=render_json(content, FAST_JSON), media_type="application/json")
+
+# Live updates
+@api_router.get("/events")
+async def stream_events(request: Request):
+    """Server-sent ``job``, ``organization`` and ``reset`` events.
+
+    Job and organization events carry the same change objects as the
+    change feeds. ``reset`` means events were missed and lists should be
+    fetched again.
+    """
+    return StreamingResponse(
+        change_broadcaster.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # Stop proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Prometheus scrape target, outside /api so it isn't exposed with the public API
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    for name, repository in (("jobs", jobs_repository), ("organizations", organizations_repository)):
+        RECORDS.set(name, value=await repository.count())
+        REVISION.set(name, value=await repository.revision())
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Include the router in the main app
 app.include_router(api_router)
 
+@app.exception_handler(StoreWriteError)
+async def store_write_error(request: Request, exc: StoreWriteError):
+    # The write was rolled back; the client may retry once the disk recovers
+    return JSONResponse(status_code=503, content={"detail": "Could not save the change, please retry"})
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "X-Revision", "ETag"],
 )
 
+# Outermost, so latencies include CORS handling. Event streams stay open
+# for minutes and would swamp the latency histogram.
+app.add_middleware(MetricsMiddleware, skip_paths=("/metrics", "/api/events"))
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -355,8 +921,20 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    await REGISTRY.start(METRICS_DIR)
+    await jobs_repository.start()
+    await organizations_repository.start()
+    status_log.start()
     await initialize_data()
+    await change_broadcaster.start()
+    await similar_jobs.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await similar_jobs.stop()
+    await change_broadcaster.stop()
+    await jobs_repository.stop()
+    await organizations_repository.stop()
+    await status_log.stop()
+    await REGISTRY.stop()
     client.close()
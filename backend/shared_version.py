@@ -0,0 +1,109 @@
+import asyncio
+import mmap
+import os
+import struct
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no cross-process locking off POSIX
+    fcntl = None
+
+# Sequence counter, then the Version fields
+HEADER = struct.Struct("<Q5q")
+
+# Stands in for a missing snapshot file in the published signature
+NO_FILE = (-1, -1)
+
+
+class Version(NamedTuple):
+    """Where a store's files stand, as published by the last process to change them.
+
+    ``epoch`` changes when the records were replaced wholesale (a reset, or
+    the snapshot edited on disk), so other processes must reload.
+    ``generation`` counts compactions, each of which rotates the log, and
+    ``log_size`` is the length of the current log up to its last complete
+    entry. ``snapshot`` is the (mtime_ns, size) of the JSON snapshot.
+    """
+
+    epoch: int
+    generation: int
+    log_size: int
+    snapshot: Tuple[int, int]
+
+
+class SharedVersion:
+    """A store's Version, shared by every worker through a memory-mapped file.
+
+    Readers never block: the header is guarded by a sequence counter that
+    is odd while a publish is in progress (a seqlock), so a torn read is
+    detected and retried. Publishing, and any change to the store's files,
+    happens under an exclusive ``flock`` on the same file. Catching up
+    with the files takes it shared, so it never sees a write half done.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd: Optional[int] = None
+        self._map: Optional[mmap.mmap] = None
+
+    def _open(self):
+        if self._map is not None:
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        # Whoever creates the file first gets a zeroed header, which matches
+        # no snapshot and so makes the first loader publish a fresh epoch
+        if os.fstat(fd).st_size < HEADER.size:
+            os.ftruncate(fd, HEADER.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, HEADER.size)
+
+    def read(self) -> Version:
+        self._open()
+        while True:
+            sequence, epoch, generation, log_size, mtime_ns, size = HEADER.unpack_from(self._map)
+            if sequence % 2 == 0 and struct.unpack_from("<Q", self._map)[0] == sequence:
+                return Version(epoch, generation, log_size, (mtime_ns, size))
+
+    def publish(self, version: Version):
+        """Replace the header; only while holding the exclusive lock."""
+        self._open()
+        sequence = struct.unpack_from("<Q", self._map)[0]
+        struct.pack_into("<Q", self._map, 0, sequence + 1)
+        HEADER.pack_into(
+            self._map, 0, sequence + 1,
+            version.epoch, version.generation, version.log_size, *version.snapshot,
+        )
+        struct.pack_into("<Q", self._map, 0, sequence + 2)
+
+    @asynccontextmanager
+    async def locked(self, exclusive: bool = True):
+        """Hold the cross-process lock, waiting in a thread if it is taken."""
+        self._open()
+        if fcntl is None:
+            yield
+            return
+        operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(self._fd, operation | fcntl.LOCK_NB)
+        except BlockingIOError:
+            waiting = asyncio.ensure_future(asyncio.to_thread(fcntl.flock, self._fd, operation))
+            try:
+                await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                # The thread goes on to take the lock; hand it straight back
+                await waiting
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+                raise
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            os.close(self._fd)
+            self._map = self._fd = None
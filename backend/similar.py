@@ -0,0 +1,804 @@
+import asyncio
+import io
+import logging
+import math
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from events import stop_task, wait_for_event
+from metrics import SIMILAR_JOBS_REFRESH_SECONDS
+from search import tokenize
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - every worker keeps its own table off POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Term frequency multipliers per field, as for search ranking
+SIMILARITY_FIELDS = {
+    "title": 3,
+    "tags": 2,
+    "description": 1,
+    "requirements": 1,
+}
+
+# Neighbours kept per job
+NEIGHBOURS = 10
+
+# How often the jobs repository is checked for changes nobody announced
+# (writes handled by other workers, or made straight to MongoDB)
+REFRESH_INTERVAL = 1.0
+
+# Changes read from the repository per round trip
+BATCH_SIZE = 1000
+
+# Terms in more than this share of jobs say little about any of them and
+# would make every job a candidate for every other; ignored once there are
+# enough jobs for the share to mean something
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_CUTOFF_DOCUMENTS = 20
+
+# Jobs a job is scored against through any one term, about: terms shared
+# by more jobs are sampled (see SimilarJobs), so the work per job stays
+# bounded however many jobs share its commonest terms
+MAX_POSTINGS = 500
+
+# Priorities run from 0 up to this; also the window of an unsampled term
+FULL_WINDOW = 1 << 32
+
+# Updates weight new vectors with the IDF of the moment and leave the rest
+# alone; after this share of the catalog has changed everything is redone
+REBUILD_FRACTION = 0.25
+
+# Bound on the term matches summed, and on the (query job, matched job)
+# scores held, at once
+BLOCK_CELLS = 1 << 22
+
+# Scores at or below this are no similarity at all
+MIN_SCORE = 1e-6
+
+# (column of each term, L2-normalized TF-IDF weights)
+Vector = Tuple[np.ndarray, np.ndarray]
+
+
+def row_priorities(rows: np.ndarray) -> np.ndarray:
+    """Pseudo-random priorities of rows, below ``FULL_WINDOW``: the order of postings."""
+    mixed = rows.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    mixed ^= mixed >> np.uint64(29)
+    mixed *= np.uint64(0xBF58476D1CE4E5B9)
+    return (mixed >> np.uint64(32)).astype(np.int64)
+
+
+def similarity_terms(job) -> Counter:
+    """Weighted term frequencies over the fields jobs are compared on."""
+    texts = {
+        "title": job.title,
+        "tags": " ".join(job.tags),
+        "description": job.description,
+        "requirements": " ".join(job.requirements),
+    }
+    terms: Counter = Counter()
+    for field, text in texts.items():
+        weight = SIMILARITY_FIELDS[field]
+        for term in tokenize(text):
+            terms[term] += weight
+    return terms
+
+
+class Postings:
+    """The TF-IDF matrix by term: the rows (jobs) and weights of each column, CSC style.
+
+    Each column's rows are in priority order (see ``row_priorities``), and
+    ``keys`` (column << 32 | priority) finds a priority in a column with
+    ``searchsorted``.
+    """
+
+    def __init__(self, vectors: List[Optional[Vector]], columns: int):
+        rows = [row for row, vector in enumerate(vectors) if vector is not None]
+        lengths = [len(vectors[row][0]) for row in rows]
+        if rows:
+            indices = np.concatenate([vectors[row][0] for row in rows])
+            weights = np.concatenate([vectors[row][1] for row in rows])
+        else:
+            indices = np.zeros(0, dtype=np.int64)
+            weights = np.zeros(0, dtype=np.float32)
+        owners = np.repeat(np.array(rows, dtype=np.int64), lengths)
+        priorities = row_priorities(owners)
+        order = np.lexsort((priorities, indices))
+        self.rows = owners[order]
+        self.weights = weights[order]
+        self.keys = (indices[order] << 32) | priorities[order]
+        self.starts = np.zeros(columns + 1, dtype=np.int64)
+        np.cumsum(np.bincount(indices, minlength=columns), out=self.starts[1:])
+
+    def cost(self, columns: np.ndarray, widths: np.ndarray) -> int:
+        """Term matches summed to score one job with terms ``columns`` through windows ``widths``, about."""
+        lengths = self.starts[columns + 1] - self.starts[columns]
+        return int(((lengths * widths[columns]) >> 32).sum()) + len(columns)
+
+
+class NeighbourTable(NamedTuple):
+    """Every job's neighbours, as of a repository revision."""
+
+    revision: int
+    # Job id of each row, None for rows not in use
+    ids: List[Optional[str]]
+    rows: Dict[str, int]
+    # Rows of each row's neighbours, most similar first, -1 padded
+    neighbours: np.ndarray
+    scores: np.ndarray
+
+    def lookup(self, job_id: str) -> Tuple[str, ...]:
+        row = self.rows.get(job_id)
+        if row is None:
+            return ()
+        return tuple(self.ids[neighbour] for neighbour in self.neighbours[row].tolist() if neighbour >= 0)
+
+
+EMPTY_TABLE = NeighbourTable(
+    -1, [], {}, np.zeros((0, NEIGHBOURS), dtype=np.int64), np.zeros((0, NEIGHBOURS), dtype=np.float32),
+)
+
+
+def updates_path(path: Path) -> Path:
+    return path.with_suffix(".updates")
+
+
+def save_table(path: Path, table: NeighbourTable, stamp: int):
+    """Replace the table saved at ``path``, atomically, and drop its updates.
+
+    ``stamp`` tells this table apart from the ones saved before it, so
+    updates left over from those aren't applied to it.
+    """
+    temporary = path.with_name(path.name + ".tmp")
+    with open(temporary, "wb") as file:
+        np.savez(
+            file,
+            stamp=np.int64(stamp),
+            revision=np.int64(table.revision),
+            ids=np.array(["" if job_id is None else job_id for job_id in table.ids], dtype=str),
+            neighbours=table.neighbours,
+            scores=table.scores,
+        )
+    os.replace(temporary, path)
+    updates_path(path).unlink(missing_ok=True)
+
+
+def append_update(path: Path, table: NeighbourTable, stamp: int, rows: np.ndarray) -> int:
+    """Append the ``rows`` of ``table`` to the updates of the table saved at ``path``.
+
+    Returns the size of the updates, in bytes.
+    """
+    buffer = io.BytesIO()
+    np.save(buffer, np.array([stamp, table.revision, len(table.ids)], dtype=np.int64))
+    np.save(buffer, rows)
+    np.save(buffer, np.array(["" if table.ids[row] is None else table.ids[row] for row in rows.tolist()], dtype=str))
+    np.save(buffer, table.neighbours[rows])
+    np.save(buffer, table.scores[rows])
+    # One write, so a reader sees a record whole or cut short, never mixed
+    with open(updates_path(path), "ab") as file:
+        file.write(buffer.getvalue())
+        return file.tell()
+
+
+def read_updates(path: Path, table: NeighbourTable, stamp: int, offset: int) -> Tuple[NeighbourTable, int]:
+    """``table`` with the updates after ``offset`` applied, and the offset they end at.
+
+    Stops at a record cut short (being written) or saved for another table
+    (about to be dropped).
+    """
+    records = []
+    try:
+        file = open(updates_path(path), "rb")
+    except FileNotFoundError:
+        return table, offset
+    with file:
+        file.seek(offset)
+        while True:
+            try:
+                header = np.load(file, allow_pickle=False)
+                if int(header[0]) != stamp:
+                    break
+                records.append((header, *(np.load(file, allow_pickle=False) for _ in range(4))))
+            except (EOFError, ValueError):
+                break
+            offset = file.tell()
+    if not records:
+        return table, offset
+    size = max(len(table.ids), *(int(header[2]) for header, *_ in records))
+    ids = table.ids + [None] * (size - len(table.ids))
+    rows = dict(table.rows)
+    neighbours = np.full((size, table.neighbours.shape[1]), -1, dtype=np.int64)
+    neighbours[:len(table.ids)] = table.neighbours
+    scores = np.zeros((size, table.scores.shape[1]), dtype=np.float32)
+    scores[:len(table.ids)] = table.scores
+    for _, changed, changed_ids, changed_neighbours, changed_scores in records:
+        for row, job_id in zip(changed.tolist(), changed_ids.tolist()):
+            previous = ids[row]
+            # Unless the job moved to a row earlier in this record
+            if previous is not None and rows.get(previous) == row:
+                del rows[previous]
+            ids[row] = job_id or None
+            if job_id:
+                rows[job_id] = row
+        neighbours[changed] = changed_neighbours
+        scores[changed] = changed_scores
+    return NeighbourTable(int(records[-1][0][1]), ids, rows, neighbours, scores), offset
+
+
+def load_table(path: Path) -> Tuple[NeighbourTable, int, int]:
+    """The table saved at ``path`` with its updates applied, its stamp, and where its updates end."""
+    # Plain arrays only: nothing in the files is unpickled
+    with np.load(path, allow_pickle=False) as saved:
+        ids = [job_id or None for job_id in saved["ids"].tolist()]
+        # Saved before tables had stamps (and updates) if it has none
+        stamp = int(saved["stamp"]) if "stamp" in saved.files else 0
+        table = NeighbourTable(
+            int(saved["revision"]),
+            ids,
+            {job_id: row for row, job_id in enumerate(ids) if job_id is not None},
+            saved["neighbours"],
+            saved["scores"],
+        )
+    table, offset = read_updates(path, table, stamp, 0)
+    return table, stamp, offset
+
+
+class SimilarJobs:
+    """Each job's most similar jobs, precomputed in the background.
+
+    Jobs are TF-IDF vectors (sublinear term frequency, smoothed IDF, L2
+    normalized) over ``SIMILARITY_FIELDS``, and similarity is their dot
+    product. A task follows the jobs repository's change feed (see
+    ``Repository.changes``), so it works the same for every backend and
+    sees writes made by other workers. It builds the neighbour table once,
+    then only rescores the jobs that changed: their scores rank their own
+    neighbours and offer them as candidates to everyone else's lists. A job
+    whose list lost a changed neighbour and can't be completed from those
+    candidates is rescored too.
+
+    Candidates are pruned so that the work grows linearly with the catalog
+    rather than with its square. Postings are in a pseudo-random order of
+    jobs, and a job is scored against a window of each of its terms'
+    postings that starts at its own place in that order and holds about
+    ``MAX_POSTINGS`` jobs. Only terms shared by more jobs than that are cut
+    short. The windows of a job's terms start at the same place, so another
+    job inside one of them is usually inside all those of the terms they
+    share and scored over all of them; and as every job starts somewhere
+    else, every job is still a candidate for about as many others. Window
+    sizes are set when the table is built.
+
+    Scores are computed a block of jobs at a time as a sparse product in
+    NumPy: each query term's postings are gathered into one array and
+    summed per (query, job) pair with ``bincount``, over only the jobs
+    some query in the block matched.
+
+    With ``path`` set, one worker (whichever holds ``<path>.lock``) keeps
+    the table and saves it there when it builds it. After that each refresh
+    appends only the rows it changed to ``<path>.updates``, until those
+    outgrow the table and it is saved whole again. The others load the
+    table and then apply the updates as they come, and take over when that
+    worker exits. A worker taking over, or starting up, begins from the
+    saved table and rescores only the jobs changed since it was saved.
+
+    ``neighbours`` looks up the last table published. Jobs written since
+    have none yet, and may still be listed in others' neighbours after
+    they were deleted.
+    """
+
+    def __init__(self, repository, neighbours: int = NEIGHBOURS, refresh_interval: float = REFRESH_INTERVAL,
+                 path: Optional[Path] = None):
+        self.repository = repository
+        self.k = neighbours
+        self.refresh_interval = refresh_interval
+        self.path = path
+        # Replaced whole on the event loop; everything below it but the
+        # lock is only used by the refresh task, in a worker thread
+        self.table = EMPTY_TABLE
+        # Repository revision the table is up to date with; None until built
+        self.revision: Optional[int] = None
+        # Whether this worker keeps the table, rather than loading it
+        self.leading = False
+        self._lock_fd: Optional[int] = None
+        # (mtime_ns, size) of the saved table last loaded
+        self._loaded: Optional[Tuple[int, int]] = None
+        # Stamp and size of the saved table, and where its updates read or
+        # written so far end
+        self._stamp: Optional[int] = None
+        self._saved_size = 0
+        self._offset = 0
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._terms: List[Optional[Counter]] = []
+        self._frequencies: Counter = Counter()
+        self._columns: Dict[str, int] = {}
+        self._vectors: List[Optional[Vector]] = []
+        # Window over each column's postings, in priorities
+        self._widths = np.zeros(0, dtype=np.int64)
+        self._top_rows = np.full((0, neighbours), -1, dtype=np.int64)
+        self._top_scores = np.zeros((0, neighbours), dtype=np.float32)
+        self._changed_since_build = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # The table is rebuilt in a thread; one refresh at a time
+        self._refreshing = asyncio.Lock()
+
+    async def start(self):
+        # Created here so it belongs to the running event loop
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            await stop_task(self._task)
+            self._task = None
+        if self._lock_fd is not None:
+            # Closing it lets another worker take over
+            os.close(self._lock_fd)
+            self._lock_fd = None
+            self.leading = False
+
+    def notify(self):
+        """Refresh now rather than at the next poll."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def neighbours(self, job_id: str) -> Tuple[str, ...]:
+        return self.table.lookup(job_id)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Error refreshing similar jobs")
+            await wait_for_event(self._wake, self.refresh_interval)
+            self._wake.clear()
+
+    async def refresh(self):
+        """Bring the neighbour table up to date with the repository, or with the saved table."""
+        async with self._refreshing:
+            if not self.leading and self._lead():
+                self.leading = True
+                # Start over from the saved table, which may be ahead of ours
+                self.revision = None
+            if self.leading:
+                await self._follow_repository()
+            else:
+                await self._follow_saved()
+
+    def _lead(self) -> bool:
+        """Whether this worker can keep the table, taking the lock if it is free."""
+        if self.path is None or fcntl is None:
+            return True
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.path.with_suffix(".lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+
+    async def _follow_saved(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._loaded:
+            try:
+                if os.path.getsize(updates_path(self.path)) <= self._offset:
+                    return
+            except FileNotFoundError:
+                return
+            with SIMILAR_JOBS_REFRESH_SECONDS.time("load"):
+                self.table, self._offset = await asyncio.to_thread(
+                    read_updates, self.path, self.table, self._stamp, self._offset,
+                )
+            self.revision = self.table.revision
+            return
+        with SIMILAR_JOBS_REFRESH_SECONDS.time("load"):
+            saved = await asyncio.to_thread(self._read_saved)
+        if saved is not None:
+            self.table, self._stamp, self._offset = saved
+            self.revision = self.table.revision
+        self._loaded = signature
+
+    async def _follow_repository(self):
+        repository = self.repository
+        await repository.refresh()
+        if await repository.revision() == self.revision:
+            return
+        if self.revision is None:
+            revision, _, jobs = await self._read_changes(-1)
+            saved = await asyncio.to_thread(self._read_saved)
+            if saved is not None:
+                saved = saved[0]
+            changed = None
+            if saved is not None and saved.neighbours.shape[1] == self.k:
+                # Jobs as of now, and what changed since the table was saved
+                revision, reset, changed = await self._read_changes(saved.revision)
+                if reset:
+                    changed = None
+                else:
+                    for job_id, job in changed.items():
+                        if job is None:
+                            jobs.pop(job_id, None)
+                        else:
+                            jobs[job_id] = job
+            if changed is None:
+                with SIMILAR_JOBS_REFRESH_SECONDS.time("rebuild"):
+                    await asyncio.to_thread(self._rebuild, jobs)
+            else:
+                with SIMILAR_JOBS_REFRESH_SECONDS.time("adopt"):
+                    await asyncio.to_thread(self._adopt, jobs, saved, changed)
+            rebuilt = True
+        else:
+            revision, reset, changed = await self._read_changes(self.revision)
+            rebuilt = reset
+            if reset:
+                with SIMILAR_JOBS_REFRESH_SECONDS.time("rebuild"):
+                    await asyncio.to_thread(self._rebuild, changed)
+            elif changed:
+                with SIMILAR_JOBS_REFRESH_SECONDS.time("update"):
+                    rebuilt = await asyncio.to_thread(self._update, changed)
+        self.table = await asyncio.to_thread(self._share, revision, rebuilt)
+        self.revision = revision
+
+    async def _read_changes(self, since: int) -> Tuple[int, bool, Dict[str, object]]:
+        """(revision, whether it was a reset, id -> latest record or None if deleted) after ``since``."""
+        reset = False
+        changed: Dict[str, object] = {}
+        after = None
+        more = True
+        while more:
+            changes = await self.repository.changes(since, BATCH_SIZE, after)
+            if changes.reset:
+                reset = True
+                changed = {}
+            changed.update((record_id, record) for _, record_id, record in changes.items)
+            since, after, more = changes.revision, changes.after, changes.more
+        if reset:
+            # A paged reset may delete jobs it never listed
+            changed = {job_id: job for job_id, job in changed.items() if job is not None}
+        return since, reset, changed
+
+    def _read_saved(self) -> Optional[Tuple[NeighbourTable, int, int]]:
+        if self.path is None or not self.path.exists():
+            return None
+        try:
+            return load_table(self.path)
+        except Exception:
+            logger.warning(f"Ignoring unreadable similar jobs table {self.path}", exc_info=True)
+            return None
+
+    def _share(self, revision: int, rebuilt: bool) -> NeighbourTable:
+        """A copy of the table to publish, also saved for the other workers.
+
+        Unless it was ``rebuilt``, only the rows that differ from the table
+        published last are saved, as an update.
+        """
+        table = NeighbourTable(
+            revision, list(self._ids), dict(self._rows), self._top_rows.copy(), self._top_scores.copy(),
+        )
+        if self.path is None:
+            return table
+        try:
+            if rebuilt or self._stamp is None:
+                self._save(table)
+            elif append_update(self.path, table, self._stamp, self._changed_rows()) > self._saved_size:
+                self._save(table)
+        except Exception:
+            # The updates may end in a partial record: start over next time
+            self._stamp = None
+            raise
+        return table
+
+    def _save(self, table: NeighbourTable):
+        self._stamp = int.from_bytes(os.urandom(7), "big")
+        save_table(self.path, table, self._stamp)
+        self._saved_size = os.path.getsize(self.path)
+
+    def _changed_rows(self) -> np.ndarray:
+        """Rows whose job or neighbours differ from the table published last."""
+        published = self.table
+        size = len(published.ids)
+        differs = (self._top_rows[:size] != published.neighbours).any(axis=1)
+        differs |= (self._top_scores[:size] != published.scores).any(axis=1)
+        moved = [row for row, (job_id, old) in enumerate(zip(self._ids, published.ids)) if job_id != old]
+        return np.unique(np.concatenate([
+            np.flatnonzero(differs), np.array(moved, dtype=np.int64), np.arange(size, len(self._ids)),
+        ]))
+
+    def _load(self, jobs: Dict[str, object]):
+        self._rows.clear()
+        self._ids.clear()
+        self._free.clear()
+        self._terms.clear()
+        self._vectors.clear()
+        self._frequencies.clear()
+        for job_id, job in jobs.items():
+            self._assign(job_id, job)
+
+    def _rebuild(self, jobs: Dict[str, object]):
+        """Start over from every job."""
+        self._load(jobs)
+        self._rescore_all()
+
+    def _adopt(self, jobs: Dict[str, object], saved: NeighbourTable, changed: Dict[str, object]):
+        """Start from every job and a saved table, rescoring the jobs changed since it was saved."""
+        self._load(jobs)
+        self._reindex()
+        # Each saved row's row here, or -1 if that job has changed or gone
+        here = np.array(
+            [-1 if job_id is None or job_id in changed else self._rows.get(job_id, -1) for job_id in saved.ids],
+            dtype=np.int64,
+        )
+        kept = here >= 0
+        neighbours = np.where(saved.neighbours >= 0, here[saved.neighbours], -1)[kept]
+        stale = np.zeros(self._top_rows.shape, dtype=bool)
+        stale[here[kept]] = (saved.neighbours[kept] >= 0) & (neighbours < 0)
+        self._top_rows[here[kept]] = neighbours
+        self._top_scores[here[kept]] = saved.scores[kept]
+        adopted = np.zeros(len(self._ids), dtype=bool)
+        adopted[here[kept]] = True
+        self._changed_since_build = len(changed)
+        self._repair(stale, [row for row in self._rows.values() if not adopted[row]])
+
+    def _reindex(self):
+        """Vectors and windows from scratch, with empty neighbour lists."""
+        # Drop the vocabulary too, so terms no job uses anymore go
+        self._columns.clear()
+        self._vectors = [None if terms is None else self._vector(terms) for terms in self._terms]
+        vectors = [vector[0] for vector in self._vectors if vector is not None]
+        lengths = np.bincount(
+            np.concatenate(vectors) if vectors else np.zeros(0, dtype=np.int64), minlength=len(self._columns),
+        )
+        self._widths = np.where(
+            lengths > MAX_POSTINGS, FULL_WINDOW * MAX_POSTINGS // np.maximum(lengths, 1), FULL_WINDOW,
+        )
+        self._changed_since_build = 0
+        self._top_rows = np.full((len(self._ids), self.k), -1, dtype=np.int64)
+        self._top_scores = np.zeros((len(self._ids), self.k), dtype=np.float32)
+
+    def _rescore_all(self):
+        self._reindex()
+        postings = Postings(self._vectors, len(self._columns))
+        for block, matched, scores in self._scores(list(self._rows.values()), postings):
+            self._top_rows[block], self._top_scores[block] = self._top(scores, matched)
+
+    def _update(self, changed: Dict[str, object]) -> bool:
+        """Apply changed and deleted (None) jobs; True if that took rescoring everything."""
+        touched: List[int] = []
+        rescored: List[int] = []
+        for job_id, job in changed.items():
+            row = self._rows.get(job_id)
+            if row is not None:
+                self._unassign(job_id)
+                touched.append(row)
+            if job is not None:
+                row = self._assign(job_id, job)
+                touched.append(row)
+                rescored.append(row)
+        self._changed_since_build += len(changed)
+        if self._changed_since_build > REBUILD_FRACTION * max(len(self._rows), 1):
+            self._rescore_all()
+            return True
+        # New rows start with empty lists
+        grown = len(self._ids) - len(self._top_rows)
+        if grown:
+            self._top_rows = np.concatenate([self._top_rows, np.full((grown, self.k), -1, dtype=np.int64)])
+            self._top_scores = np.concatenate([self._top_scores, np.zeros((grown, self.k), dtype=np.float32)])
+        for row in rescored:
+            self._vectors[row] = self._vector(self._terms[row])
+        # Scores against changed jobs are stale
+        self._repair(np.isin(self._top_rows, touched), rescored)
+        return False
+
+    def _repair(self, stale: np.ndarray, rescored: List[int]):
+        """Drop the ``stale`` list entries, and rescore the ``rescored`` rows into everyone's lists."""
+        # Terms new since the build are too rare to sample
+        missing = len(self._columns) - len(self._widths)
+        if missing > 0:
+            self._widths = np.concatenate([self._widths, np.full(missing, FULL_WINDOW, dtype=np.int64)])
+        postings = Postings(self._vectors, len(self._columns))
+        live = np.array([job_id is not None for job_id in self._ids], dtype=bool)
+        is_rescored = np.zeros(len(self._ids), dtype=bool)
+        is_rescored[rescored] = True
+
+        # Remember where lists were full and the score they had to beat,
+        # then close the gaps the stale entries leave
+        top_rows, top_scores = self._top_rows, self._top_scores
+        was_full = (top_rows[:, -1] >= 0) | stale[:, -1]
+        threshold = top_scores[:, -1].copy()
+        lost = stale.any(axis=1)
+        top_rows[stale] = -1
+        top_scores[stale] = 0
+        gaps = np.flatnonzero(lost)
+        order = np.argsort(-top_scores[gaps], axis=1, kind="stable")
+        top_rows[gaps] = np.take_along_axis(top_rows[gaps], order, axis=1)
+        top_scores[gaps] = np.take_along_axis(top_scores[gaps], order, axis=1)
+
+        for block, matched, scores in self._scores(rescored, postings):
+            top_rows[block], top_scores[block] = self._top(scores, matched)
+        # Each changed job as a candidate neighbour of the jobs whose windows
+        # it is in, with the score they give it
+        for block, matched, offered in self._scores(rescored, postings, backward=True):
+            takers = np.flatnonzero((offered > MIN_SCORE).any(axis=0) & live[matched] & ~is_rescored[matched])
+            if not len(takers):
+                continue
+            rows = matched[takers]
+            candidate_rows = np.concatenate(
+                [top_rows[rows], np.broadcast_to(np.array(block), (len(rows), len(block)))], axis=1
+            )
+            candidate_scores = np.concatenate([top_scores[rows], offered[:, takers].T], axis=1)
+            order = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :self.k]
+            best_rows = np.take_along_axis(candidate_rows, order, axis=1)
+            best_scores = np.take_along_axis(candidate_scores, order, axis=1)
+            top_rows[rows] = np.where(best_scores > MIN_SCORE, best_rows, -1)
+            top_scores[rows] = best_scores
+
+        # A list that lost neighbours is complete again only if it refilled
+        # with scores no lower than before; anything it missed scored less
+        incomplete = lost & was_full & live & ~is_rescored & (
+            (top_rows[:, -1] < 0) | (top_scores[:, -1] < threshold - MIN_SCORE)
+        )
+        for block, matched, scores in self._scores(np.flatnonzero(incomplete).tolist(), postings):
+            top_rows[block], top_scores[block] = self._top(scores, matched)
+
+    def _assign(self, job_id: str, job) -> int:
+        row = self._free.pop() if self._free else len(self._ids)
+        if row == len(self._ids):
+            self._ids.append(None)
+            self._terms.append(None)
+            self._vectors.append(None)
+        terms = similarity_terms(job)
+        self._rows[job_id] = row
+        self._ids[row] = job_id
+        self._terms[row] = terms
+        self._frequencies.update(terms.keys())
+        return row
+
+    def _unassign(self, job_id: str):
+        row = self._rows.pop(job_id)
+        self._frequencies.subtract(self._terms[row].keys())
+        self._ids[row] = None
+        self._terms[row] = None
+        self._vectors[row] = None
+        self._top_rows[row] = -1
+        self._top_scores[row] = 0
+        self._free.append(row)
+
+    def _vector(self, terms: Counter) -> Vector:
+        documents = len(self._rows)
+        cutoff = MAX_DOCUMENT_FREQUENCY * documents if documents >= MIN_CUTOFF_DOCUMENTS else math.inf
+        columns: List[int] = []
+        weights: List[float] = []
+        for term, frequency in terms.items():
+            document_frequency = self._frequencies[term]
+            if document_frequency > cutoff:
+                continue
+            column = self._columns.get(term)
+            if column is None:
+                column = self._columns[term] = len(self._columns)
+            columns.append(column)
+            idf = math.log((1 + documents) / (1 + document_frequency)) + 1
+            weights.append((1 + math.log(frequency)) * idf)
+        vector = np.array(weights, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return np.array(columns, dtype=np.int64), vector
+
+    def _scores(self, rows: List[int], postings: Postings,
+                backward: bool = False) -> Iterator[Tuple[List[int], np.ndarray, np.ndarray]]:
+        """(block of rows, rows matched, their scores) for ``rows``, a block at a time.
+
+        Scores are a (block, matched) matrix: of each of ``rows`` against
+        the jobs in its windows or, ``backward``, of the jobs whose windows
+        it is in against it.
+        """
+        # In priority order, so that a block's windows overlap
+        rows = np.array(rows, dtype=np.int64)
+        rows = rows[np.argsort(row_priorities(rows), kind="stable")].tolist()
+        block: List[int] = []
+        spent = 0
+        for row in rows:
+            cost = postings.cost(self._vectors[row][0], self._widths)
+            if block and spent + cost > BLOCK_CELLS:
+                yield from self._score_block(block, postings, backward)
+                block, spent = [], 0
+            block.append(row)
+            spent += cost
+        if block:
+            yield from self._score_block(block, postings, backward)
+
+    def _windows(self, postings: Postings, columns: np.ndarray, priorities: np.ndarray,
+                 backward: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Posting positions (begins, ends) of the windows of jobs at ``priorities`` in ``columns``.
+
+        A window wraps around the end of the column, so each is two ranges:
+        all the first ones, then all the second ones.
+        """
+        widths = self._widths[columns]
+        first = (priorities - widths + 1 if backward else priorities) % FULL_WINDOW
+        last = first + widths
+        base = columns << 32
+        begins = np.concatenate([np.searchsorted(postings.keys, base | first), postings.starts[columns]])
+        ends = np.concatenate([
+            np.searchsorted(postings.keys, base + np.minimum(last, FULL_WINDOW)),
+            np.searchsorted(postings.keys, base + np.maximum(last - FULL_WINDOW, 0)),
+        ])
+        return begins, ends
+
+    def _score_block(self, block: List[int], postings: Postings,
+                     backward: bool) -> Iterator[Tuple[List[int], np.ndarray, np.ndarray]]:
+        lengths = [len(self._vectors[row][0]) for row in block]
+        columns = np.concatenate([self._vectors[row][0] for row in block])
+        weights = np.tile(np.concatenate([self._vectors[row][1] for row in block]), 2)
+        owners = np.repeat(np.arange(len(block)), lengths)
+        priorities = row_priorities(np.array(block, dtype=np.int64))[owners]
+        starts, ends = self._windows(postings, columns, priorities, backward)
+        owners = np.tile(owners, 2)
+        # Expand each window into the positions of its postings, by owner
+        order = np.argsort(owners, kind="stable")
+        starts, ends, owners, weights = starts[order], ends[order], owners[order], weights[order]
+        counts = ends - starts
+        offsets = np.arange(counts.sum()) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        owners = np.repeat(owners, counts)
+        targets = postings.rows[offsets]
+        products = np.repeat(weights, counts) * postings.weights[offsets]
+        present = np.zeros(len(self._ids), dtype=bool)
+        slots = np.zeros(len(self._ids), dtype=np.int64)
+        # (first, last) queries of the block to score together, and where
+        # their term matches start and end
+        pending = [(0, len(block), 0, len(targets))]
+        while pending:
+            first, last, begin, end = pending.pop()
+            # Only rows some query matched get a column of scores
+            present[:] = False
+            present[targets[begin:end]] = True
+            matched = np.flatnonzero(present)
+            if last - first > 1 and (last - first) * len(matched) > BLOCK_CELLS:
+                middle = (first + last) // 2
+                split = begin + int(np.searchsorted(owners[begin:end], middle))
+                pending += [(middle, last, split, end), (first, middle, begin, split)]
+                continue
+            slots[matched] = np.arange(len(matched))
+            cells = (owners[begin:end] - first) * len(matched) + slots[targets[begin:end]]
+            scores = np.bincount(cells, products[begin:end], minlength=(last - first) * len(matched))
+            scores = scores.reshape(last - first, len(matched))
+            # Nobody is their own neighbour
+            queried = np.array(block[first:last], dtype=np.int64)
+            own = present[queried]
+            scores[np.flatnonzero(own), slots[queried[own]]] = 0
+            yield block[first:last], matched, scores
+
+    def _top(self, scores: np.ndarray, matched: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """The ``k`` best (rows, scores) per row of ``scores``, best first, -1 padded.
+
+        Columns of ``scores`` are the rows in ``matched``.
+        """
+        k = self.k
+        rows = np.full((len(scores), k), -1, dtype=np.int64)
+        best = np.zeros((len(scores), k), dtype=np.float32)
+        found = min(k, scores.shape[1])
+        if found == 0:
+            return rows, best
+        if found < scores.shape[1]:
+            candidates = np.argpartition(-scores, found - 1, axis=1)[:, :found]
+        else:
+            candidates = np.broadcast_to(np.arange(found), (len(scores), found))
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        rows[:, :found] = matched[np.take_along_axis(candidates, order, axis=1)]
+        best[:, :found] = np.take_along_axis(candidate_scores, order, axis=1)
+        rows[best <= MIN_SCORE] = -1
+        return rows, best
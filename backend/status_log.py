@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from metrics import STORE_OPERATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Status checks older than this are expired by MongoDB's TTL monitor
+RETENTION = timedelta(days=30)
+
+# How long the writer waits for more checks before inserting a batch
+INSERT_WINDOW = 0.01
+
+# Checks inserted per insert_many round trip at most
+INSERT_BATCH_SIZE = 500
+
+EPOCH = datetime(1970, 1, 1)
+
+# Aggregation bucket widths accepted by ``summarize``
+BUCKETS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+class StatusLog:
+    """Health-check history kept in a TTL-indexed MongoDB collection.
+
+    Checks expire after ``retention``, so the collection stays bounded.
+    Listing pages newest first by (timestamp, id) and summaries are grouped
+    server-side, both served by the timestamp indexes.
+
+    While the writer task is running (``start``/``stop``), checks arriving
+    within ``insert_window`` are written with one unordered insert_many, and
+    each caller resumes once its batch is stored.
+    """
+
+    def __init__(self, collection, retention: timedelta = RETENTION, insert_window: float = INSERT_WINDOW):
+        self.collection = collection
+        self.retention = retention
+        self.insert_window = insert_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._indexed = False
+
+    async def ensure_indexes(self):
+        """Create the TTL and listing indexes once per process.
+
+        Called on first use rather than at startup, so the API comes up
+        without MongoDB when jobs are stored in JSON files.
+        """
+        if self._indexed:
+            return
+        await self.collection.create_indexes([
+            IndexModel(
+                [("timestamp", ASCENDING)],
+                name="timestamp_ttl",
+                expireAfterSeconds=int(self.retention.total_seconds()),
+            ),
+            IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+            IndexModel([("client_name", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        ])
+        self._indexed = True
+
+    def start(self):
+        """Start the batching writer task on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run_writer())
+
+    async def stop(self):
+        """Insert queued checks and stop the writer task."""
+        if self._writer is None:
+            return
+        await self._queue.put(None)
+        await self._writer
+        self._queue = self._writer = None
+
+    async def record(self, check: Dict):
+        """Store a check document, batched with concurrent ones."""
+        await self.ensure_indexes()
+        if self._writer is None:
+            await self.collection.insert_one(dict(check))
+            return
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((check, future))
+        await future
+
+    async def _run_writer(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            await asyncio.sleep(self.insert_window)
+            stopping = False
+            while not self._queue.empty() and len(batch) < INSERT_BATCH_SIZE:
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._insert(batch)
+            if stopping:
+                return
+
+    async def _insert(self, batch):
+        error = None
+        try:
+            # Copies, so the _id insert_many adds doesn't leak into responses
+            with STORE_OPERATION_SECONDS.time("status_checks", "flush"):
+                await self.collection.insert_many([dict(check) for check, _ in batch], ordered=False)
+        except Exception as e:
+            logger.exception("Failed to insert %d status checks", len(batch))
+            error = e
+        for _, future in batch:
+            if future.cancelled():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    async def page(
+        self,
+        after: Optional[Tuple[datetime, str]] = None,
+        limit: int = 100,
+        client_name: Optional[str] = None,
+        since: Optional[datetime] = None,
+    ) -> Tuple[List[Dict], Optional[Tuple[datetime, str]]]:
+        """Checks newest first, starting after the (timestamp, id) key ``after``.
+
+        Returns the page and the key to continue from, or None on the last page.
+        """
+        await self.ensure_indexes()
+        clauses = []
+        if client_name:
+            clauses.append({"client_name": client_name})
+        if since is not None:
+            clauses.append({"timestamp": {"$gte": since}})
+        if after is not None:
+            timestamp, check_id = after
+            clauses.append({"$or": [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "id": {"$lt": check_id}},
+            ]})
+        query = {"$and": clauses} if clauses else {}
+        cursor = (
+            self.collection.find(query, {"_id": 0})
+            .sort([("timestamp", DESCENDING), ("id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        checks = await cursor.to_list(None)
+        if len(checks) <= limit:
+            return checks, None
+        checks = checks[:limit]
+        return checks, (checks[-1]["timestamp"], checks[-1]["id"])
+
+    async def summarize(
+        self,
+        bucket: str,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        client_name: Optional[str] = None,
+    ) -> List[Dict]:
+        """Number of checks per client per ``bucket`` (see BUCKETS), oldest first."""
+        await self.ensure_indexes()
+        width = int(BUCKETS[bucket].total_seconds() * 1000)
+        match: Dict = {}
+        if client_name:
+            match["client_name"] = client_name
+        if since is not None or until is not None:
+            match["timestamp"] = {}
+            if since is not None:
+                match["timestamp"]["$gte"] = since
+            if until is not None:
+                match["timestamp"]["$lt"] = until
+        # Round down to the bucket in epoch milliseconds (date minus date is
+        # milliseconds) rather than using $dateTrunc, which needs MongoDB 5
+        millis = {"$subtract": ["$timestamp", EPOCH]}
+        pipeline = [
+            {"$match": match},
+            {"$group": {
+                "_id": {
+                    "client_name": "$client_name",
+                    "bucket": {"$subtract": [millis, {"$mod": [millis, width]}]},
+                },
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"_id.bucket": ASCENDING, "_id.client_name": ASCENDING}},
+        ]
+        rows = await self.collection.aggregate(pipeline).to_list(None)
+        return [
+            {
+                "client_name": row["_id"]["client_name"],
+                "bucket": datetime.utcfromtimestamp(row["_id"]["bucket"] / 1000),
+                "count": row["count"],
+            }
+            for row in rows
+        ]
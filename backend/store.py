@@ -0,0 +1,954 @@
+import asyncio
+import gc
+import json
+import logging
+import os
+import pickle
+import time
+import uuid
+from bisect import bisect_right
+from contextlib import contextmanager
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Set, Tuple, Type, TypeVar
+
+import aiofiles
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+from compact import ModelForm
+from indexes import StoreIndex
+from metrics import STORE_BATCH_MUTATIONS, STORE_OPERATION_SECONDS
+from shared_version import NO_FILE, SharedVersion, Version
+
+logger = logging.getLogger(__name__)
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# Log entries accumulated before the log is folded into a new snapshot
+COMPACT_AFTER = 1000
+
+# How long the writer waits for more mutations before flushing a batch
+GROUP_COMMIT_WINDOW = 0.002
+
+# How often a running store checks whether another process changed its files
+WATCH_INTERVAL = 0.01
+
+# Deleted ids remembered for change feeds; older deletions move the horizon
+KEEP_TOMBSTONES = 10_000
+
+# Bumped whenever the binary snapshot layout (or an index state) changes,
+# so older snapshots are ignored rather than misread
+BINARY_SNAPSHOT_VERSION = 4
+
+# Everything a binary snapshot may refer to besides plain values: the
+# containers index states use, and numpy arrays under numpy 1 and 2 names.
+# Unpickling anything else could run arbitrary code, so it is refused
+SNAPSHOT_GLOBALS = frozenset({
+    ("builtins", "dict"),
+    ("builtins", "frozenset"),
+    ("builtins", "int"),
+    ("builtins", "list"),
+    ("builtins", "set"),
+    ("builtins", "str"),
+    ("builtins", "tuple"),
+    ("collections", "defaultdict"),
+    ("collections", "OrderedDict"),
+    ("numpy", "dtype"),
+    ("numpy", "ndarray"),
+    ("numpy.core.multiarray", "_reconstruct"),
+    ("numpy.core.numeric", "_frombuffer"),
+    ("numpy._core.multiarray", "_reconstruct"),
+    ("numpy._core.numeric", "_frombuffer"),
+})
+
+# A mutation changes the resident records and returns the caller's result
+# along with the log entries that persist the change
+Mutation = Callable[[], Tuple[object, List[dict]]]
+
+# The store revision, horizon, per-record revisions (in record order),
+# tombstones, per-record positions (in record order) and the next position,
+# as saved next to a snapshot
+RevisionState = Tuple[int, int, List[int], Dict[str, int], List[int], int]
+
+
+class StoreWriteError(Exception):
+    """A commit couldn't be saved; the changes it made were discarded."""
+
+
+class RecordStore(Generic[ModelT]):
+    """Process-resident copy of a JSON-file collection.
+
+    The file is parsed once (on startup) and reads are served from memory.
+    Write endpoints mutate the resident records and then persist them; the
+    file is only re-read when its mtime/size no longer match what this
+    process last loaded or wrote, i.e. when something else changed it.
+
+    Records are indexed by id so lookups, replacements and deletions are
+    O(1). Each record also gets a position (a monotonically increasing
+    insertion number) that survives updates and other records' deletion,
+    so listings keep a stable order. Positions are saved with the records,
+    so list cursors mean the same in every process and across restarts.
+
+    Every change gets the next store revision, which is saved with it and
+    so is the same in every process and across restarts. Deletions leave a
+    tombstone, so ``changes`` can report everything after a revision. Only
+    the newest ``keep_tombstones`` are kept; ``horizon`` is the oldest
+    revision changes can still be reported after. Replacing every record
+    (a reset) moves it past every earlier change.
+
+    Secondary indexes passed as ``indexes`` are updated on every change.
+
+    Records are kept in memory in the shape given by ``form`` (see
+    compact.py): as the validated models by default, or as compact records
+    that are packed on every write. ``get``, ``records`` and ``select``
+    return records in that shape; ``form.to_model`` turns one back into a
+    model.
+
+    Writes are persisted as entries appended to a change log next to the
+    JSON file (``jobs.json`` -> ``jobs.log``), so their cost is proportional
+    to the change. Once ``compact_after`` entries have accumulated the log
+    is folded into a fresh snapshot of the JSON file, written atomically.
+    Loading replays the log on top of the snapshot.
+
+    Revisions live in ``jobs.revisions``, written after each JSON snapshot
+    and tagged with its mtime/size. If they don't match (the JSON was
+    edited, or a crash came in between), records get fresh revisions past
+    the saved ones and the files are snapshotted again.
+
+    Each JSON snapshot is accompanied by a binary one (``jobs.snapshot``):
+    a pickle of the record field dicts, revisions and index states, tagged
+    with the JSON file's mtime/size. When the tag matches, startup unpickles it
+    instead of parsing and validating JSON and re-indexing every record.
+    The JSON stays the source of truth; a missing, stale or unreadable
+    binary snapshot just means the slow path, after which it is rewritten.
+
+    While the writer task is running (``start``/``stop``), mutations are
+    queued and applied strictly in order by that single task. Everything
+    that arrives within ``commit_window`` is flushed with one append and one
+    fsync (group commit), and each caller resumes once its batch is durable.
+    If the batch can't be saved, the store reloads the files, dropping its
+    changes, and every caller in it gets a ``StoreWriteError``.
+
+    Several processes (uvicorn workers) can serve the same files. Their
+    writes are serialized by a lock on ``jobs.version``, which also
+    publishes how far the log has been written (see shared_version.py).
+    Before writing, and whenever ``refresh`` or the watcher task (every
+    ``watch_interval``) sees the published version move, a store replays
+    just the log entries it hasn't applied yet. Compaction keeps the
+    previous log as ``jobs.log.1``, so a process one compaction behind can
+    still catch up. After a reset, or when the JSON file was changed by
+    something other than a store, processes reload everything instead.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        model: Type[ModelT],
+        name: str,
+        indexes: Iterable[StoreIndex] = (),
+        compact_after: int = COMPACT_AFTER,
+        commit_window: float = GROUP_COMMIT_WINDOW,
+        form: Optional[ModelForm] = None,
+        watch_interval: float = WATCH_INTERVAL,
+        keep_tombstones: int = KEEP_TOMBSTONES,
+    ):
+        self.path = path
+        self.log_path = path.with_suffix(".log")
+        self.rotated_log_path = path.with_suffix(".log.1")
+        self.binary_path = path.with_suffix(".snapshot")
+        self.revisions_path = path.with_suffix(".revisions")
+        self.compact_after = compact_after
+        self.commit_window = commit_window
+        self.watch_interval = watch_interval
+        self.keep_tombstones = keep_tombstones
+        self.model = model
+        self.form = form if form is not None else ModelForm(model)
+        self.name = name
+        self.indexes = list(indexes)
+        self._records: Dict[str, ModelT] = {}
+        self._positions: Dict[str, int] = {}
+        self._next_position = 0
+        self._listing: Optional[List[ModelT]] = None
+        self._listing_positions: List[int] = []
+        self._shared = SharedVersion(path.with_suffix(".version"))
+        # The published version the resident records reflect
+        self._version: Optional[Version] = None
+        self._log_entries = 0
+        self._snapshot_pending = False
+        # Bumped on every change to the resident records; each record keeps
+        # the revision it was last written at, and each deleted id the
+        # revision of its deletion
+        self.revision = 0
+        self.horizon = 0
+        self._revisions: Dict[str, int] = {}
+        self._tombstones: Dict[str, int] = {}
+        # (revision, id) of every change in revision order, for bisecting;
+        # superseded ones are skipped and dropped once they pile up
+        self._change_revisions: List[int] = []
+        self._change_ids: List[str] = []
+        self._lock = asyncio.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def records(self) -> List[ModelT]:
+        """All records in position order."""
+        if self._listing is None:
+            self._listing = list(self._records.values())
+            self._listing_positions = [self._positions[r.id] for r in self._listing]
+        return self._listing
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._records
+
+    def get(self, record_id: str) -> Optional[ModelT]:
+        return self._records.get(record_id)
+
+    def position(self, record_id: str) -> Optional[int]:
+        return self._positions.get(record_id)
+
+    def revision_of(self, record_id: str) -> Optional[int]:
+        return self._revisions.get(record_id)
+
+    def changes(self, since: int, limit: Optional[int] = None,
+                deletions_since: Optional[int] = None) -> List[Tuple[int, str, Optional[ModelT]]]:
+        """(revision, id, record) for each change after ``since``, oldest first.
+
+        A deleted record comes as None, and only if it was deleted after
+        ``deletions_since`` (``since`` by default). Only the latest change
+        to each id is reported; callers check ``since`` against ``horizon``
+        first.
+        """
+        if deletions_since is None:
+            deletions_since = since
+        changes = []
+        for i in range(bisect_right(self._change_revisions, since), len(self._change_ids)):
+            revision, record_id = self._change_revisions[i], self._change_ids[i]
+            if self._revisions.get(record_id) == revision:
+                changes.append((revision, record_id, self._records[record_id]))
+            elif revision > deletions_since and self._tombstones.get(record_id) == revision:
+                changes.append((revision, record_id, None))
+            else:
+                continue
+            if limit is not None and len(changes) == limit:
+                break
+        return changes
+
+    def select(
+        self,
+        ids: Optional[Set[str]] = None,
+        after=None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        order: Optional[Callable[[Optional[Set[str]]], Tuple[List[str], list]]] = None,
+    ) -> Tuple[List[ModelT], int, Optional[object]]:
+        """One page of records.
+
+        ``ids`` restricts the result to a candidate set (None means every
+        record). Records come in position order unless ``order`` is given; it
+        arranges the candidates and returns them with ascending sort keys.
+        ``after`` resumes after the record with that sort key (position by
+        default). Returns the page, the number of candidates, and the key to
+        pass as ``after`` for the next page (None on the last page).
+        """
+        if order is not None:
+            ordered_ids, keys = order(ids)
+        elif ids is None:
+            # Reading the listing also refreshes the positions it is keyed by
+            listing = self.records
+            ordered_ids, keys = None, self._listing_positions
+        else:
+            ordered_ids = sorted(ids, key=self._positions.__getitem__)
+            keys = [self._positions[record_id] for record_id in ordered_ids]
+        total = len(keys)
+        start = 0 if after is None else bisect_right(keys, after)
+        start += offset
+        end = total if limit is None else min(start + limit, total)
+        if ordered_ids is None:
+            page = listing[start:end]
+        else:
+            page = [self._records[record_id] for record_id in ordered_ids[start:end]]
+        next_after = keys[end - 1] if page and end < total else None
+        return page, total, next_after
+
+    def _pack_all(self, models: List[ModelT]) -> list:
+        # Every record is about to be replaced, so values shared with the old
+        # ones needn't be kept
+        self.form.clear()
+        return [self.form.pack(model) for model in models]
+
+    def _index(self, records: list, index_states: Optional[list] = None,
+               revisions: Optional[RevisionState] = None):
+        """Replace every resident record, restoring index and revision states if given.
+
+        Without ``revisions`` the records get new revisions in order and
+        the horizon moves past every earlier change, and new positions past
+        those handed out before.
+        """
+        if revisions is None:
+            first = self.revision + 1
+            position = self._next_position
+            revisions = (
+                first + max(len(records) - 1, 0), first, range(first, first + len(records)), {},
+                range(position, position + len(records)), position + len(records),
+            )
+        self.revision, self.horizon, record_revisions, self._tombstones, positions, next_position = revisions
+        self._records = {}
+        self._revisions = {}
+        self._positions = {}
+        for record, revision, position in zip(records, record_revisions, positions):
+            if record.id is None:
+                record.id = str(uuid.uuid4())
+            # A repeated id replaces the earlier record in its position
+            self._records[record.id] = record
+            self._revisions[record.id] = revision
+            self._positions.setdefault(record.id, position)
+        self._next_position = max([next_position] + [position + 1 for position in self._positions.values()])
+        self._compact_changes()
+        self._listing = None
+        records = list(self._records.values())
+        for i, index in enumerate(self.indexes):
+            if index_states is not None:
+                index.restore(index_states[i])
+            else:
+                index.rebuild(records)
+
+    def _next_revision(self, revision: Optional[int]) -> int:
+        self.revision = revision if revision is not None else self.revision + 1
+        return self.revision
+
+    def _record_change(self, record_id: str, revision: int):
+        self._change_revisions.append(revision)
+        self._change_ids.append(record_id)
+        if len(self._change_ids) > 2 * (len(self._revisions) + len(self._tombstones)) + 1024:
+            self._compact_changes()
+
+    def _compact_changes(self):
+        current = sorted(
+            [(revision, record_id) for record_id, revision in self._revisions.items()]
+            + [(revision, record_id) for record_id, revision in self._tombstones.items()],
+            key=itemgetter(0),
+        )
+        self._change_revisions = [revision for revision, _ in current]
+        self._change_ids = [record_id for _, record_id in current]
+
+    def _set(self, record, revision: Optional[int] = None, position: Optional[int] = None) -> int:
+        """Store a record at ``revision`` (the next one by default) and return it.
+
+        A new record gets ``position``, as logged by the process that wrote
+        it, or the next one.
+        """
+        # Dicts keep insertion order, so replacing an existing key leaves the
+        # record where it was and new ids go to the end.
+        previous = self._records.get(record.id)
+        if previous is None:
+            if position is None:
+                position = self._next_position
+            self._positions[record.id] = position
+            self._next_position = max(self._next_position, position + 1)
+        for index in self.indexes:
+            if previous is not None:
+                index.discard(previous)
+            index.add(record)
+        self._records[record.id] = record
+        self._listing = None
+        revision = self._revisions[record.id] = self._next_revision(revision)
+        self._tombstones.pop(record.id, None)
+        self._record_change(record.id, revision)
+        return revision
+
+    def _unset(self, record_id: str, revision: Optional[int] = None) -> Optional[int]:
+        """Delete a record at ``revision`` (the next one by default); None if it is unknown."""
+        previous = self._records.pop(record_id, None)
+        if previous is None:
+            return None
+        for index in self.indexes:
+            index.discard(previous)
+        del self._positions[record_id]
+        del self._revisions[record_id]
+        self._listing = None
+        revision = self._tombstones[record_id] = self._next_revision(revision)
+        self._record_change(record_id, revision)
+        while len(self._tombstones) > self.keep_tombstones:
+            oldest = next(iter(self._tombstones))
+            self.horizon = max(self.horizon, self._tombstones.pop(oldest))
+        return revision
+
+    def _file_signature(self) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        return _stat_signature(self.path), _stat_signature(self.log_path)
+
+    async def load(self):
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        async with self._shared.locked():
+            with _collection_paused():
+                await self._load_files()
+
+    async def _load_files(self):
+        start = time.perf_counter()
+        signature = self._file_signature()
+        try:
+            records = []
+            index_states = None
+            revisions = (0, 0, [], {}, [], 0)
+            binary = await self._read_binary(signature[0]) if signature[0] is not None else None
+            if binary is not None:
+                records, index_states, revisions = binary
+            elif signature[0] is not None:
+                async with aiofiles.open(self.path, 'rb') as f:
+                    content = await f.read()
+                data = orjson.loads(content) if orjson is not None else json.loads(content)
+                records = self._pack_all([self.model(**values) for values in data])
+                revisions = await self._read_revisions(signature[0], len(records))
+            entries, log_size = await self._read_log() if signature[1] is not None else ([], 0)
+        except Exception as e:
+            logger.error(f"Error loading {self.name}: {e}")
+            return
+        renumbered = revisions is None
+        if renumbered:
+            # Continue past every revision handed out before, so clients
+            # that synced up to one of them are told to start over
+            self.revision = max([self.revision, self._saved_revision()] + [entry.get("revision", 0) for entry in entries])
+        self._index(records, index_states, revisions)
+        if binary is None and signature[0] is not None and not renumbered:
+            # Before the log is replayed, so the snapshot matches the JSON
+            await self._write_binary(signature[0])
+        for entry in entries:
+            # Renumbered records are newer than anything in the log
+            self._replay(entry, keep_revision=not renumbered)
+        self._log_entries = len(entries)
+        published = self._shared.read()
+        snapshot = signature[0] or NO_FILE
+        epoch = published.epoch
+        if published.snapshot != snapshot or log_size < published.log_size:
+            # Not the files other processes last saw: make them reload too
+            epoch += 1
+        self._version = Version(epoch, published.generation, log_size, snapshot)
+        self._shared.publish(self._version)
+        STORE_OPERATION_SECONDS.observe(time.perf_counter() - start, self.name, "load")
+        if renumbered:
+            # Save the new revisions before other processes make up their own
+            await self._compact(replayable=False)
+        elif self._log_entries >= self.compact_after:
+            await self._compact()
+
+    async def _read_revisions(self, source, count: int) -> Optional[RevisionState]:
+        """The saved revisions, if they belong to the JSON snapshot ``source``."""
+        try:
+            async with aiofiles.open(self.revisions_path, 'rb') as f:
+                saved = json.loads(await f.read())
+            if saved["source"] != list(source) or len(saved["records"]) != count:
+                return None
+            # Saved before positions were: the ones every process numbered them with
+            positions = saved.get("positions", range(count))
+            if len(positions) != count:
+                return None
+            next_position = saved.get("next_position", count)
+            return (
+                saved["revision"], saved["horizon"], saved["records"], dict(saved["tombstones"]),
+                positions, next_position,
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable {self.name} revisions: {e}")
+            return None
+
+    def _saved_revision(self) -> int:
+        # Whatever the revisions file holds still bounds the revisions issued
+        try:
+            return json.loads(self.revisions_path.read_bytes())["revision"]
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _revision_state(self) -> RevisionState:
+        revisions = [self._revisions[record_id] for record_id in self._records]
+        positions = [self._positions[record_id] for record_id in self._records]
+        return self.revision, self.horizon, revisions, dict(self._tombstones), positions, self._next_position
+
+    async def _read_binary(self, source) -> Optional[Tuple[list, Optional[list], RevisionState]]:
+        """Records, index and revision states from the binary snapshot, if it matches ``source``."""
+        try:
+            with STORE_OPERATION_SECONDS.time(self.name, "load_binary"):
+                snapshot = await asyncio.to_thread(_read_binary_snapshot, self.binary_path)
+                if snapshot is None or snapshot.get("version") != BINARY_SNAPSHOT_VERSION:
+                    return None
+                if snapshot["source"] != source or snapshot["fields"] != list(self.model.model_fields):
+                    return None
+                if snapshot["form"] != type(self.form).__name__:
+                    return None
+                kinds = snapshot["index_kinds"]
+                states = snapshot["index_states"]
+                if kinds != [type(index).__name__ for index in self.indexes] or any(s is None for s in states):
+                    states = None
+                self.form.restore_state(snapshot["form_state"])
+                records = [self.form.restore(values) for values in snapshot["records"]]
+                revisions = snapshot["revisions"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {self.name} binary snapshot: {e}")
+            return None
+        return records, states, revisions
+
+    async def _write_binary(self, source):
+        """Save the resident records and index states, tagged with the JSON signature."""
+        snapshot = {
+            "version": BINARY_SNAPSHOT_VERSION,
+            "source": source,
+            "fields": list(self.model.model_fields),
+            "form": type(self.form).__name__,
+            # Pickled together with the records, so shared values stay shared
+            "form_state": self.form.state(),
+            "records": [self.form.values(record) for record in self._records.values()],
+            "revisions": self._revision_state(),
+            "index_kinds": [type(index).__name__ for index in self.indexes],
+            "index_states": [index.state() for index in self.indexes],
+        }
+        try:
+            with STORE_OPERATION_SECONDS.time(self.name, "save_binary"):
+                content = await asyncio.to_thread(pickle.dumps, snapshot, pickle.HIGHEST_PROTOCOL)
+                await asyncio.to_thread(_write_atomically, self.binary_path, content)
+        except Exception as e:
+            logger.error(f"Error saving {self.name} binary snapshot: {e}")
+
+    async def _read_log(self) -> Tuple[List[dict], int]:
+        """The log's entries and the length of its intact part."""
+        async with aiofiles.open(self.log_path, 'rb') as f:
+            content = await f.read()
+        entries = []
+        good_bytes = 0
+        for line in content.splitlines(keepends=True):
+            try:
+                if not line.endswith(b"\n"):
+                    raise ValueError("unterminated entry")
+                entries.append(json.loads(line))
+            except ValueError:
+                # Only the last append can be torn by a crash. Cut it off so
+                # the next append doesn't get glued onto the partial line.
+                logger.warning(f"Discarding torn entry at the end of the {self.name} log")
+                await asyncio.to_thread(_truncate, self.log_path, good_bytes)
+                break
+            good_bytes += len(line)
+        return entries, good_bytes
+
+    async def _read_log_range(self, path: Path, start: int, end: Optional[int]) -> List[dict]:
+        """Entries between two offsets of a log written by any process."""
+        if end is not None and end <= start:
+            return []
+        async with aiofiles.open(path, 'rb') as f:
+            await f.seek(start)
+            content = await f.read() if end is None else await f.read(end - start)
+        return [json.loads(line) for line in content.splitlines()]
+
+    def _replay(self, entry: dict, keep_revision: bool = True):
+        revision = entry.get("revision") if keep_revision else None
+        if revision is not None and revision <= self.revision:
+            # Already in the snapshot: compaction died before rotating the log
+            return
+        if entry["op"] == "put":
+            # Renumbered records took new positions too
+            position = entry.get("position") if keep_revision else None
+            self._set(self.form.pack(self.model(**entry["record"])), revision, position)
+        elif entry["op"] == "delete":
+            self._unset(entry["id"], revision)
+
+    def _is_current(self) -> bool:
+        return (
+            self._version is not None
+            and self._shared.read() == self._version
+            and (_stat_signature(self.path) or NO_FILE) == self._version.snapshot
+        )
+
+    async def refresh(self):
+        """Catch up with changes other processes made to the files."""
+        # A write in progress catches up itself.
+        if self._lock.locked():
+            return
+        if self._is_current():
+            return
+        async with self._lock:
+            async with self._shared.locked(exclusive=False):
+                if self._is_current() or await self._apply_published():
+                    return
+            logger.info(f"{self.name} files changed on disk, reloading")
+            await self._load()
+
+    async def _sync(self):
+        """Catch up before writing; the exclusive lock must be held."""
+        if self._is_current() or await self._apply_published():
+            return
+        if self._version is not None:
+            logger.info(f"{self.name} files changed on disk, reloading")
+        with _collection_paused():
+            await self._load_files()
+
+    async def _apply_published(self) -> bool:
+        """Replay the log entries other processes published since our version.
+
+        Returns False when that isn't possible (a reset, an edited snapshot,
+        or more than one compaction since), and the store must reload.
+        """
+        current = self._version
+        published = self._shared.read()
+        if current is None or published.epoch != current.epoch:
+            return False
+        if (_stat_signature(self.path) or NO_FILE) != published.snapshot:
+            return False
+        try:
+            with STORE_OPERATION_SECONDS.time(self.name, "catch_up"):
+                if published.generation == current.generation and published.log_size >= current.log_size:
+                    rotated = []
+                    entries = await self._read_log_range(self.log_path, current.log_size, published.log_size)
+                elif published.generation == current.generation + 1:
+                    rotated = await self._read_log_range(self.rotated_log_path, current.log_size, None)
+                    entries = await self._read_log_range(self.log_path, 0, published.log_size)
+                    self._log_entries = 0
+                else:
+                    return False
+                for entry in rotated + entries:
+                    self._replay(entry)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Couldn't catch up with the {self.name} log: {e}")
+            return False
+        self._log_entries += len(entries)
+        self._version = published
+        return True
+
+    def _publish(self, **changes):
+        self._version = self._version._replace(**changes)
+        self._shared.publish(self._version)
+
+    async def _append(self, entries: List[dict]):
+        """Durably append change entries to the log, compacting when it grows.
+
+        Runs under the store lock and the exclusive cross-process lock.
+        Raises if the entries couldn't be written; a failed compaction
+        afterwards is only logged, as the entries are safe in the log.
+        """
+        content = "".join(json.dumps(entry) + "\n" for entry in entries).encode('utf-8')
+        try:
+            with STORE_OPERATION_SECONDS.time(self.name, "flush"):
+                log_size = await asyncio.to_thread(_append_durably, self.log_path, content)
+        except Exception:
+            if self._version is not None:
+                # Cut off a partial append, so the next one starts on a line
+                # boundary the other processes agree on
+                await asyncio.to_thread(_truncate, self.log_path, self._version.log_size)
+            raise
+        self._log_entries += len(entries)
+        self._publish(log_size=log_size)
+        if self._log_entries >= self.compact_after:
+            try:
+                await self._compact()
+            except Exception as e:
+                logger.error(f"Error saving {self.name}: {e}")
+
+    async def compact(self):
+        async with self._lock:
+            async with self._shared.locked():
+                try:
+                    await self._sync()
+                    await self._compact()
+                except Exception as e:
+                    logger.error(f"Error saving {self.name}: {e}")
+
+    async def _compact(self, replayable: bool = True):
+        # The snapshot is replaced atomically before the log is rotated; if we
+        # die in between, replaying the log over the new snapshot is harmless
+        # because puts and deletes by id are idempotent. Other processes can
+        # catch up from the rotated log unless the compaction follows a
+        # change the log doesn't record (``replayable`` False).
+        with STORE_OPERATION_SECONDS.time(self.name, "compact"):
+            self.form.retain(self._records.values())
+            data = [self.form.dump(record) for record in self._records.values()]
+            content = await asyncio.to_thread(_encode_snapshot, data)
+            await asyncio.to_thread(_write_atomically, self.path, content)
+            source = _stat_signature(self.path)
+            await asyncio.to_thread(_write_atomically, self.revisions_path, self._encode_revisions(source))
+            await self._write_binary(source)
+            await asyncio.to_thread(_rotate, self.log_path, self.rotated_log_path)
+        self._log_entries = 0
+        self._publish(
+            epoch=self._version.epoch + (0 if replayable else 1),
+            generation=self._version.generation + 1,
+            log_size=0,
+            snapshot=source,
+        )
+
+    def _encode_revisions(self, source) -> bytes:
+        revision, horizon, records, tombstones, positions, next_position = self._revision_state()
+        saved = {
+            "source": list(source),
+            "revision": revision,
+            "horizon": horizon,
+            # In the JSON snapshot's record order
+            "records": records,
+            # Oldest first, the order they are dropped in
+            "tombstones": list(tombstones.items()),
+            # In record order too
+            "positions": positions,
+            "next_position": next_position,
+        }
+        return orjson.dumps(saved) if orjson is not None else json.dumps(saved).encode('utf-8')
+
+    def start(self):
+        """Start the writer and watcher tasks on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run_writer())
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        """Flush queued mutations and stop the writer and watcher tasks."""
+        if self._writer is None:
+            return
+        self._watcher.cancel()
+        try:
+            await self._watcher
+        except asyncio.CancelledError:
+            pass
+        await self._queue.put(None)
+        await self._writer
+        self._queue = self._writer = self._watcher = None
+
+    async def _watch(self):
+        # Picks up other processes' writes between requests, so reads rarely
+        # have to wait for a catch-up
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception(f"Error refreshing {self.name}")
+
+    async def submit(self, mutation: Mutation):
+        """Apply a mutation through the writer and wait until it is durable."""
+        future = asyncio.get_running_loop().create_future()
+        if self._writer is None:
+            # No writer (scripts, tests): apply and flush straight away
+            await self._commit([(mutation, future)])
+        else:
+            await self._queue.put((mutation, future))
+        return await future
+
+    async def _run_writer(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            await asyncio.sleep(self.commit_window)
+            stopping = False
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+            if stopping:
+                return
+
+    async def _commit(self, batch):
+        STORE_BATCH_MUTATIONS.observe(len(batch), self.name)
+        entries = []
+        # Future -> (result, error) of each mutation that ran
+        outcomes = {}
+        failure = None
+        async with self._lock:
+            async with self._shared.locked():
+                try:
+                    # Mutations must see every write other processes made first
+                    await self._sync()
+                    for mutation, future in batch:
+                        try:
+                            result, mutation_entries = mutation()
+                        except Exception as e:
+                            outcomes[future] = None, e
+                            continue
+                        entries.extend(mutation_entries)
+                        outcomes[future] = result, None
+                    if entries:
+                        await self._append(entries)
+                    if self._snapshot_pending:
+                        self._snapshot_pending = False
+                        await self._compact(replayable=False)
+                except Exception as e:
+                    logger.error(f"Error saving {self.name}: {e}")
+                    failure = StoreWriteError(f"Couldn't save {self.name}: {e}")
+                    failure.__cause__ = e
+                    self._snapshot_pending = False
+                    await self._discard_unsaved()
+        for _, future in batch:
+            if future.cancelled():
+                continue
+            result, error = outcomes.get(future, (None, None))
+            if error is None:
+                error = failure
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def _discard_unsaved(self):
+        """Reload the files after a failed commit, dropping what it changed in memory."""
+        unsaved = self.revision
+        try:
+            with _collection_paused():
+                await self._load_files()
+        except Exception as e:
+            logger.error(f"Error reloading {self.name}: {e}")
+        # Readers may have seen the discarded changes while they were being
+        # flushed; move the horizon past them so they start over
+        self.horizon = max(self.horizon, unsaved + 1)
+        self.revision = max(self.revision, self.horizon)
+
+    def _put(self, record: ModelT) -> List[dict]:
+        revision = self._set(self.form.pack(record))
+        position = self._positions[record.id]
+        return [{"op": "put", "record": record.model_dump(), "revision": revision, "position": position}]
+
+    async def put(self, record: ModelT):
+        """Insert a record, or replace the one with the same id in place."""
+        await self.submit(lambda: (None, self._put(record)))
+
+    async def put_many(self, build: Callable[[], List[ModelT]]):
+        """Write the records returned by ``build`` in a single commit.
+
+        ``build`` runs inside the writer, so it sees every earlier write.
+        """
+        def mutation():
+            entries = []
+            for record in build():
+                entries.extend(self._put(record))
+            return None, entries
+        await self.submit(mutation)
+
+    async def replace(self, record: ModelT) -> bool:
+        """Replace an existing record; False if its id is unknown."""
+        def mutation():
+            if record.id not in self._records:
+                return False, []
+            return True, self._put(record)
+        return await self.submit(mutation)
+
+    async def delete(self, record_id: str) -> bool:
+        def mutation():
+            revision = self._unset(record_id)
+            if revision is None:
+                return False, []
+            return True, [{"op": "delete", "id": record_id, "revision": revision}]
+        return await self.submit(mutation)
+
+    async def reset(self, records: List[ModelT]):
+        def mutation():
+            self._index(self._pack_all(records))
+            # The log doesn't record a reset, so it is snapshotted within the
+            # same commit and other processes reload
+            self._snapshot_pending = True
+            return None, []
+        await self.submit(mutation)
+
+
+def _stat_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _fsync_directory(directory: Path):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _append_durably(path: Path, content: bytes) -> int:
+    """Append and fsync; returns the new length of the file."""
+    created = not path.exists()
+    with open(path, 'ab') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    if created:
+        _fsync_directory(path.parent)
+    return size
+
+
+def _rotate(path: Path, rotated_path: Path):
+    if path.exists():
+        os.replace(path, rotated_path)
+    else:
+        rotated_path.write_bytes(b"")
+    _fsync_directory(path.parent)
+
+
+def _encode_snapshot(data: list) -> bytes:
+    # Same indented layout either way; the stdlib encoder falls back to pure
+    # Python when indenting, which is slow for large catalogs
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2).encode('utf-8')
+
+
+def _write_atomically(path: Path, content: bytes):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(path.parent)
+
+
+@contextmanager
+def _collection_paused():
+    # Loading allocates millions of dicts and lists that all survive; left
+    # on, the cyclic collector keeps re-scanning them and slows loads by a
+    # third or more
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    def find_class(self, module: str, name: str):
+        if (module, name) not in SNAPSHOT_GLOBALS:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed in a snapshot")
+        return super().find_class(module, name)
+
+
+def _read_binary_snapshot(path: Path) -> Optional[dict]:
+    # Written by a store, but anyone who can write the data directory could
+    # swap in a pickle that runs code on load; only known globals resolve
+    try:
+        with open(path, 'rb') as f:
+            return _SnapshotUnpickler(f).load()
+    except FileNotFoundError:
+        return None
+
+
+def _truncate(path: Path, size: int):
+    if not path.exists():
+        return
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+        f.flush()
+        os.fsync(f.fileno())
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { BrowserRouter as Router, Route, Routes, Navigate } from 'react-router-dom';
 import axios from 'axios';
 import './App.css';
@@ -26,15 +26,62 @@ axios.interceptors.request.use((config) => {
   return config;
 });
 
+// Page size for the job board; further pages are fetched with the cursor
+const JOBS_PAGE_SIZE = 30;
+
+// Maps the "Other filters" dropdown onto /api/jobs query parameters
+const OTHER_FILTER_PARAMS = {
+  remote: { location: 'Remote' },
+  fulltime: { type: 'Full-time' },
+  internship: { type: 'Internship' }
+};
+
+// Query parameters for the current filters, shared by the list and its facet counts
+const buildFilterParams = (filters) => {
+  const params = {};
+  if (filters.search) params.search = filters.search;
+  if (filters.highlighted) params.highlighted = true;
+  if (filters.salary) params.salary_band = filters.salary;
+  if (filters.tag) params.tags = filters.tag;
+  if (filters.location) params.location = filters.location;
+  return { ...params, ...(OTHER_FILTER_PARAMS[filters.other] || {}) };
+};
+
+// Applies a change event (see /api/events) to a list of records
+const applyChange = (records, change) => {
+  if (change.deleted) return records.filter(record => record.id !== change.id);
+  if (!records.some(record => record.id === change.id)) return [...records, change.record];
+  return records.map(record => (record.id === change.id ? change.record : record));
+};
+
+const buildJobParams = (filters) => ({
+  // Cards only need the summary fields; details are fetched per job
+  limit: JOBS_PAGE_SIZE,
+  view: 'summary',
+  ...buildFilterParams(filters)
+});
+
 function App() {
   const [jobs, setJobs] = useState([]);
+  const [jobsTotal, setJobsTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [facets, setFacets] = useState(null);
+  const [adminJobs, setAdminJobs] = useState([]);
   const [organizations, setOrganizations] = useState([]);
   const [loading, setLoading] = useState(true);
   const [isAdmin, setIsAdmin] = useState(false);
+  // Bumped to reload everything after the event stream missed changes
+  const [reloadKey, setReloadKey] = useState(0);
+  const liveUpdates = useRef(false);
+  // The cards on the board, for event handlers registered once
+  const shownJobs = useRef(jobs);
+  shownJobs.current = jobs;
   const [filters, setFilters] = useState({
     salary: '',
     other: '',
     search: '',
+    tag: '',
+    location: '',
     highlighted: false
   });
 
@@ -46,49 +93,91 @@ function App() {
     }
   }, []);
 
-  // Load jobs and organizations from API
+  // Load organizations from API
   useEffect(() => {
-    const loadData = async () => {
+    axios.get('/api/organizations')
+      .then(response => setOrganizations(response.data))
+      .catch(error => {
+        console.error('Error loading organizations:', error);
+        setOrganizations([]);
+      });
+  }, [reloadKey]);
+
+  // Load the first page of jobs matching the current filters
+  useEffect(() => {
+    let cancelled = false;
+    // Debounce so typing in the search box doesn't fire a request per keystroke
+    const timer = setTimeout(async () => {
       setLoading(true);
+      // Counts are a nicety; the list still loads if they fail
+      axios.get('/api/jobs/facets', { params: buildFilterParams(filters) })
+        .then(response => { if (!cancelled) setFacets(response.data); })
+        .catch(error => console.error('Error loading filter counts:', error));
       try {
-        const [jobsResponse, orgsResponse] = await Promise.all([
-          axios.get('/api/jobs'),
-          axios.get('/api/organizations')
-        ]);
-        setJobs(jobsResponse.data);
-        setOrganizations(orgsResponse.data);
+        const response = await axios.get('/api/jobs', { params: buildJobParams(filters) });
+        if (cancelled) return;
+        setJobs(response.data);
+        setJobsTotal(parseInt(response.headers['x-total-count'] || response.data.length, 10));
+        setNextCursor(response.headers['x-next-cursor'] || null);
       } catch (error) {
-        console.error('Error loading data:', error);
-        // Fallback to empty arrays if API fails
+        console.error('Error loading jobs:', error);
+        if (cancelled) return;
+        // Fallback to empty list if API fails
         setJobs([]);
-        setOrganizations([]);
+        setJobsTotal(0);
+        setNextCursor(null);
       } finally {
-        setLoading(false);
+        if (!cancelled) setLoading(false);
       }
+    }, 250);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
     };
+  }, [filters, reloadKey]);
 
-    loadData();
-  }, []);
+  // The admin dashboard manages the whole catalog, so only admins fetch it all
+  useEffect(() => {
+    if (!isAdmin) return;
+    axios.get('/api/jobs')
+      .then(response => setAdminJobs(response.data))
+      .catch(error => console.error('Error loading jobs:', error));
+  }, [isAdmin, reloadKey]);
 
-  const filteredJobs = jobs.filter(job => {
-    if (filters.search && !job.title.toLowerCase().includes(filters.search.toLowerCase()) && 
-        !job.organization.toLowerCase().includes(filters.search.toLowerCase())) {
-      return false;
-    }
-    if (filters.highlighted && !job.highlighted) {
-      return false;
-    }
-    if (filters.salary) {
-      const salaryMatch = job.salary.match(/\$(\d+),?(\d+)?/);
-      if (salaryMatch) {
-        const salaryNum = parseInt(salaryMatch[1] + (salaryMatch[2] || '000'));
-        if (filters.salary === 'under-50k' && salaryNum >= 50000) return false;
-        if (filters.salary === '50k-100k' && (salaryNum < 50000 || salaryNum > 100000)) return false;
-        if (filters.salary === 'over-100k' && salaryNum <= 100000) return false;
+  // Live updates: the admin lists and organizations take changes as they
+  // come, the board updates or drops the cards it shows
+  useEffect(() => {
+    const source = new EventSource(`${API_BASE_URL}/api/events`);
+    source.onopen = () => { liveUpdates.current = true; };
+    source.onerror = () => { liveUpdates.current = false; };
+    source.addEventListener('job', (event) => {
+      const change = JSON.parse(event.data);
+      setAdminJobs(current => applyChange(current, change));
+      if (shownJobs.current.some(job => job.id === change.id)) {
+        setJobs(current => applyChange(current, change));
+        if (change.deleted) setJobsTotal(total => total - 1);
       }
+    });
+    source.addEventListener('organization', (event) => {
+      setOrganizations(current => applyChange(current, JSON.parse(event.data)));
+    });
+    source.addEventListener('reset', () => setReloadKey(key => key + 1));
+    return () => source.close();
+  }, []);
+
+  const loadMoreJobs = async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await axios.get('/api/jobs', {
+        params: { ...buildJobParams(filters), cursor: nextCursor }
+      });
+      setJobs(current => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error loading more jobs:', error);
     }
-    return true;
-  });
+  };
 
   const handleAdminLogin = (token) => {
     localStorage.setItem('adminToken', token);
@@ -110,21 +199,25 @@ function App() {
             path="/jobs" 
             element={
               <JobBoard 
-                jobs={filteredJobs} 
+                jobs={jobs} 
+                jobsTotal={jobsTotal}
+                hasMoreJobs={Boolean(nextCursor)}
+                onLoadMoreJobs={loadMoreJobs}
                 organizations={organizations}
                 loading={loading}
                 filters={filters}
                 setFilters={setFilters}
+                facets={facets}
               />
             } 
           />
           <Route 
             path="/jobs/:id" 
-            element={<JobDetails jobs={jobs} />} 
+            element={<JobDetails />} 
           />
           <Route 
             path="/organizations/:id" 
-            element={<OrganizationDetails organizations={organizations} jobs={jobs} />} 
+            element={<OrganizationDetails organizations={organizations} />} 
           />
           <Route 
             path="/admin/login" 
@@ -139,9 +232,12 @@ function App() {
             element={
               <AdminRoute isAdmin={isAdmin}>
                 <AdminDashboard 
-                  jobs={jobs} 
+                  jobs={adminJobs} 
                   organizations={organizations} 
-                  onDataUpdate={() => window.location.reload()}
+                  onDataUpdate={() => {
+                    // The change arrives as an event; reload only without the stream
+                    if (!liveUpdates.current) window.location.reload();
+                  }}
                 />
               </AdminRoute>
             } 
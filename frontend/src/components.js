@@ -1,7 +1,13 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
 import axios from 'axios';
 
+// Openings fetched per page on an organization's page
+const ORG_JOBS_PAGE_SIZE = 20;
+
+// Related postings shown under a job's details
+const SIMILAR_JOBS_LIMIT = 3;
+
 // Header Component
 export const Header = ({ isAdmin, onLogout }) => {
   return (
@@ -805,8 +811,52 @@ export const LoadingSpinner = () => (
 );
 
 // Search and Filter Component
-export const SearchFilters = ({ filters, setFilters }) => {
+// "Label (count)" once facet counts for the current filters have loaded
+const withCount = (label, facet, value) => {
+  if (!facet) return label;
+  const found = facet.find(item => item.value === value);
+  return `${label} (${found ? found.count : 0})`;
+};
+
+// How each kind of /api/autocomplete suggestion is labelled
+const SUGGESTION_KINDS = {
+  title: 'Job title',
+  organization: 'Organization',
+  tag: 'Tag',
+  location: 'Location'
+};
+
+export const SearchFilters = ({ filters, setFilters, facets }) => {
   const [alertsOpen, setAlertsOpen] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+  const [suggestionsOpen, setSuggestionsOpen] = useState(false);
+  const salaryBands = facets?.salary_band;
+
+  // Suggestions are cheap enough to fetch on every keystroke
+  useEffect(() => {
+    const query = filters.search.trim();
+    if (!query) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    axios.get('/api/autocomplete', { params: { q: query, limit: 8 } })
+      .then(response => { if (!cancelled) setSuggestions(response.data); })
+      .catch(error => console.error('Error loading suggestions:', error));
+    return () => { cancelled = true; };
+  }, [filters.search]);
+
+  // Titles and organizations are searched for; tags and locations become filters
+  const applySuggestion = (suggestion) => {
+    if (suggestion.kind === 'tag') {
+      setFilters({...filters, search: '', tag: suggestion.value});
+    } else if (suggestion.kind === 'location') {
+      setFilters({...filters, search: '', location: suggestion.value});
+    } else {
+      setFilters({...filters, search: suggestion.value});
+    }
+    setSuggestionsOpen(false);
+  };
 
   return (
     <div className="bg-gray-50 py-8">
@@ -815,13 +865,62 @@ export const SearchFilters = ({ filters, setFilters }) => {
           {/* Search Jobs */}
           <div className="bg-white rounded-lg shadow p-6">
             <h3 className="text-lg font-medium mb-4">Search Jobs</h3>
-            <input
-              type="text"
-              placeholder="Search jobs..."
-              value={filters.search}
-              onChange={(e) => setFilters({...filters, search: e.target.value})}
-              className="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-teal-500 focus:border-teal-500"
-            />
+            <div className="relative">
+              <input
+                type="text"
+                placeholder="Search jobs..."
+                value={filters.search}
+                onChange={(e) => {
+                  setFilters({...filters, search: e.target.value});
+                  setSuggestionsOpen(true);
+                }}
+                onFocus={() => setSuggestionsOpen(true)}
+                onBlur={() => setSuggestionsOpen(false)}
+                className="w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-teal-500 focus:border-teal-500"
+              />
+              {suggestionsOpen && suggestions.length > 0 && (
+                <ul className="absolute z-10 mt-1 w-full bg-white border border-gray-200 rounded-lg shadow-lg">
+                  {suggestions.map(suggestion => (
+                    <li key={`${suggestion.kind}:${suggestion.value}`}>
+                      <button
+                        type="button"
+                        onMouseDown={(e) => {
+                          // Keep focus, so the input's blur doesn't close the list first
+                          e.preventDefault();
+                          applySuggestion(suggestion);
+                        }}
+                        className="w-full flex items-center justify-between gap-2 px-4 py-2 text-left hover:bg-gray-50"
+                      >
+                        <span className="truncate">{suggestion.value}</span>
+                        <span className="text-xs text-gray-500 whitespace-nowrap">
+                          {SUGGESTION_KINDS[suggestion.kind]} · {suggestion.count}
+                        </span>
+                      </button>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </div>
+            {(filters.tag || filters.location) && (
+              <div className="mt-3 flex flex-wrap gap-2">
+                {filters.tag && (
+                  <button
+                    onClick={() => setFilters({...filters, tag: ''})}
+                    className="px-3 py-1 bg-teal-100 text-teal-800 rounded-full text-sm"
+                  >
+                    {filters.tag} ✕
+                  </button>
+                )}
+                {filters.location && (
+                  <button
+                    onClick={() => setFilters({...filters, location: ''})}
+                    className="px-3 py-1 bg-teal-100 text-teal-800 rounded-full text-sm"
+                  >
+                    📍 {filters.location} ✕
+                  </button>
+                )}
+              </div>
+            )}
           </div>
 
           {/* Explore Organizations */}
@@ -852,9 +951,9 @@ export const SearchFilters = ({ filters, setFilters }) => {
             className="px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-teal-500 focus:border-teal-500"
           >
             <option value="">Annual salary</option>
-            <option value="under-50k">Under $50k</option>
-            <option value="50k-100k">$50k - $100k</option>
-            <option value="over-100k">Over $100k</option>
+            <option value="under-50k">{withCount('Under $50k', salaryBands, 'under-50k')}</option>
+            <option value="50k-100k">{withCount('$50k - $100k', salaryBands, '50k-100k')}</option>
+            <option value="over-100k">{withCount('Over $100k', salaryBands, 'over-100k')}</option>
           </select>
 
           <select
@@ -1030,7 +1129,7 @@ export const OrganizationCard = ({ organization }) => {
 };
 
 // Main Job Board Component
-export const JobBoard = ({ jobs, organizations, loading, filters, setFilters }) => {
+export const JobBoard = ({ jobs, jobsTotal, hasMoreJobs, onLoadMoreJobs, organizations, loading, filters, setFilters, facets }) => {
   const [activeTab, setActiveTab] = useState('jobs');
 
   return (
@@ -1065,7 +1164,7 @@ export const JobBoard = ({ jobs, organizations, loading, filters, setFilters })
       </div>
 
       {/* Search and Filters */}
-      <SearchFilters filters={filters} setFilters={setFilters} />
+      <SearchFilters filters={filters} setFilters={setFilters} facets={facets} />
 
       {/* Main Content */}
       <div className="max-w-7xl mx-auto px-4 sm:px-6 lg:px-8 py-8">
@@ -1079,7 +1178,7 @@ export const JobBoard = ({ jobs, organizations, loading, filters, setFilters })
                 : 'border-transparent text-gray-500 hover:text-gray-700'
             }`}
           >
-            Jobs ({jobs.length})
+            Jobs ({jobsTotal})
           </button>
           <button
             onClick={() => setActiveTab('organizations')}
@@ -1111,16 +1210,46 @@ export const JobBoard = ({ jobs, organizations, loading, filters, setFilters })
             )}
           </div>
         )}
+
+        {!loading && activeTab === 'jobs' && hasMoreJobs && (
+          <div className="mt-8 text-center">
+            <button
+              onClick={onLoadMoreJobs}
+              className="bg-white text-gray-700 px-6 py-2 rounded-lg border border-gray-300 hover:bg-gray-50 transition-colors"
+            >
+              Load more jobs
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
 };
 
 // Job Details Component
-export const JobDetails = ({ jobs }) => {
+export const JobDetails = () => {
   const { id } = useParams();
   const navigate = useNavigate();
-  const job = jobs.find(j => j.id === parseInt(id));
+  const [job, setJob] = useState(null);
+  const [similarJobs, setSimilarJobs] = useState([]);
+  const [loading, setLoading] = useState(true);
+
+  useEffect(() => {
+    setLoading(true);
+    axios.get(`/api/jobs/${id}`)
+      .then(response => setJob(response.data))
+      .catch(() => setJob(null))
+      .finally(() => setLoading(false));
+    // Optional extra; the page works without it
+    setSimilarJobs([]);
+    axios.get(`/api/jobs/${id}/similar`, { params: { limit: SIMILAR_JOBS_LIMIT, view: 'summary' } })
+      .then(response => setSimilarJobs(response.data))
+      .catch(error => console.error('Error loading similar jobs:', error));
+  }, [id]);
+
+  if (loading) {
+    return <LoadingSpinner />;
+  }
 
   if (!job) {
     return (
@@ -1239,17 +1368,45 @@ export const JobDetails = ({ jobs }) => {
             </div>
           </div>
         </div>
+
+        {similarJobs.length > 0 && (
+          <div className="mt-8">
+            <h2 className="text-xl font-semibold mb-4">Similar jobs</h2>
+            <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
+              {similarJobs.map(similar => <JobCard key={similar.id} job={similar} />)}
+            </div>
+          </div>
+        )}
       </div>
     </div>
   );
 };
 
 // Organization Details Component
-export const OrganizationDetails = ({ organizations, jobs }) => {
+export const OrganizationDetails = ({ organizations }) => {
   const { id } = useParams();
   const navigate = useNavigate();
-  const organization = organizations.find(o => o.id === parseInt(id));
-  const orgJobs = jobs.filter(job => job.organization === organization?.name);
+  const organization = organizations.find(o => o.id === id);
+  const [orgJobs, setOrgJobs] = useState([]);
+  const [orgJobsTotal, setOrgJobsTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+
+  const loadOrgJobs = (cursor) =>
+    axios.get(`/api/organizations/${id}/jobs`, { params: { limit: ORG_JOBS_PAGE_SIZE, cursor } })
+      .then(response => {
+        setOrgJobs(current => cursor ? [...current, ...response.data] : response.data);
+        setOrgJobsTotal(parseInt(response.headers['x-total-count'] || response.data.length, 10));
+        setNextCursor(response.headers['x-next-cursor'] || null);
+      });
+
+  useEffect(() => {
+    if (!organization) return;
+    loadOrgJobs().catch(() => {
+      setOrgJobs([]);
+      setOrgJobsTotal(0);
+      setNextCursor(null);
+    });
+  }, [organization]);
 
   if (!organization) {
     return (
@@ -1326,7 +1483,7 @@ export const OrganizationDetails = ({ organizations, jobs }) => {
             </div>
 
             <div>
-              <h2 className="text-xl font-semibold mb-6">Current Openings ({orgJobs.length})</h2>
+              <h2 className="text-xl font-semibold mb-6">Current Openings ({orgJobsTotal})</h2>
               {orgJobs.length > 0 ? (
                 <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
                   {orgJobs.map(job => (
@@ -1336,6 +1493,16 @@ export const OrganizationDetails = ({ organizations, jobs }) => {
               ) : (
                 <p className="text-gray-500">No current openings</p>
               )}
+              {nextCursor && (
+                <div className="mt-6 text-center">
+                  <button
+                    onClick={() => loadOrgJobs(nextCursor).catch(error => console.error('Error loading more jobs:', error))}
+                    className="bg-white text-gray-700 px-6 py-2 rounded-lg border border-gray-300 hover:bg-gray-50 transition-colors"
+                  >
+                    Load more openings
+                  </button>
+                </div>
+              )}
             </div>
 
             <div className="pt-6 border-t">
@@ -0,0 +1,25 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from compact import CompactForm
+
+
+class Posting(BaseModel):
+    id: Optional[str] = None
+    organization: str
+    tags: List[str]
+
+
+def test_retain_forgets_values_no_record_holds():
+    form = CompactForm(Posting, ("organization", "tags"))
+    old = form.pack(Posting(id="1", organization="Old", tags=["gone", "kept"]))
+    new = form.pack(Posting(id="1", organization="New", tags=["kept"]))
+    assert "Old" in form.state()
+
+    form.retain([new])
+    assert set(form.state()) == {"New", "kept", ("kept",)}
+    # Values packed afterwards still share the records' instances
+    again = form.pack(Posting(id="2", organization="New", tags=["kept"]))
+    assert again.organization is new.organization and again.tags is new.tags
+    assert old.organization == "Old"
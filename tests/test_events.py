@@ -0,0 +1,31 @@
+import asyncio
+
+from events import ChangeBroadcaster, ChangeSource
+from repositories import Changes
+
+
+class StaticRepository:
+    """A repository whose change feed never moves."""
+
+    async def refresh(self):
+        await asyncio.sleep(0)
+
+    async def revision(self):
+        return 0
+
+    async def changes(self, since, limit, after=None):
+        return Changes(0, False, False, [])
+
+
+def test_stop_right_after_notify():
+    async def main():
+        broadcaster = ChangeBroadcaster([ChangeSource("job", StaticRepository())])
+        await broadcaster.start()
+        await asyncio.sleep(0.01)
+        # A write handler's notify, then shutdown before the broadcaster wakes
+        broadcaster.notify()
+        stopping = asyncio.ensure_future(broadcaster.stop())
+        done, _ = await asyncio.wait({stopping}, timeout=1)
+        assert stopping in done
+
+    asyncio.run(main())
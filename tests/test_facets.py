@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from facets import FacetIndex
+
+
+def make_job(i: int):
+    return SimpleNamespace(
+        id=f"job-{i}", highlighted=i % 7 == 0, tags=[f"Tag {i % 3}", f"Tag {i % 5}"],
+        type="Full-time" if i % 2 else "Part-time", location=f"City {i % 11}", salaryMin=40000 + 1000 * i,
+    )
+
+
+def test_rebuild_matches_adding_one_by_one():
+    jobs = [make_job(i) for i in range(150)]
+    built = FacetIndex()
+    built.rebuild(jobs)
+    added = FacetIndex()
+    for job in jobs:
+        added.add(job)
+
+    ids = {job.id for job in jobs[::4]}
+    filters = {"type": "Full-time", "tags": ["Tag 1"], "location": "city 1"}
+    assert built.facets({}) == added.facets({})
+    assert built.facets(filters) == added.facets(filters)
+    assert built.facets(filters, ids) == added.facets(filters, ids)
+    assert built.facets({}, ids)[0] == len(ids)
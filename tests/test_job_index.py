@@ -0,0 +1,53 @@
+import pytest
+from pydantic import ValidationError
+
+from job_index import parse_salary
+from server import Job, JobCreate
+
+
+@pytest.mark.parametrize("salary,expected", [
+    ("$120,000 - $150,000", (120000, 150000, "USD")),
+    ("£40k", (40000, 40000, "GBP")),
+    ("€50k to €60k", (50000, 60000, "EUR")),
+    ("$85.5K", (85500, 85500, "USD")),
+    ("90000 CHF", (90000, 90000, "CHF")),
+    ("Competitive", (None, None, None)),
+])
+def test_parse_salary(salary, expected):
+    assert parse_salary(salary) == expected
+
+
+@pytest.mark.parametrize("salary,expected", [
+    ("$100-120k", (100000, 120000, "USD")),
+    ("$100 - $120K", (100000, 120000, "USD")),
+    ("50–60k EUR", (50000, 60000, "EUR")),
+    ("$40k + $5,000 bonus", (5000, 40000, "USD")),
+])
+def test_thousands_suffix_covers_a_range(salary, expected):
+    assert parse_salary(salary) == expected
+
+
+@pytest.mark.parametrize("salary,expected", [
+    ("Competitive + 401k", (None, None, None)),
+    ("$90k, 401(k) match", (90000, 90000, "USD")),
+    ("$100kpa", (None, None, None)),
+])
+def test_words_are_not_amounts(salary, expected):
+    assert parse_salary(salary) == expected
+
+
+@pytest.mark.parametrize("salary", ["$" + "9" * 25, "$" + "9" * 400, "$2,000,000k"])
+def test_huge_amounts_are_rejected(salary):
+    with pytest.raises(ValueError):
+        parse_salary(salary)
+
+
+def test_job_models_with_huge_salaries():
+    fields = dict(
+        title="Researcher", organization="Lab", location="Remote", type="Full-time", salary="$" + "9" * 25,
+        description="", requirements=[], tags=[],
+    )
+    with pytest.raises(ValidationError):
+        JobCreate(**fields)
+    # Already stored: still loads, without a salary range
+    assert Job(**fields).salaryMin is None
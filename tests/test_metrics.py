@@ -0,0 +1,51 @@
+import asyncio
+import json
+import os
+
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+def make_registry():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ["route"]))
+    busy = registry.register(Gauge("busy", "Requests in progress."))
+    records = registry.register(Gauge("records", "Records.", local=True))
+    seconds = registry.register(Histogram("seconds", "Latency.", buckets=(0.1, 1.0)))
+    return registry, requests, busy, records, seconds
+
+
+def test_render_adds_up_live_workers(tmp_path):
+    async def main():
+        registry, requests, busy, records, seconds = make_registry()
+        # Another worker's values, as it saved them
+        worker, *_ = make_registry()
+        worker.metrics[0].inc("/a", amount=2)
+        worker.metrics[1].inc()
+        worker.metrics[2].set(value=50)
+        worker.metrics[3].observe(0.5)
+        state = json.dumps({metric.name: metric.state() for metric in worker.metrics})
+        (tmp_path / f"{os.getppid()}.json").write_text(state)
+        # And one from a worker that has exited
+        dead = tmp_path / "999999999.json"
+        dead.write_text(state)
+
+        await registry.start(tmp_path)
+        requests.inc("/a")
+        requests.inc("/b")
+        busy.inc()
+        records.set(value=40)
+        seconds.observe(0.05)
+        lines = registry.render().decode().splitlines()
+        await registry.stop()
+
+        assert 'requests_total{route="/a"} 3' in lines
+        assert 'requests_total{route="/b"} 1' in lines
+        assert "busy 2" in lines
+        assert "records 40" in lines
+        assert 'seconds_bucket{le="0.1"} 1' in lines
+        assert 'seconds_bucket{le="1.0"} 2' in lines
+        assert "seconds_count 2" in lines
+        assert not dead.exists()
+        assert not (tmp_path / f"{os.getpid()}.json").exists()
+
+    asyncio.run(main())
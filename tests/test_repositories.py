@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional
+
+from pydantic import BaseModel
+
+from repositories import FileRepository
+from store import RecordStore
+
+
+class Item(BaseModel):
+    id: Optional[str] = None
+    name: str
+
+
+def test_reset_is_paged(tmp_path):
+    async def main():
+        items = RecordStore(tmp_path / "items.json", Item, "items", keep_tombstones=1)
+        repository = FileRepository(items, None)
+        await items.load()
+        for i in range(5):
+            await items.put(Item(id=str(i), name=str(i)))
+        # Evicting a tombstone moves the horizon past most records
+        await items.delete("0")
+        await items.delete("1")
+        await items.put(Item(id="2", name="renamed"))
+
+        changes = await repository.changes(0, 2)
+        assert changes.reset and changes.more and changes.after is not None
+        listed = {record_id: record for _, record_id, record in changes.items}
+        # Written between pages: comes on a later page
+        await items.delete("3")
+        while changes.more:
+            changes = await repository.changes(changes.revision, 2, changes.after)
+            assert not changes.reset
+            listed.update((record_id, record) for _, record_id, record in changes.items)
+        assert changes.revision == items.revision
+        assert {record_id: record.name for record_id, record in listed.items() if record is not None} == {
+            "2": "renamed", "4": "4",
+        }
+
+    asyncio.run(main())
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from repositories import Changes
+from similar import SimilarJobs
+
+
+def make_job(title: str, tags):
+    return SimpleNamespace(title=title, tags=tags, description="", requirements=[])
+
+
+class MemoryJobs:
+    """The change feed of a dict of jobs, every write a revision."""
+
+    def __init__(self, jobs):
+        self.revisions = {}
+        self.jobs = {}
+        self.version = 0
+        for job_id, job in jobs.items():
+            self.put(job_id, job)
+
+    def put(self, job_id, job):
+        self.version += 1
+        self.revisions[job_id] = self.version
+        self.jobs[job_id] = job
+
+    async def refresh(self):
+        await asyncio.sleep(0)
+
+    async def revision(self):
+        return self.version
+
+    async def changes(self, since, limit, after=None):
+        if since < 0:
+            items = [(self.revisions[job_id], job_id, job) for job_id, job in self.jobs.items()]
+            return Changes(self.version, True, False, sorted(items))
+        items = sorted(
+            (revision, job_id, self.jobs[job_id]) for job_id, revision in self.revisions.items() if revision > since
+        )
+        more = len(items) > limit
+        items = items[:limit]
+        return Changes(items[-1][0] if more else self.version, False, more, items)
+
+
+JOBS = {
+    "policy": make_job("AI Policy Researcher", ["Policy", "Governance"]),
+    "governance": make_job("AI Governance Analyst", ["Policy", "Governance"]),
+    "engineer": make_job("Machine Learning Engineer", ["Engineering", "Research"]),
+    "research": make_job("Research Engineer", ["Engineering", "Research"]),
+}
+
+
+def test_stop_right_after_notify():
+    async def main():
+        similar_jobs = SimilarJobs(MemoryJobs(JOBS), refresh_interval=0.05)
+        await similar_jobs.start()
+        await asyncio.sleep(0.1)
+        # A write handler's notify, then shutdown before the task wakes
+        similar_jobs.notify()
+        stopping = asyncio.ensure_future(similar_jobs.stop())
+        done, _ = await asyncio.wait({stopping}, timeout=1)
+        assert stopping in done
+
+    asyncio.run(main())
+
+
+def test_workers_share_the_saved_table(tmp_path):
+    async def main():
+        repository = MemoryJobs(JOBS)
+        path = tmp_path / "jobs.similar.npz"
+        leader = SimilarJobs(repository, path=path)
+        follower = SimilarJobs(repository, path=path)
+        await leader.refresh()
+        await follower.refresh()
+        assert leader.leading and not follower.leading
+        assert follower.neighbours("policy")[0] == "governance"
+        assert follower.neighbours("engineer")[0] == "research"
+
+        repository.put("safety", make_job("AI Policy Fellow", ["Policy", "Governance"]))
+        await leader.refresh()
+        await follower.refresh()
+        assert "safety" in follower.neighbours("policy")
+
+        # The follower takes over from the saved table once the leader exits
+        await leader.stop()
+        repository.put("interpretability", make_job("Research Engineer, Interpretability", ["Research"]))
+        await follower.refresh()
+        assert follower.leading
+        assert follower.neighbours("safety")[:2] == leader.neighbours("safety")[:2]
+        assert "interpretability" in follower.neighbours("research")
+        await follower.stop()
+
+    asyncio.run(main())
+
+
+def test_concurrent_refreshes_take_turns():
+    async def main():
+        similar = SimilarJobs(MemoryJobs(JOBS), neighbours=2)
+        running = []
+        rebuild = similar._rebuild
+
+        def slow_rebuild(jobs):
+            # Runs in a worker thread; a second one meanwhile would clobber it
+            assert not running
+            running.append(jobs)
+            time.sleep(0.05)
+            rebuild(jobs)
+            running.pop()
+
+        similar._rebuild = slow_rebuild
+        await asyncio.gather(similar.refresh(), similar.refresh())
+        assert running == []
+        assert similar.neighbours("policy")[0] == "governance"
+
+    asyncio.run(main())
+
+
+def test_refreshes_append_updates(tmp_path):
+    async def main():
+        # Enough jobs that a couple of changes are applied rather than rebuilt
+        jobs = dict(JOBS)
+        for i in range(40):
+            jobs[f"job-{i}"] = make_job(f"Operations Associate {i}", ["Operations", f"Team {i % 5}"])
+        repository = MemoryJobs(jobs)
+        path = tmp_path / "jobs.similar.npz"
+        leader = SimilarJobs(repository, path=path)
+        follower = SimilarJobs(repository, path=path)
+        await leader.refresh()
+        await follower.refresh()
+        saved = path.stat().st_mtime_ns
+
+        repository.put("safety", make_job("AI Policy Fellow", ["Policy", "Governance"]))
+        await leader.refresh()
+        repository.put("engineer", make_job("AI Governance Lead", ["Policy", "Governance"]))
+        await leader.refresh()
+        assert path.stat().st_mtime_ns == saved
+        assert path.with_suffix(".updates").exists()
+
+        await follower.refresh()
+        assert follower.revision == leader.revision
+        for job_id in ("policy", "safety", "engineer", "research", "job-3"):
+            assert follower.neighbours(job_id) == leader.neighbours(job_id)
+        await leader.stop()
+        await follower.stop()
+
+    asyncio.run(main())
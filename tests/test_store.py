@@ -0,0 +1,89 @@
+import asyncio
+import errno
+import os
+import pickle
+from collections import defaultdict
+from typing import Optional
+
+import numpy
+import pytest
+from pydantic import BaseModel
+
+import store
+from store import RecordStore, StoreWriteError
+
+
+class Item(BaseModel):
+    id: Optional[str] = None
+    name: str
+
+
+def fail_with_full_disk(path, content):
+    raise OSError(errno.ENOSPC, "No space left on device")
+
+
+def test_failed_flush_fails_the_batch_and_discards_it(tmp_path, monkeypatch):
+    async def main():
+        items = RecordStore(tmp_path / "items.json", Item, "items")
+        await items.load()
+        items.start()
+        await items.put(Item(id="kept", name="kept"))
+        revision = items.revision
+
+        monkeypatch.setattr(store, "_append_durably", fail_with_full_disk)
+        writes = [items.put(Item(id="lost", name="lost")), items.delete("kept")]
+        results = await asyncio.gather(*writes, return_exceptions=True)
+        assert all(isinstance(result, StoreWriteError) for result in results)
+        assert items.get("lost") is None
+        assert items.get("kept").name == "kept"
+        # Readers that saw the discarded changes have to start over
+        assert items.horizon > revision
+
+        monkeypatch.undo()
+        await items.put(Item(id="later", name="later"))
+        await items.stop()
+
+        reloaded = RecordStore(tmp_path / "items.json", Item, "items")
+        await reloaded.load()
+        assert sorted(item.id for item in reloaded.records) == ["kept", "later"]
+
+    asyncio.run(main())
+
+
+def test_failed_reset_is_discarded(tmp_path, monkeypatch):
+    async def main():
+        items = RecordStore(tmp_path / "items.json", Item, "items")
+        await items.load()
+        await items.put(Item(id="kept", name="kept"))
+
+        monkeypatch.setattr(store, "_write_atomically", fail_with_full_disk)
+        with pytest.raises(StoreWriteError):
+            await items.reset([Item(id="new", name="new")])
+        assert [item.id for item in items.records] == ["kept"]
+
+    asyncio.run(main())
+
+
+def test_binary_snapshot_holds_index_states(tmp_path):
+    states = {
+        "sets": defaultdict(set, {"a": {"1", "2"}}),
+        "frozen": frozenset({("x", 1)}),
+        "matrix": numpy.arange(12, dtype=numpy.uint64).reshape(3, 4)[:, 1:],
+    }
+    path = tmp_path / "items.snapshot"
+    path.write_bytes(pickle.dumps(states, pickle.HIGHEST_PROTOCOL))
+    loaded = store._read_binary_snapshot(path)
+    assert loaded["sets"] == states["sets"] and loaded["frozen"] == states["frozen"]
+    assert (loaded["matrix"] == states["matrix"]).all()
+
+
+class Payload:
+    def __reduce__(self):
+        return os.getcwd, ()
+
+
+def test_binary_snapshot_refuses_other_globals(tmp_path):
+    path = tmp_path / "items.snapshot"
+    path.write_bytes(pickle.dumps({"records": [Payload()]}))
+    with pytest.raises(pickle.UnpicklingError):
+        store._read_binary_snapshot(path)